@@ -1,6 +1,19 @@
-import datetime, pytz, os, json, enum
-from avanza import Avanza, OrderType
+import datetime, os, json, enum, time, inspect
+import concurrent.futures
+from avanza import Avanza, OrderType, InstrumentType
 from Logger import LogType, Log
+from OrderTracker import OrderTracker
+from TickerIndex import TickerIndex
+from QuoteCache import QuoteCache
+from TransactionStore import TransactionStore
+from Metrics import Metrics
+import QuoteAnalysis
+from MarketData import OrderBookStore
+from Records import Quote, Position
+import TimeUtils
+
+# Max number of parallel search_for_stock requests in resolveTickers
+MAX_PARALLEL_TICKER_SEARCHES = 8
 
 passwordPaths = ["./passwords.json", "/passwords/passwords.json", "/home/jonas/Documents/tradingpal/tradingpalavanza/passwords.json"]
 
@@ -8,6 +21,50 @@ class TransactionType(enum.Enum):
    Buy = 1
    Sell = 2
 
+class ObservedAvanza:
+
+    # ##############################################################################################################
+    # Wraps the avanza client and reports every call to the observers: observer(method, seconds, exception).
+    # Coroutine functions (e.g. subscribe_to_id) are timed until the awaited call is done.
+    # ##############################################################################################################
+    def __init__(self, avanza, observers):
+        self.avanza = avanza
+        self.observers = observers
+
+    def __getattr__(self, name):
+        attribute = getattr(self.avanza, name)
+        if not callable(attribute):
+            return attribute
+
+        if inspect.iscoroutinefunction(attribute):
+            async def observedAsyncCall(*args, **kwargs):
+                start = time.monotonic()
+                try:
+                    result = await attribute(*args, **kwargs)
+                except Exception as ex:
+                    self.notify(name, time.monotonic() - start, ex)
+                    raise ex
+                self.notify(name, time.monotonic() - start, None)
+                return result
+
+            return observedAsyncCall
+
+        def observedCall(*args, **kwargs):
+            start = time.monotonic()
+            try:
+                result = attribute(*args, **kwargs)
+            except Exception as ex:
+                self.notify(name, time.monotonic() - start, ex)
+                raise ex
+            self.notify(name, time.monotonic() - start, None)
+            return result
+
+        return observedCall
+
+    def notify(self, name, seconds, ex):
+        for observer in self.observers:
+            observer(name, seconds, ex)
+
 class AvanzaHandler:
 
     allowedAcconts = ['9288043', '4397855']
@@ -15,12 +72,21 @@ class AvanzaHandler:
     # ##############################################################################################################
     # ...
     # ##############################################################################################################
-    def __init__(self, log):
+    def __init__(self, log, tickerIndex: TickerIndex = None, transactionStore: TransactionStore = None, metrics: Metrics = None):
         self.tickerIdCache = {}
+        self.tickerFlagCodes = {}
+        self.tickerIndex = tickerIndex if tickerIndex is not None else TickerIndex.getShared(log)
+        self.transactionStore = transactionStore if transactionStore is not None else TransactionStore.getShared(log)
         self.log = log
         self.avanzaTestedOk = False
         self.credentials = {}
         self.avanza = None
+        self.metrics = metrics if metrics is not None else Metrics.getShared()
+        self.callObservers = [self.metrics.observeAvanzaCall]
+        self.orderTracker = OrderTracker(log, self.getDealsAndOrders)
+        self.quoteCache = QuoteCache()
+        self.overviewCache = None
+        self.orderBookStore = OrderBookStore()
 
         self.PRODUCTION = os.getenv('TP_PROD')
 
@@ -63,17 +129,20 @@ class AvanzaHandler:
     # ...
     # ##############################################################################################################
     def login(self):
-        self.avanza = Avanza({
+        self.avanza = ObservedAvanza(Avanza({
             'username': self.credentials['username'],
             'password': self.credentials['password'],
             'totpSecret': self.credentials['totpSecret']
-        })
+        }), self.callObservers)
 
     # ##############################################################################################################
     # ...
     # ##############################################################################################################
     def testAvanzaConnection(self):
-        self.avanza.get_overview()
+        if self.overviewCache is not None:
+            self.overviewCache.refresh()
+        else:
+            self.avanza.get_overview()
 
         if not self.avanzaTestedOk:
             self.log.log(LogType.Trace, "Connection to Avanza is OK!")
@@ -85,8 +154,77 @@ class AvanzaHandler:
     def tickerToId(self, yahooTicker: str):
 
         if yahooTicker in self.tickerIdCache:
+            self.metrics.inc("tradingpal_ticker_id_cache_total", {"result": "hit"})
             return self.tickerIdCache[yahooTicker]
 
+        found, tickerId, fresh = self.tickerIndex.lookup(yahooTicker)
+
+        if found and fresh:
+            self.metrics.inc("tradingpal_ticker_id_cache_total", {"result": "index"})
+            if tickerId is not None:
+                self.cacheTickerId(yahooTicker, tickerId)
+            return tickerId
+
+        self.metrics.inc("tradingpal_ticker_id_cache_total", {"result": "search"})
+        searchedTickerId = self.searchTickerId(yahooTicker)
+
+        if searchedTickerId is None and tickerId is not None:
+            self.log.log(LogType.Trace, f"WARN: Could not revalidate {yahooTicker}, keeping id {tickerId}")
+            self.cacheTickerId(yahooTicker, tickerId)
+            return tickerId
+
+        self.tickerIndex.store(yahooTicker, searchedTickerId)
+
+        if searchedTickerId is not None:
+            self.cacheTickerId(yahooTicker, searchedTickerId)
+
+        return searchedTickerId
+
+    # ##############################################################################################################
+    # Remembers the exchange of the id as well, the tick table in parseQuote is chosen from it
+    # ##############################################################################################################
+    def cacheTickerId(self, yahooTicker: str, tickerId: str):
+        self.tickerIdCache[yahooTicker] = tickerId
+        self.tickerFlagCodes[str(tickerId)] = self.yahooTickerToAvanzaTicker(yahooTicker)[1]
+
+    # ##############################################################################################################
+    # Tested. Resolves many tickers at once. Returns {yahooTicker: tickerId}
+    # ##############################################################################################################
+    def resolveTickers(self, yahooTickers):
+
+        tickersByAvanzaTicker = {}
+        for yahooTicker in yahooTickers:
+            if yahooTicker is None:
+                continue
+            tickersByAvanzaTicker.setdefault(self.yahooTickerToAvanzaTicker(yahooTicker), []).append(yahooTicker)
+
+        retData = {}
+        if len(tickersByAvanzaTicker) == 0:
+            return retData
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(MAX_PARALLEL_TICKER_SEARCHES, len(tickersByAvanzaTicker))) as executor:
+            futures = {avanzaTicker: executor.submit(self.tickerToId, tickers[0]) for avanzaTicker, tickers in tickersByAvanzaTicker.items()}
+
+        for avanzaTicker, future in futures.items():
+            tickers = tickersByAvanzaTicker[avanzaTicker]
+            try:
+                tickerId = future.result()
+            except Exception as ex:
+                self.log.log(LogType.Trace, f"WARN: Could not resolve {tickers}, {ex}")
+                continue
+
+            for yahooTicker in tickers:
+                retData[yahooTicker] = tickerId
+                if tickerId is not None and yahooTicker not in self.tickerIdCache:
+                    self.cacheTickerId(yahooTicker, tickerId)
+
+        return retData
+
+    # ##############################################################################################################
+    # Tested
+    # ##############################################################################################################
+    def searchTickerId(self, yahooTicker: str):
+
         tickerPart, flagCode = self.yahooTickerToAvanzaTicker(yahooTicker)
         retval = self.avanza.search_for_stock(tickerPart)
 
@@ -107,7 +245,6 @@ class AvanzaHandler:
 
                 if tickerPart.lower() == topHit['tickerSymbol'].lower() and flagCode.lower() == topHit['flagCode'].lower():
                     self.log.log(LogType.Trace, f"Translating {yahooTicker} -> {topHit['tickerSymbol']} / {topHit['flagCode']} / {topHit['name']} (id: {topHit['id']})")
-                    self.tickerIdCache[yahooTicker] = topHit['id']
                     return topHit['id']
 
         self.log.log(LogType.Trace, f"WARN: Failed to lookup ticker {yahooTicker}")
@@ -117,115 +254,113 @@ class AvanzaHandler:
     # Tested
     # ##############################################################################################################
     def secondsSinceDate(self, date: str):
-        now = datetime.datetime.now(pytz.timezone('Europe/Stockholm'))
-        if ':' not in date:
+        try:
+            return int(TimeUtils.secondsSince(date))
+        except (TypeError, ValueError):
             raise RuntimeError(f"mal formatted date {date}")
-        date = date[:-2] + ":00"
-        dateAsDateTime = datetime.datetime.strptime(''.join(date.rsplit(':', 1)), '%Y-%m-%dT%H:%M:%S.%f%z')
-        diff = now - dateAsDateTime
-        return diff.seconds
 
     # ##############################################################################################################
     # Tested
     # ##############################################################################################################
-    def getTickerDetails(self, tickerId: str):
+    def getTickerDetails(self, tickerId: str, bypassCache: bool = False):
 
         if tickerId is None:
             return None
 
-        retData = {
-            'buyPrice': float,
-            'sellPrice': float,
-            'accountId': str,
-            'currentCount': int,
-            'secondsSinceUpdated': int,
-            'tickSize': float,
-            'tick1Percent': float
-        }
         try:
-            data = self.avanza.get_stock_info(tickerId)
+            quote = self.getStreamedQuote(tickerId) if not bypassCache else None
+            if quote is None:
+                quote = self.quoteCache.get(tickerId, self.fetchQuote, bypass=bypassCache)
+            return quote
         except Exception as ex:
             self.log.log(LogType.Trace, f"Could not get stock info, id {tickerId}, {ex}")
             raise ex
 
-        try:
-            retData['secondsSinceUpdated'] = self.secondsSinceDate(data['lastPriceUpdated'])
-            retData['buyPrice'] = data['buyPrice'] if 'buyPrice' in data else -1
-            retData['sellPrice'] = data['sellPrice'] if 'sellPrice' in data else -1
-            retData['tickSize'] = self.guessTickSize(data)
-            retData['tick1Percent'] = -1
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def fetchQuote(self, tickerId: str):
+        data = self.avanza.get_stock_info(tickerId)
+        return self.parseQuote(tickerId, data, [Position.fromJson(position) for position in data.get('positions', [])])
+
+    # ##############################################################################################################
+    # Tested. Quote from the streamed order book and the positions, None if the stream has no fresh quote
+    # ##############################################################################################################
+    def getStreamedQuote(self, tickerId: str):
+        data = self.orderBookStore.getStockInfo(tickerId)
+        if data is None:
+            return None
 
-            if retData['buyPrice'] > 0 and retData['sellPrice'] > 0 and retData['tickSize'] > 0:
-                price = (retData['buyPrice'] + retData['sellPrice']) / 2
-                onePctPrice = 0.01 * price
-                ticks = int(onePctPrice / retData['tickSize'])
-                retData['tick1Percent'] = (ticks if ticks > 0 else 1) * retData['tickSize']
-                retData['tick1Percent'] = float("%.4f" % (retData['tick1Percent']))
+        return self.parseQuote(tickerId, data, self.getPositions().get(str(tickerId), []))
 
-            positions = data['positions']
+    # ##############################################################################################################
+    # Tested. Extracts the few fields we use from a get_stock_info reply (or the streamed equivalent). The exchange
+    # is the one of the yahoo ticker the id was resolved from, streamed data has no flagCode. Ids not resolved here
+    # get a guessed tick size.
+    # ##############################################################################################################
+    def parseQuote(self, tickerId: str, data, positions):
 
+        try:
             if len(positions) == 0:
                 raise RuntimeError(f"stock {tickerId} does not exist in any of my accounts")
 
+            analysis = QuoteAnalysis.analyzeQuotes([data], [self.tickerFlagCodes.get(str(tickerId))])
+            bids, asks = QuoteAnalysis.extractDepth(data)
+            ownPosition = None
             for position in positions:
-                if position['accountId'] in self.allowedAcconts:
-                    retData['accountId'] = position['accountId']
-                    retData['currentCount'] = position['volume']
-                    retData['currentValueSEK'] = position['value']
-
-            return retData
+                if position.accountId in self.allowedAcconts:
+                    ownPosition = position
+
+            if ownPosition is None:
+                raise RuntimeError(f"stock {tickerId} does not exist in any of the allowed accounts")
+
+            return Quote(
+                tickerId,
+                data['buyPrice'] if 'buyPrice' in data else -1,
+                data['sellPrice'] if 'sellPrice' in data else -1,
+                float(analysis['spread'][0]),
+                float(analysis['tickSize'][0]),
+                float(analysis['tick1Percent'][0]),
+                analysis['buyLadder'][0].tolist(),
+                analysis['sellLadder'][0].tolist(),
+                self.secondsSinceDate(data['lastPriceUpdated']),
+                ownPosition,
+                bids,
+                asks)
 
         except Exception as ex:
             self.log.log(LogType.Trace, f"Could not extract stock info, id {tickerId}, {ex}")
             raise ex
 
     # ##############################################################################################################
-    # Tested
+    # Tested. All positions in one request: {orderbookId: [Position]}
     # ##############################################################################################################
-    def guessTickSize(self, data):
+    def getPositions(self):
+        return self.quoteCache.get("positions", lambda key: self.parsePositions(self.avanza.get_positions()))
 
-        prices = {}
-
-        if 'lastPrice' in data:
-            prices[data['lastPrice']] = 0
-        if 'lowestPrice' in data:
-            prices[data['lowestPrice']] = 0
-        if 'highestPrice' in data:
-            prices[data['highestPrice']] = 0
-        if 'buyPrice' in data:
-            prices[data['buyPrice']] = 0
-        if 'sellPrice' in data:
-            prices[data['sellPrice']] = 0
-
-        if 'orderDepthLevels' in data:
-            for nextDepth in data['orderDepthLevels']:
-                try:
-                    prices[nextDepth['sell']['price']] = 0
-                    prices[nextDepth['buy']['price']] = 0
-                except Exception:
-                    pass
+    def parsePositions(self, rawPositions):
+        retData = {}
+        if rawPositions is None:
+            return retData
 
-        if 'latestTrades' in data:
-            for nextTrade in data['latestTrades']:
-                if 'price' in nextTrade:
-                    prices[nextTrade['price']] = 0
+        for instrumentPositions in rawPositions.get('instrumentPositions', []):
+            for position in instrumentPositions.get('positions', []):
+                if 'orderbookId' in position and 'accountId' in position:
+                    retData.setdefault(str(position['orderbookId']), []).append(Position.fromJson(position))
 
-        prices = sorted(prices)
+        return retData
 
-        if len(prices) < 2:
-            self.log.log(LogType.Trace, "Could not get tick size")
-            return -1
+    # ##############################################################################################################
+    # Tested
+    # ##############################################################################################################
+    def guessTickSize(self, data):
 
-        tickSize = 100000.0
-        prior = None
-        for p in prices:
-            if prior is not None:
-                diff = p - prior
-                if diff < tickSize:
-                    tickSize = diff
-            prior = p
+        tickSize = float(QuoteAnalysis.guessTickSizes([data])[0])
+
+        if tickSize < 0:
+            self.log.log(LogType.Trace, "Could not get tick size")
 
-        return float("%.4f" % (tickSize * 2))
+        return tickSize
 
     # ##############################################################################################################
     # Tested
@@ -237,6 +372,8 @@ class AvanzaHandler:
         else:
             orderType = OrderType.SELL
 
+        self.quoteCache.invalidate(tickerId)
+        self.quoteCache.invalidate("positions")
         self.log.log(LogType.Trace, f"placing order... {yahooTicker}/{self.yahooTickerToAvanzaTicker(yahooTicker)}, accountId: {accountId}, tickerId: {tickerId}, {orderType}, price: {price}, volume: {volume}")
 
         if self.PRODUCTION is None:
@@ -269,37 +406,108 @@ class AvanzaHandler:
 
         return result
 
+    # ##############################################################################################################
+    # Tested. Moves an open order to a new price and volume, the order id is kept. edit_order replies
+    # {messages, orderId, requestId, status}, it is returned in the placeOrder shape so the caller checks both alike.
+    # ##############################################################################################################
+    def editOrder(self, accountId: str, orderId: str, tickerId: str, transactionType: TransactionType, price: float, volume: int):
+
+        if transactionType == TransactionType.Buy:
+            orderType = OrderType.BUY
+        else:
+            orderType = OrderType.SELL
+
+        self.quoteCache.invalidate(tickerId)
+        self.quoteCache.invalidate("positions")
+        self.log.log(LogType.Trace, f"editing order... orderId: {orderId}, accountId: {accountId}, tickerId: {tickerId}, price: {price}, volume: {volume}")
+
+        if self.PRODUCTION is None:
+            self.log.log(LogType.Trace, "DEV mode. Not editing order towards avanza...")
+            return self.toOrderReply({
+                "messages": [],
+                "orderId": orderId,
+                "requestId": "3241",
+                "status": "SUCCESS"
+            }, orderId)
+
+        return self.toOrderReply(self.avanza.edit_order(
+            instrument_type=InstrumentType.STOCK,
+            order_id=orderId,
+            account_id=accountId,
+            order_book_id=tickerId,
+            order_type=orderType,
+            price=price,
+            valid_until=datetime.date.fromisoformat(self.generateOrderValidDate()),
+            volume=volume), orderId)
+
+    # ##############################################################################################################
+    # Tested. {messages, orderId, requestId, status} -> {orderRequestStatus, message, orderId}
+    # ##############################################################################################################
+    @staticmethod
+    def toOrderReply(result, orderId: str):
+        if result is None:
+            return None
+
+        messages = result.get('messages') or []
+        return {
+            'orderRequestStatus': result.get('status'),
+            'message': '; '.join(str(message) for message in messages if message),
+            'orderId': result.get('orderId') or orderId
+        }
+
     # ##############################################################################################################
     # ...
     # ##############################################################################################################
-    def getYield(self, date: str):
-        return self.getTransactionsByDateAndType(date, "DIVIDEND")
+    def getYield(self, date: str, toDate: str = None):
+        return self.getTransactionsByDateAndType(date, "DIVIDEND", toDate)
 
     # ##############################################################################################################
     # ...
     # ##############################################################################################################
-    def getTax(self, date: str):
-        return self.getTransactionsByDateAndType(date, "FOREIGN_TAX")
+    def getTax(self, date: str, toDate: str = None):
+        return self.getTransactionsByDateAndType(date, "FOREIGN_TAX", toDate)
 
     # ##############################################################################################################
     # ...
     # ##############################################################################################################
-    def getTransactionsByDateAndType(self, date: str, type: str):
+    def getTransactionsByDateAndType(self, date: str, type: str, toDate: str = None):
 
         retData = []
+        toDate = toDate if toDate is not None else date
 
         try:
-            transactions = self.getTransactions(date)
-
-            for transaction in transactions:
-                if transaction['transactionType'] == type:
-                    retData.append(transaction)
+            self.transactionStore.sync(self.fetchTransactionsFrom)
+            retData = self.transactionStore.query(fromDate=date, toDate=toDate, transactionTypes=[type], accountIds=self.allowedAcconts)
 
         except Exception as ex:
-            print(f"Could not get transaction {type} for date {date}: {ex}")
+            print(f"Could not get transaction {type} for date {date} - {toDate}: {ex}")
 
         return retData
 
+    # ##############################################################################################################
+    # Tested. Yields and taxes for a date range, aggregated per ticker, account and currency
+    # ##############################################################################################################
+    def getTransactionSummary(self, fromDate: str, toDate: str, types = ("DIVIDEND", "FOREIGN_TAX")):
+        self.transactionStore.sync(self.fetchTransactionsFrom)
+        return self.transactionStore.aggregate(fromDate, toDate, list(types), self.allowedAcconts)
+
+    # ##############################################################################################################
+    # Tested. Raw transactions from avanza, all accounts, from fromDate or all if fromDate is None
+    # ##############################################################################################################
+    def fetchTransactionsFrom(self, fromDate: str = None):
+
+        if fromDate is None:
+            rawTransactions = self.avanza.get_transactions()
+        else:
+            rawTransactions = self.avanza.get_transactions(transactions_from=datetime.date.fromisoformat(fromDate))
+
+        if rawTransactions is None or 'transactions' not in rawTransactions:
+            self.log.log(LogType.Trace, "got no transactions from Avanza or malforrmatted...")
+            return []
+
+        return [transaction for transaction in rawTransactions['transactions']
+                if 'account' in transaction and 'name' in transaction['account']]
+
     # ##############################################################################################################
     # Tested!
     # ##############################################################################################################
@@ -312,11 +520,13 @@ class AvanzaHandler:
             self.log.log(LogType.Trace, "got no transactions from Avanza or malforrmatted...")
             return []
 
-        for transaction in rawTransactions['transactions']:
-            if 'account' not in transaction or 'name' not in transaction['account']:
-                continue
+        transactions = [transaction for transaction in rawTransactions['transactions']
+                        if 'account' in transaction and 'name' in transaction['account']]
+        dates = TimeUtils.parseDates([transaction.get('verificationDate', filterByDate) for transaction in transactions]) \
+            if filterByDate is not None else [None] * len(transactions)
 
-            if filterByDate is not None and 'verificationDate' in transaction and filterByDate != transaction['verificationDate']:
+        for transaction, date in zip(transactions, dates):
+            if filterByDate is not None and filterByDate != date:
                 continue
 
             if transaction['account']['id'] in self.allowedAcconts:
@@ -330,7 +540,7 @@ class AvanzaHandler:
     def getOverview(self):
 
         finalResult = []
-        rawOverview = self.avanza.get_overview()
+        rawOverview = self.overviewCache.get() if self.overviewCache is not None else self.avanza.get_overview()
 
         if rawOverview is None or 'accounts' not in rawOverview:
             self.log.log(LogType.Trace, "got no overview from Avanza or malforrmatted...")
@@ -356,10 +566,60 @@ class AvanzaHandler:
         return totFunds
 
     # ##############################################################################################################
-    # ToDo: Implement
+    # Tested. Buying power per allowed account, and the time.monotonic() of the overview it is from
+    # ##############################################################################################################
+    def getBuyingPower(self):
+
+        accounts = self.getOverview()
+        fetchedAt = time.monotonic() - self.overviewCache.getAgeSec() if self.overviewCache is not None else time.monotonic()
+
+        return {account['accountId']: account['buyingPower'] for account in accounts if 'buyingPower' in account}, fetchedAt
+
+    # ##############################################################################################################
+    # Tested
     # ##############################################################################################################
     def getOrderDetails(self, orderId: str):
+        dealsAndOrders = self.getDealsAndOrders()
+        return dealsAndOrders['orders'].get(orderId, None)
+
+    # ##############################################################################################################
+    # Tested. Returns all open orders by orderId and the dealt volume by orderId, in one request
+    # ##############################################################################################################
+    def getDealsAndOrders(self):
         result = self.avanza.get_deals_and_orders()
+        retData = {'orders': {}, 'deals': {}}
+
+        if result is None:
+            self.log.log(LogType.Trace, "got no deals and orders from Avanza...")
+            return retData
+
+        for order in result.get('orders', []):
+            if 'orderId' in order:
+                retData['orders'][order['orderId']] = order
+
+        for deal in result.get('deals', []):
+            if 'orderId' in deal and 'volume' in deal:
+                retData['deals'][deal['orderId']] = retData['deals'].get(deal['orderId'], 0) + abs(deal['volume'])
+
+        return retData
+
+    # ##############################################################################################################
+    # Returns a future that completes as soon as the order is filled or is no longer on the market
+    # ##############################################################################################################
+    def trackOrder(self, orderId: str, volume: int):
+        return self.orderTracker.track(orderId, volume)
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def untrackOrder(self, orderId: str):
+        self.orderTracker.untrack(orderId)
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def getDealtVolume(self, orderId: str):
+        return self.orderTracker.dealtVolume(orderId)
 
     # ##############################################################################################################
     # Tested
@@ -372,8 +632,7 @@ class AvanzaHandler:
     # Tested
     # ##############################################################################################################
     def generateOrderValidDate(self):
-        now = datetime.datetime.now(pytz.timezone('Europe/Stockholm'))
-        return f"{now.year}-{now.month:02}-{now.day:02}"
+        return TimeUtils.today()
 
     # ##############################################################################################################
     # Tested
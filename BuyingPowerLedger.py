@@ -0,0 +1,76 @@
+import itertools, threading, time
+
+# Share of the avanza buying power that is handed out. Leaves room for fees and price moves between reserve and fill.
+BUYING_POWER_MARGIN = 0.98
+
+class BuyingPowerLedger:
+
+    # ##############################################################################################################
+    # Local buying power per account. A buy order reserves its cost before it goes out and releases it when it is
+    # filled or cancelled, so orders placed in parallel never overspend. Seeded from the overview snapshot (buyingPower),
+    # fills after the snapshot are subtracted until a newer snapshot includes them. Accounts without a seed are not
+    # limited, avanza still rejects those orders.
+    # ##############################################################################################################
+    def __init__(self, margin: float = BUYING_POWER_MARGIN):
+        self.margin = margin
+        self.lock = threading.Lock()
+        self.buyingPower = {}
+        self.seededAt = float('-inf')
+        self.spent = {}
+        self.reservations = {}
+        self.reservationIds = itertools.count(1)
+
+    # ##############################################################################################################
+    # Tested. buyingPower: {accountId: SEK}, fetchedAt: time.monotonic() of the overview it is from. Older snapshots
+    # than the current seed are ignored.
+    # ##############################################################################################################
+    def seed(self, buyingPower, fetchedAt: float = None):
+        fetchedAt = fetchedAt if fetchedAt is not None else time.monotonic()
+
+        with self.lock:
+            if fetchedAt < self.seededAt:
+                return
+
+            self.buyingPower = {str(accountId): float(sek) for accountId, sek in buyingPower.items() if sek is not None}
+            self.seededAt = fetchedAt
+            for accountId, fills in self.spent.items():
+                self.spent[accountId] = [(filledAt, sek) for filledAt, sek in fills if filledAt > fetchedAt]
+
+    # ##############################################################################################################
+    # Tested. SEK left to reserve, None if the account is not seeded
+    # ##############################################################################################################
+    def available(self, accountId: str):
+        with self.lock:
+            return self.availableLocked(str(accountId))
+
+    def availableLocked(self, accountId: str):
+        if accountId not in self.buyingPower:
+            return None
+
+        reserved = sum(sek for reservedAccountId, sek in self.reservations.values() if reservedAccountId == accountId)
+        spent = sum(sek for filledAt, sek in self.spent.get(accountId, []))
+        return self.buyingPower[accountId] * self.margin - spent - reserved
+
+    # ##############################################################################################################
+    # Tested. Returns a reservation id, or None if the account can not afford it
+    # ##############################################################################################################
+    def reserve(self, accountId: str, sek: float):
+        accountId = str(accountId)
+
+        with self.lock:
+            available = self.availableLocked(accountId)
+            if available is not None and sek > available:
+                return None
+
+            reservationId = next(self.reservationIds)
+            self.reservations[reservationId] = (accountId, sek)
+            return reservationId
+
+    # ##############################################################################################################
+    # Tested. Frees the reservation. spentSek is what was actually bought, it stays used until the next seed.
+    # ##############################################################################################################
+    def release(self, reservationId, spentSek: float = 0):
+        with self.lock:
+            accountId, sek = self.reservations.pop(reservationId, (None, 0))
+            if accountId is not None and spentSek > 0:
+                self.spent.setdefault(accountId, []).append((time.monotonic(), spentSek))
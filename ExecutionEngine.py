@@ -0,0 +1,70 @@
+import os
+from AvanzaHandler import TransactionType
+
+# Execution engine used by MainBroker: "depth" or "ladder"
+EXECUTION_ENGINE = os.getenv('TP_EXECUTION_ENGINE', "depth")
+
+class LadderExecution:
+
+    # ##############################################################################################################
+    # The original strategy. Tries the retry ladder of the quote, one step (tick1Percent) further from the spread
+    # per attempt. An order that is not filled in time is deleted before the next one is placed.
+    # ##############################################################################################################
+    name = "ladder"
+    amendOrders = False
+
+    # ##############################################################################################################
+    # Tested. Limit prices to try, in order
+    # ##############################################################################################################
+    def limitPrices(self, quote, transactionType: TransactionType, volume: int):
+        return list(quote.buyLadder if transactionType == TransactionType.Buy else quote.sellLadder)
+
+class DepthExecution(LadderExecution):
+
+    # ##############################################################################################################
+    # Starts at the price of the order depth level where the volume on the other side covers our volume, so the
+    # order normally fills on the first attempt without paying the whole ladder step. Never goes past the worst
+    # ladder price. The following attempts are the ladder steps beyond it, applied by editing the open order.
+    # Without order depth this is the ladder.
+    # ##############################################################################################################
+    name = "depth"
+    amendOrders = True
+
+    # ##############################################################################################################
+    # Tested
+    # ##############################################################################################################
+    def limitPrices(self, quote, transactionType: TransactionType, volume: int):
+        ladder = super().limitPrices(quote, transactionType, volume)
+        isBuy = transactionType == TransactionType.Buy
+        fillPrice = self.fillPrice(quote.asks if isBuy else quote.bids, volume)
+
+        if fillPrice is None or len(ladder) == 0:
+            return ladder
+
+        if isBuy:
+            fillPrice = min(fillPrice, max(ladder))
+            return [fillPrice] + [price for price in ladder if price > fillPrice]
+
+        fillPrice = max(fillPrice, min(ladder))
+        return [fillPrice] + [price for price in ladder if price < fillPrice]
+
+    # ##############################################################################################################
+    # Tested. Price of the first level, best first, where the accumulated volume reaches volume. None if the
+    # visible depth is not enough.
+    # ##############################################################################################################
+    @staticmethod
+    def fillPrice(levels, volume: int):
+        accumulated = 0
+        for price, levelVolume in levels:
+            accumulated += levelVolume
+            if accumulated >= volume:
+                return price
+        return None
+
+EXECUTION_ENGINES = {engine.name: engine for engine in (LadderExecution, DepthExecution)}
+
+# ##############################################################################################################
+# Tested. Unknown names give the ladder
+# ##############################################################################################################
+def createExecutionEngine(name: str = EXECUTION_ENGINE):
+    return EXECUTION_ENGINES.get(name, LadderExecution)()
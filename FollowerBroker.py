@@ -0,0 +1,83 @@
+from AvanzaHandler import AvanzaHandler
+from TransactionStore import TransactionStore
+from TradeRegister import TradeRegister
+
+class FollowerBroker:
+
+    # ##############################################################################################################
+    # Serves the REST API in server workers that are not the leader. Reads come from the state and stores the
+    # leader keeps up to date, commands are forwarded to the leader. Never calls avanza.
+    # ##############################################################################################################
+    def __init__(self, log, sharedState, transactionStore: TransactionStore = None, tradeRegister: TradeRegister = None):
+        self.log = log
+        self.sharedState = sharedState
+        self.transactionStore = transactionStore if transactionStore is not None else TransactionStore.getShared(log)
+        self.tradeRegister = tradeRegister if tradeRegister is not None else TradeRegister(log)
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def getCurrentFunds(self):
+        funds, ageSec = self.sharedState.get("funds")
+        return funds
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def getYieldByDate(self, date: str, toDate: str = None):
+        return self.transactionStore.query(date, toDate if toDate is not None else date, ["DIVIDEND"], AvanzaHandler.allowedAcconts)
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def getTaxByDate(self, date: str, toDate: str = None):
+        return self.transactionStore.query(date, toDate if toDate is not None else date, ["FOREIGN_TAX"], AvanzaHandler.allowedAcconts)
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def getTransactionSummary(self, fromDate: str, toDate: str, types):
+        return self.transactionStore.aggregate(fromDate, toDate, list(types), AvanzaHandler.allowedAcconts)
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def getTradeRegister(self, ticker: str = None, accountId: str = None, fromDate: str = None, toDate: str = None):
+        return {
+            "trades": self.tradeRegister.query(ticker, accountId, fromDate, toDate),
+            "profitAndLoss": self.tradeRegister.getProfitAndLoss(ticker, accountId, fromDate, toDate)
+        }
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def getHealth(self):
+        health, ageSec = self.sharedState.get("health")
+        if health is None:
+            return {"healthy": False, "leader": "unknown"}
+        return {**health, "publishedAgeSec": round(ageSec, 1)}
+
+    # ##############################################################################################################
+    # The leader's metrics, as last published
+    # ##############################################################################################################
+    def getMetrics(self):
+        metrics, ageSec = self.sharedState.get("metrics")
+        return metrics if metrics is not None else ""
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def doBlockPurchases(self):
+        self.sharedState.pushCommand("blockPurchases")
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def doUnblockPurchases(self):
+        self.sharedState.pushCommand("unblockPurchases")
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def doTerminate(self):
+        self.sharedState.pushCommand("terminate")
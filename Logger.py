@@ -1,9 +1,13 @@
-import enum, datetime, pytz, sys
+import enum, sys, os, threading, queue, atexit
+import TimeUtils
 
 tradeRegisterPath = "/logs/tradingPalRegistertLog.txt"
 auditLogPath = "/logs/tradingPalAuditLog.txt"
 traceLogPath = "/logs/tradingPalTraceLog.txt"
 
+# Max number of messages waiting for the writer thread. When full, trace messages are dropped, others wait.
+LOG_QUEUE_SIZE = 10000
+
 class LogType(enum.Enum):
     Trace = 1
     Audit = 2
@@ -14,6 +18,13 @@ class Log:
     def __init__(self):
         self.errorMessgeFilePrinted = False
         self.lastHash = 0
+        self.hashLock = threading.Lock()
+        self.queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        self.files = {}
+        self.droppedTraces = 0
+        self.writer = threading.Thread(target=self._writeLoop, name="logWriter", daemon=True)
+        self.writer.start()
+        atexit.register(self.flush)
 
     def log(self, logType: LogType, data):
 
@@ -26,34 +37,93 @@ class Log:
 
         textNoDate = f"({typeChar}) {str(data)}"
         newHash = hash(textNoDate)
-        text = f"{datetime.datetime.now(pytz.timezone('Europe/Stockholm'))} - {textNoDate}"
-        if newHash == self.lastHash and logType == logType.Trace: # If trace log, only log one if log is identical to prior
-            return
+        text = f"{TimeUtils.now()} - {textNoDate}"
 
-        print(text)
-        sys.stdout.flush()
+        with self.hashLock:
+            if newHash == self.lastHash and logType == logType.Trace: # If trace log, only log one if log is identical to prior
+                return
+            self.lastHash = newHash
 
-        if logType == LogType.Register:
-            self._logToFile(tradeRegisterPath, text)
-            self._logToFile(auditLogPath, text)
-            self._logToFile(traceLogPath, text)
-        if logType == LogType.Audit:
-            self._logToFile(auditLogPath, text)
-            self._logToFile(traceLogPath, text)
         if logType == LogType.Trace:
-            self._logToFile(traceLogPath, text)
+            try:
+                self.queue.put_nowait((logType, text))
+            except queue.Full:
+                self.droppedTraces += 1
+        else:
+            self.queue.put((logType, text))
+
+    # Blocks until everything logged so far is written to file
+    def flush(self):
+        if self.writer.is_alive():
+            done = threading.Event()
+            self.queue.put((None, done))
+            done.wait(timeout=5)
+
+    def _writeLoop(self):
+        while True:
+            batch = [self.queue.get()]
+            try:
+                while True:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            self._writeBatch(batch)
+
+    def _writeBatch(self, batch):
+        syncPaths = set()
+        flushRequests = []
 
-        self.lastHash = newHash
+        for logType, text in batch:
+            if logType is None:
+                flushRequests.append(text)
+                continue
+
+            print(text)
+
+            if logType == LogType.Register:
+                self._logToFile(tradeRegisterPath, text)
+                self._logToFile(auditLogPath, text)
+                self._logToFile(traceLogPath, text)
+                syncPaths.update([tradeRegisterPath, auditLogPath])
+            if logType == LogType.Audit:
+                self._logToFile(auditLogPath, text)
+                self._logToFile(traceLogPath, text)
+                syncPaths.add(auditLogPath)
+            if logType == LogType.Trace:
+                self._logToFile(traceLogPath, text)
+
+        if self.droppedTraces > 0:
+            print(f"Log queue full, dropped {self.droppedTraces} trace messages")
+            self.droppedTraces = 0
+
+        sys.stdout.flush()
+
+        # Audit and register entries must survive a crash, so they are synced to disk before moving on
+        for path, file_object in self.files.items():
+            try:
+                file_object.flush()
+                if path in syncPaths:
+                    os.fsync(file_object.fileno())
+            except Exception as ex:
+                self._printFileError(path, ex)
+
+        for done in flushRequests:
+            done.set()
 
     def _logToFile(self, path: str, text: str):
         try:
-            with open(path, "a") as file_object:
-                file_object.write(text + "\n")
+            if path not in self.files:
+                self.files[path] = open(path, "a")
+            self.files[path].write(text + "\n")
         except Exception as ex:
-            if not self.errorMessgeFilePrinted:
-                print(f"Could not log to {path}, {ex}")
-                sys.stdout.flush()
-                self.errorMessgeFilePrinted = True
+            self._printFileError(path, ex)
+
+    def _printFileError(self, path: str, ex: Exception):
+        if not self.errorMessgeFilePrinted:
+            print(f"Could not log to {path}, {ex}")
+            sys.stdout.flush()
+            self.errorMessgeFilePrinted = True
 
 if __name__ == "__main__":
     l = Log()
@@ -63,3 +133,4 @@ if __name__ == "__main__":
     l.log(LogType.Trace, "traceLog")
     l.log(LogType.Register, {"column": "data"}) # All registers shall appear
     l.log(LogType.Register, {"column": "data"})
+    l.flush()
@@ -1,5 +1,18 @@
-import time, datetime, json, requests, sys, pytz, enum
+import asyncio, time, datetime, json, sys, enum, threading
+import concurrent.futures
 from AvanzaHandler import AvanzaHandler, TransactionType
+from OrderTracker import OrderStatus
+from TradingPalClient import TradingPalClient
+from TradeRegister import TradeRegister
+from OverviewCache import OverviewCache
+from SessionManager import SessionManager
+from Metrics import Metrics
+from MarketCalendar import MarketCalendar
+from MarketData import MarketDataStream
+from BuyingPowerLedger import BuyingPowerLedger
+from ExecutionEngine import createExecutionEngine
+from Records import TradeInstruction
+import TimeUtils
 from Logger import Log, LogType
 
 BASEURL = "http://192.168.1.50:5000/tradingpal/"
@@ -22,6 +35,19 @@ MAX_ALLOWED_TRANSACTION_SIZE_SEK = 9000
 MARKET_OPEN_HOUR = 9
 MARKET_CLOSE_HOUR = 23
 
+# Number of stocks that are locked, checked and transacted in parallel. 1 means one stock at a time.
+MAX_PARALLEL_TRANSACTIONS = 4
+
+# Max number of orders that may be on the market at the same time towards one single avanza account.
+MAX_PARALLEL_TRANSACTIONS_PER_ACCOUNT = 2
+
+# How long an order may wait for a fill before it is repriced or deleted
+WAIT_SEC_FOR_COMPLETION = 3
+
+# Multi worker serving: how often the leader publishes state to the other workers and polls for their commands
+SHARED_STATE_PUBLISH_INTERVAL_SEC = 10
+SHARED_STATE_COMMAND_POLL_SEC = 0.2
+
 log = Log()
 
 class EventType(enum.Enum):
@@ -36,6 +62,25 @@ class MainBroker:
     # ##############################################################################################################
     def __init__(self):
 
+        self.stateLock = threading.RLock()
+        self.loop = None
+        self.wakeEvent = None
+        self.accountSemaphores = {}
+        self.tradingPal = TradingPalClient(BASEURL, log)
+        self.batchSupported = True
+        self.pendingStockUpdates = []
+        self.tradeRegister = TradeRegister(log)
+        self.overviewCache = OverviewCache(log, lambda: self.avanzaHandler.avanza.get_overview())
+        self.sessionManager = SessionManager(log, self.createAvanzaHandler)
+        self.avanzaHandler = None
+        self.marketData = MarketDataStream(log, lambda: self.avanzaHandler.avanza if self.avanzaHandler is not None else None)
+        self.sharedState = None
+        self.buyingPower = BuyingPowerLedger()
+        self.executionEngine = createExecutionEngine()
+        self.marketCalendar = MarketCalendar(('Europe/Stockholm', MARKET_OPEN_HOUR, MARKET_CLOSE_HOUR))
+        self.metrics = Metrics.getShared()
+        self.metrics.addCollector(self.collectEventMetrics)
+        self.onTerminate = None
         self.terminate = False
         self.blockPurchases = False
         self.blockTransactions = False
@@ -48,85 +93,204 @@ class MainBroker:
     def doStocksTransaction(self, stocks, transactionType: TransactionType):
         self.refreshAvanzaHandler()
 
-        for stock in stocks:
-            lockKey = None
-            yahooTicker = None
-            try:
-                yahooTicker = stock['tickerName']
-                lockKey = self.lockStock(yahooTicker)
-                tickerId = self.avanzaHandler.tickerToId(yahooTicker)
-                avanzaDetails = self.avanzaHandler.getTickerDetails(tickerId)
+        locks = {}
+        try:
+            if not self.isTransactionAllowed(transactionType):
+                return
 
-                if avanzaDetails is None:
-                    raise RuntimeWarning(f"WARN: could not find ticker in avanza: {yahooTicker}")
+            if transactionType == TransactionType.Buy:
+                self.seedBuyingPower()
+
+            locks = self.lockStocks([stock.tickerName for stock in stocks])
+            lockedStocks = []
+            lockedTickers = set()
+            for stock in stocks:
+                if stock.tickerName in locks and stock.tickerName not in lockedTickers:
+                    lockedStocks.append(stock)
+                    lockedTickers.add(stock.tickerName)
+
+            if MAX_PARALLEL_TRANSACTIONS <= 1 or len(lockedStocks) <= 1:
+                for stock in lockedStocks:
+                    self.doOneStockTransaction(stock, transactionType, locks[stock.tickerName])
+            else:
+                with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_PARALLEL_TRANSACTIONS, thread_name_prefix="transaction") as executor:
+                    futures = [executor.submit(self.doOneStockTransaction, stock, transactionType, locks[stock.tickerName]) for stock in lockedStocks]
+                    concurrent.futures.wait(futures)
+        finally:
+            # Register updates must reach tradingpal while we still hold the locks
+            self.flushStockUpdates()
+            self.unlockStocks(locks)
+
+        log.log(LogType.Trace, f"tradingpal latency: {self.tradingPal.getLatencyStats()}")
+
+    # ##############################################################################################################
+    # tickerId -> ticker details -> sanity check -> order, for one locked stock. Safe to run in parallel.
+    # ##############################################################################################################
+    def doOneStockTransaction(self, stock, transactionType: TransactionType, lockKey: int):
+
+        if not self.isTransactionAllowed(transactionType):
+            return
+
+        yahooTicker = None
+        try:
+            yahooTicker = stock.tickerName
+            tickerId = self.avanzaHandler.tickerToId(yahooTicker)
+            avanzaDetails = self.avanzaHandler.getTickerDetails(tickerId)
 
-                sanityStatus = self.sanityCheckStock(avanzaDetails, stock, transactionType)
+            if avanzaDetails is None:
+                raise RuntimeWarning(f"WARN: could not find ticker in avanza: {yahooTicker}")
 
-                if sanityStatus != None:
-                    log.log(LogType.Trace, f"Sanity check failed: {stock['currentStock']['name']} / {sanityStatus}")
-                    continue
+            sanityStatus = self.sanityCheckStock(avanzaDetails, stock, transactionType)
 
+            if sanityStatus != None:
+                log.log(LogType.Trace, f"Sanity check failed: {stock.name} / {sanityStatus}")
+                return
+
+            with self.getAccountSemaphore(avanzaDetails.accountId):
+                if not self.isTransactionAllowed(transactionType):
+                    return
                 self.doOneTransactionWithRetries(avanzaDetails, transactionType, stock, yahooTicker, tickerId, lockKey)
-                    
-            except Exception as ex:
-                self.addEvent(EventType.Exception)
-                log.log(LogType.Trace, f"Could not buy stock {stock['currentStock']['name']}/{yahooTicker}, {ex}")
-            finally:
-                self.unlockStock(yahooTicker, lockKey)
+
+        except Exception as ex:
+            self.addEvent(EventType.Exception)
+            log.log(LogType.Trace, f"Could not buy stock {stock.name}/{yahooTicker}, {ex}")
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def getAccountSemaphore(self, accountId: str):
+        with self.stateLock:
+            if accountId not in self.accountSemaphores:
+                self.accountSemaphores[accountId] = threading.BoundedSemaphore(MAX_PARALLEL_TRANSACTIONS_PER_ACCOUNT)
+            return self.accountSemaphores[accountId]
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def isTransactionAllowed(self, transactionType: TransactionType):
+        with self.stateLock:
+            if self.terminate or self.blockTransactions:
+                return False
+            if transactionType == TransactionType.Buy and self.blockPurchases:
+                return False
+            return True
 
     def doOneTransactionWithRetries(self, avanzaDetails, transactionType, stock, yahooTicker, tickerId, lockKey):
 
-        log.log(LogType.Trace, f"---------- TRANSACTING STOCK ----------- {stock['currentStock']['name']}/{yahooTicker} -------")
+        log.log(LogType.Trace, f"---------- TRANSACTING STOCK ----------- {stock.name}/{yahooTicker} -------")
 
-        self.addEvent(EventType.AvanzaTransaction)
-        countAtStart = avanzaDetails['currentCount']
+        countAtStart = avanzaDetails.currentCount
 
-        if transactionType == TransactionType.Sell:
-            price = avanzaDetails["buyPrice"]
+        if avanzaDetails.tick1Percent <= 0:
+            raise RuntimeError("tick1Percent not calculated for stock")
+
+        if transactionType == TransactionType.Buy:
+            numberToTransact = stock.numberToBuy
+            expectedCountWhenDone = countAtStart + numberToTransact
         else:
-            price = avanzaDetails["sellPrice"]
+            numberToTransact = stock.numberToSell
+            expectedCountWhenDone = countAtStart - numberToTransact
 
-        for a in range(3):
+        # All prices are known up front, from best price to worst price. See ExecutionEngine.
+        prices = self.executionEngine.limitPrices(avanzaDetails, transactionType, numberToTransact)
 
-            if transactionType == TransactionType.Buy:
-                numberToTransact = stock["numberToBuy"]
-                expectedCountWhenDone = countAtStart + numberToTransact
-                price = self.getNewStockPrice(TransactionType.Buy, avanzaDetails, price)
-            else:
-                numberToTransact = stock["numberToSell"]
-                expectedCountWhenDone = countAtStart - numberToTransact
-                price = self.getNewStockPrice(TransactionType.Sell, avanzaDetails, price)
-
-            newTotalCount = self.doOneTransactionAndCheckResult(transactionType, countAtStart,
-                                                                expectedCountWhenDone, yahooTicker,
-                                                                avanzaDetails['accountId'], tickerId,
-                                                                price, numberToTransact)
-
-            if newTotalCount != countAtStart:
-                amountTransacted = newTotalCount - countAtStart
-                spentSek = stock['singleStockPriceSek'] * amountTransacted
-                newTotalInvestedSek = int(stock['currentStock']['totalInvestedSek'] + spentSek)
-
-                self.updateStock(
-                    yahooTicker,
-                    stock['priceOrigCurrancy'] if transactionType == TransactionType.Buy else None,
-                    stock['priceOrigCurrancy'] if transactionType == TransactionType.Sell else None,
-                    countAtStart, newTotalCount, spentSek, lockKey, stock['currentStock']['name'],
-                    newTotalInvestedSek, tickerId)
+        # Buys reserve the cost at the worst price, released with what was actually bought
+        reservationId = None
+        boughtSek = 0
+        if transactionType == TransactionType.Buy:
+            costSek = self.orderCostSek(stock, max(prices), numberToTransact)
+            reservationId = self.buyingPower.reserve(avanzaDetails.accountId, costSek)
+            if reservationId is None:
+                self.metrics.inc("tradingpal_buying_power_rejections_total")
+                log.log(LogType.Trace, f"Not enough buying power for {stock.name}/{yahooTicker}: {costSek:.0f} SEK, "
+                                       f"available: {self.buyingPower.available(avanzaDetails.accountId)}")
+                return
 
-                break
+        self.addEvent(EventType.AvanzaTransaction)
+        a = 0
+        openOrderId = None
+        try:
+            for a, price in enumerate(prices):
+
+                log.log(LogType.Trace, f"bidValue: {transactionType} / attempt {a}: {price}")
+                keepOnTimeout = self.executionEngine.amendOrders and a < len(prices) - 1
+                newTotalCount, openOrderId = self.doOneTransactionAndCheckResult(transactionType, countAtStart,
+                                                                                 expectedCountWhenDone, yahooTicker,
+                                                                                 avanzaDetails.accountId, tickerId,
+                                                                                 price, numberToTransact, openOrderId,
+                                                                                 keepOnTimeout)
+
+                if newTotalCount != countAtStart:
+                    amountTransacted = newTotalCount - countAtStart
+                    spentSek = stock.singleStockPriceSek * amountTransacted
+                    newTotalInvestedSek = int(stock.totalInvestedSek + spentSek)
+                    boughtSek = self.orderCostSek(stock, price, amountTransacted) if transactionType == TransactionType.Buy else 0
+
+                    self.updateStock(
+                        yahooTicker,
+                        stock.priceOrigCurrancy if transactionType == TransactionType.Buy else None,
+                        stock.priceOrigCurrancy if transactionType == TransactionType.Sell else None,
+                        countAtStart, newTotalCount, spentSek, lockKey, stock.name,
+                        newTotalInvestedSek, tickerId, avanzaDetails.accountId)
+
+                    break
+        finally:
+            if openOrderId is not None:
+                self.deleteOrderSafe(avanzaDetails.accountId, openOrderId)
+            if reservationId is not None:
+                self.buyingPower.release(reservationId, boughtSek)
+
+        self.metrics.observe("tradingpal_transaction_retries", a)
 
     # ##############################################################################################################
-    # Performs a buy order. Returns the new number of stocks owned.
+    # Order value in SEK, with the exchange rate implied by the tradingpal prices
     # ##############################################################################################################
-    def doOneTransactionAndCheckResult(self, transactionType: TransactionType, countAtStart: int, expectedWhenDone: int, yahooTicker: str, accountId: str, tickerId: str, price: float, volume: int):
+    def orderCostSek(self, stock, price: float, volume: int):
+        return price * volume * stock.singleStockPriceSek / stock.priceOrigCurrancy
 
-        WAIT_SEC_FOR_COMPLETION = 3
+    # ##############################################################################################################
+    # Seeds the buying power ledger from the overview snapshot, see BuyingPowerLedger
+    # ##############################################################################################################
+    def seedBuyingPower(self):
+        try:
+            buyingPower, fetchedAt = self.avanzaHandler.getBuyingPower()
+            self.buyingPower.seed(buyingPower, fetchedAt)
+        except Exception as ex:
+            log.log(LogType.Trace, f"Could not seed buying power, {ex}")
+
+    # ##############################################################################################################
+    # Performs one order, or moves the open order amendOrderId to the new price. Returns the new number of stocks
+    # owned and the id of the order if it was left on the market, else None. An order is only left on the market if
+    # keepOnTimeout and nothing was transacted.
+    # ##############################################################################################################
+    def doOneTransactionAndCheckResult(self, transactionType: TransactionType, countAtStart: int, expectedWhenDone: int, yahooTicker: str, accountId: str, tickerId: str, price: float, volume: int,
+                                       amendOrderId: str = None, keepOnTimeout: bool = False):
 
         infoString = f"{yahooTicker}: tickerId: {tickerId}, transaction: {transactionType}, accountId {accountId}, price: {price}, volume {volume}, expectedWhenDone: {expectedWhenDone}, countAtStart: {countAtStart}"
-        log.log(LogType.Audit, f"Placing Avanza order: {infoString}")
 
-        retVal = self.avanzaHandler.placeOrder(yahooTicker, accountId, tickerId, transactionType, price, volume)
+        retVal = None
+        if amendOrderId is not None:
+            # A deal after the order was kept ends the transaction, the order is not moved
+            dealtVolume = self.avanzaHandler.getDealtVolume(amendOrderId)
+            if dealtVolume > 0:
+                self.deleteOrderSafe(accountId, amendOrderId)
+                newCount = self.countAfterDeals(transactionType, countAtStart, dealtVolume)
+                log.log(LogType.Audit, f"Avanza order transacted before it could be edited. Current: {newCount}: {infoString}")
+                return newCount, None
+
+            log.log(LogType.Audit, f"Editing Avanza order {amendOrderId}: {infoString}")
+            retVal = self.amendOrder(accountId, amendOrderId, tickerId, transactionType, price, volume - dealtVolume)
+
+            if retVal is None:
+                # Deleted instead. It may have been filled just before.
+                avanzaDetails = self.avanzaHandler.getTickerDetails(tickerId, bypassCache=True)
+                if avanzaDetails.currentCount != countAtStart:
+                    log.log(LogType.Audit, f"Avanza order transacted before it could be edited. Current: {avanzaDetails.currentCount}: {infoString}")
+                    return avanzaDetails.currentCount, None
+
+        if retVal is None:
+            log.log(LogType.Audit, f"Placing Avanza order: {infoString}")
+            retVal = self.avanzaHandler.placeOrder(yahooTicker, accountId, tickerId, transactionType, price, volume)
 
         if "blockPurchase" in retVal and retVal["blockPurchase"] is True:
             print("Blocking all purchases due to message from Avanza!")
@@ -135,7 +299,7 @@ class MainBroker:
 
         if "blockTransactions" in retVal and retVal["blockTransactions"] is True:
             print("Blocking all transactions due to message from Avanza!")
-            self.blockTransactions = True
+            self.doBlockTransactions()
             raise RuntimeError()
 
         if retVal is None or 'orderRequestStatus' not in retVal or retVal['orderRequestStatus'] != "SUCCESS":
@@ -143,71 +307,139 @@ class MainBroker:
             self.avanzaHandler.deleteOrder(accountId, retVal['orderId'])
             raise RuntimeError()
 
-        for a in range(WAIT_SEC_FOR_COMPLETION):
-            avanzaDetails = self.avanzaHandler.getTickerDetails(tickerId)
-            if avanzaDetails['currentCount'] == expectedWhenDone:
+        orderId = retVal['orderId']
+        log.log(LogType.Trace, f"{yahooTicker} {transactionType} order is on market.. Waiting...")
+
+        try:
+            orderResult = self.avanzaHandler.trackOrder(orderId, volume).result(timeout=WAIT_SEC_FOR_COMPLETION)
+        except concurrent.futures.TimeoutError:
+            orderResult = None
+
+        if orderResult is not None and orderResult.status == OrderStatus.Filled:
+            self.metrics.inc("tradingpal_orders_total", {"result": "filled"})
+            self.metrics.observe("tradingpal_order_fill_seconds", orderResult.fillTimeSec)
+        else:
+            self.metrics.inc("tradingpal_orders_total", {"result": "timeout" if orderResult is None else "closed"})
+
+        # The deals are known before the position is updated, a filled order must never be retried
+        if orderResult is not None and orderResult.filledVolume > 0:
+            newCount = self.countAfterDeals(transactionType, countAtStart, orderResult.filledVolume)
+            if orderResult.status == OrderStatus.Filled:
                 log.log(LogType.Audit, f"(1) Avanza order succesfull: {infoString}")
-                return avanzaDetails['currentCount']
+            else:
+                log.log(LogType.Audit, f"Avanza order partly transacted. Current: {newCount}: {infoString}")
+            return newCount, None
 
-            log.log(LogType.Trace, f"{yahooTicker} {transactionType} order is on market.. Waiting...")
-            time.sleep(1)
+        if orderResult is None:
+            self.avanzaHandler.untrackOrder(orderId)
 
-        log.log(LogType.Trace, f"{yahooTicker} {transactionType} Failed to transact stock in {WAIT_SEC_FOR_COMPLETION} seconds. deleting order")
+            # Only an order without any deal is kept, so it can be moved with its full volume
+            if keepOnTimeout and self.avanzaHandler.getDealtVolume(orderId) == 0:
+                log.log(LogType.Trace, f"{yahooTicker} {transactionType} Not transacted in {WAIT_SEC_FOR_COMPLETION} seconds. Keeping order {orderId} for repricing")
+                return countAtStart, orderId
 
-        try:
-            self.avanzaHandler.deleteOrder(accountId, retVal['orderId'])
-        except Exception:
-            log.log(LogType.Trace, "Could not delete order... Ignoring")
+            log.log(LogType.Trace, f"{yahooTicker} {transactionType} Failed to transact stock in {WAIT_SEC_FOR_COMPLETION} seconds. deleting order")
+            self.deleteOrderSafe(accountId, orderId)
+
+            dealtVolume = self.avanzaHandler.getDealtVolume(orderId)
+            if dealtVolume > 0:
+                newCount = self.countAfterDeals(transactionType, countAtStart, dealtVolume)
+                log.log(LogType.Audit, f"Avanza order partly transacted. Current: {newCount}: {infoString}")
+                return newCount, None
 
-        time.sleep(1)
-        avanzaDetails = self.avanzaHandler.getTickerDetails(tickerId)
+            time.sleep(1)
+
+        avanzaDetails = self.avanzaHandler.getTickerDetails(tickerId, bypassCache=True)
 
-        if avanzaDetails['currentCount'] == expectedWhenDone:
+        if avanzaDetails.currentCount == expectedWhenDone:
             log.log(LogType.Audit, f"(2) Avanza order succesfull: {infoString}")
-        elif avanzaDetails['currentCount'] == countAtStart:
+        elif avanzaDetails.currentCount == countAtStart:
             log.log(LogType.Audit, f"No stocks transacted: {infoString}")
         else:
-            log.log(LogType.Audit, f"Avanza order partly transacted. Current: {avanzaDetails['currentCount']}: {infoString}")
+            log.log(LogType.Audit, f"Avanza order partly transacted. Current: {avanzaDetails.currentCount}: {infoString}")
 
-        return avanzaDetails['currentCount']
+        return avanzaDetails.currentCount, None
 
     # ##############################################################################################################
-    # get sell price from best price (priceLevel == 1) to worst price (priceLevel == ~4)
+    # ...
     # ##############################################################################################################
+    def countAfterDeals(self, transactionType: TransactionType, countAtStart: int, dealtVolume: int):
+        return countAtStart + dealtVolume if transactionType == TransactionType.Buy else countAtStart - dealtVolume
 
-    def getNewStockPrice(self, transactionType :TransactionType, avanzaDetails, lastPrice: int):
-
-        if avanzaDetails['tick1Percent'] <= 0:
-            raise RuntimeError("tick1Percent not calculated for stock")
-
-        if transactionType == TransactionType.Buy:
-            newVal = float("%.4f" % (lastPrice + avanzaDetails['tick1Percent']))
-        else:
-            newVal = float("%.4f" % (lastPrice - avanzaDetails['tick1Percent']))
+    # ##############################################################################################################
+    # Edits the open order. If that is not possible the order is deleted and None is returned, the caller then
+    # places a new one.
+    # ##############################################################################################################
+    def amendOrder(self, accountId: str, orderId: str, tickerId: str, transactionType: TransactionType, price: float, volume: int):
+        try:
+            retVal = self.avanzaHandler.editOrder(accountId, orderId, tickerId, transactionType, price, volume)
+            if retVal is not None and retVal.get('orderRequestStatus') == "SUCCESS":
+                self.metrics.inc("tradingpal_order_amends_total", {"result": "edited"})
+                return retVal
+            log.log(LogType.Trace, f"Could not edit order {orderId}: {retVal}")
+        except Exception as ex:
+            log.log(LogType.Trace, f"Could not edit order {orderId}, {ex}")
 
-        log.log(LogType.Trace, f"Changing bidValue: {transactionType} / from {lastPrice} to {newVal}")
-        return newVal
+        self.metrics.inc("tradingpal_order_amends_total", {"result": "replaced"})
+        self.deleteOrderSafe(accountId, orderId)
+        return None
 
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def deleteOrderSafe(self, accountId: str, orderId: str):
+        try:
+            self.avanzaHandler.deleteOrder(accountId, orderId)
+        except Exception:
+            log.log(LogType.Trace, "Could not delete order... Ignoring")
 
     # ##############################################################################################################
     # ...
     # ##############################################################################################################
     def sanityCheckStock(self, avanzaDetails, tradingPalDetails, transactionType):
 
-        sellPrice = avanzaDetails['sellPrice']
-        buyPrice = avanzaDetails['buyPrice']
-        avgPriceAvanza = (sellPrice + buyPrice) / 2
-        priceFromTradingPal = tradingPalDetails['priceOrigCurrancy']
+        localStatus = self.localSanityCheck(tradingPalDetails, transactionType)
+        if localStatus is not None:
+            raise RuntimeError(localStatus)
 
-        if transactionType == TransactionType.Buy:
-            numberToTransact = tradingPalDetails["numberToBuy"]
-        else:
-            numberToTransact = tradingPalDetails["numberToSell"]
+        return self.quoteSanityCheck(avanzaDetails, tradingPalDetails)
+
+    # ##############################################################################################################
+    # Tested. The checks that need only the tradingpal payload. Returns the reason to reject, or None.
+    # ##############################################################################################################
+    def localSanityCheck(self, tradingPalDetails, transactionType):
+
+        numberToTransact = tradingPalDetails.numberToBuy if transactionType == TransactionType.Buy else tradingPalDetails.numberToSell
+
+        for name in ['tickerName', 'singleStockPriceSek', 'priceOrigCurrancy', 'count', 'totalInvestedSek']:
+            if getattr(tradingPalDetails, name) is None:
+                return f"{name} missing from tradingpal"
+        if numberToTransact is None:
+            return f"number to {transactionType.name.lower()} missing from tradingpal"
+
+        if numberToTransact <= 0:
+            return f"number to {transactionType.name.lower()} is {numberToTransact}"
+        if tradingPalDetails.priceOrigCurrancy <= 0:
+            return f"price from tradingpal is {tradingPalDetails.priceOrigCurrancy}"
+        if (tradingPalDetails.singleStockPriceSek * numberToTransact) > MAX_ALLOWED_TRANSACTION_SIZE_SEK:
+            return f"Transaction to big!! single stock price SEK: {tradingPalDetails.singleStockPriceSek}, numberToTransact: {numberToTransact}"
+
+        return None
+
+    # ##############################################################################################################
+    # The checks that need the avanza quote
+    # ##############################################################################################################
+    def quoteSanityCheck(self, avanzaDetails, tradingPalDetails):
+
+        sellPrice = avanzaDetails.sellPrice
+        buyPrice = avanzaDetails.buyPrice
+        avgPriceAvanza = (sellPrice + buyPrice) / 2
+        priceFromTradingPal = tradingPalDetails.priceOrigCurrancy
 
         if sellPrice is None or buyPrice is None:
             raise RuntimeError(f"buy/sell price is None")
 
-        if avanzaDetails['secondsSinceUpdated'] > MAX_TIME_SINCE_STOCK_PRICE_UPDATED_SEC:
+        if avanzaDetails.secondsSinceUpdated > MAX_TIME_SINCE_STOCK_PRICE_UPDATED_SEC:
             return f"stockdata not updated within {MAX_TIME_SINCE_STOCK_PRICE_UPDATED_SEC} sec"
         if sellPrice == -1 or buyPrice == -1:
             return f"buy / sell data missing for stock. Market probably closed"
@@ -215,106 +447,297 @@ class MainBroker:
             raise RuntimeError(f"Stock sell / buy price is not reasonable {sellPrice} / {buyPrice}")
         if priceFromTradingPal < (0.9 * avgPriceAvanza) or priceFromTradingPal > (1.1 * avgPriceAvanza):
             raise RuntimeError(f"Stock price from tradingpal differs to much from avanza price. avanza: {avgPriceAvanza}, tradingPal: {priceFromTradingPal}")
-        if (tradingPalDetails['singleStockPriceSek'] * numberToTransact) > MAX_ALLOWED_TRANSACTION_SIZE_SEK:
-            raise RuntimeError(f"Transaction to big!! single stock price SEK: {tradingPalDetails['singleStockPriceSek']}, numberToTransact: {numberToTransact}")
         if buyPrice > sellPrice:
             raise RuntimeError(f"buyPrice {buyPrice} is less than sellPrice {sellPrice}")
         if (sellPrice / buyPrice) > MAX_SANITY_QUOTA_SELL_BUY:
             raise RuntimeError(f"sell/buy price: {sellPrice}/{buyPrice} > {MAX_SANITY_QUOTA_SELL_BUY}. Not reasonable...")
-        if avanzaDetails['currentCount'] != tradingPalDetails['currentStock']['count']:
+        if avanzaDetails.currentCount != tradingPalDetails.count:
             raise RuntimeError(f"Stock count in avanza does not match count from tradingPal. Abort")
 
         return None
 
+    # ##############################################################################################################
+    # Tested. Runs the local checks on a whole tradingpal list, before any lock or avanza call. Rejections are
+    # reported in one line. Each one counts as an exception, every cycle, like when they were found per stock:
+    # tradingpal sending bad data over and over shall use up the exception budget and stop trading.
+    # ##############################################################################################################
+    def preFilterStocks(self, stocks, transactionType: TransactionType):
+
+        if stocks is None:
+            return None
+
+        acceptedStocks = []
+        rejections = []
+        for stock in stocks:
+            status = self.localSanityCheck(stock, transactionType)
+            if status is None:
+                acceptedStocks.append(stock)
+            else:
+                rejections.append(f"{stock.tickerName}: {status}")
+                self.addEvent(EventType.Exception)
+
+        if len(rejections) > 0:
+            log.log(LogType.Audit, f"Rejected {len(rejections)} of {len(stocks)} stocks to {transactionType.name.lower()}: {'; '.join(rejections)}")
+
+        return acceptedStocks
+
     # ##############################################################################################################
     # ...
     # ##############################################################################################################
     def refreshAvanzaHandler(self):
 
+        # Sessions in active use are known to be alive, no need to ask avanza again
+        if self.sessionManager.isHealthy():
+            return
+
         self.addEvent(EventType.AvanzaErrors)
+        self.avanzaHandler = self.sessionManager.ensureSession()
+        self.resetEvent(EventType.AvanzaErrors)
 
-        try:
-            self.avanzaHandler.testAvanzaConnection()
-        except Exception:
-            log.log(LogType.Trace, "Need to refresh AvanzaHandler...")
-            self.avanzaHandler = AvanzaHandler(log).init()
-            self.avanzaHandler.testAvanzaConnection()
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def createAvanzaHandler(self):
+        avanzaHandler = AvanzaHandler(log).init()
+        avanzaHandler.orderTracker.loop = self.loop
+        avanzaHandler.overviewCache = self.overviewCache
+        avanzaHandler.orderBookStore = self.marketData.store
+        self.avanzaHandler = avanzaHandler
+        return avanzaHandler
 
-        self.resetEvent(EventType.AvanzaErrors)
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def getHealth(self):
+        return self.sessionManager.getHealth()
 
     # ##############################################################################################################
     # ...
     # ##############################################################################################################
     def run(self):
 
+        asyncio.run(self.runAsync())
+
+        print("Terminating!!!")
+        sys.exit()
+
+    # ##############################################################################################################
+    # The trading cycle. Blocking avanza/tradingpal calls run in the default executor, all waits are cancellable.
+    # ##############################################################################################################
+    async def runAsync(self):
+
+        self.loop = asyncio.get_running_loop()
+        self.wakeEvent = asyncio.Event()
+        self.avanzaHandler.orderTracker.loop = self.loop
+        overviewRefresher = asyncio.ensure_future(self.refreshOverviewPeriodically())
+        sharedStateServer = asyncio.ensure_future(self.serveSharedState()) if self.sharedState is not None else None
+
         log.log(LogType.Audit, "Starting up, test connections to trading pal algorithm...")
 
-        self.waitForConnectonToTradingPal()
+        await self.waitForConnectonToTradingPal()
 
         while not self.terminate:
 
-            time.sleep(60)
+            await self.sleep(60)
             print("Trading disabled waiting for code fix after new domain model from avanza api")
             continue
 
             if not self.marketsOpenDaytime():
-                log.log(LogType.Trace, "Markets closed...")
-                time.sleep(120)
+                sleepSec = self.marketCalendar.secondsUntilNextOpen()
+                log.log(LogType.Trace, f"Markets closed... Next market opens in {int(sleepSec)} sec")
+                await self.sleep(sleepSec)
                 continue
 
             if not self.areAllEventsOk():
                 log.log(LogType.Audit, f"To many events in one day. Stepping back... {self.events}")
-                time.sleep(3600)
+                await self.sleep(3600)
                 continue
 
+            stocksToBuy = self.preFilterStocks(self.filterOpenMarkets(await self.runBlocking(self.fetchTickers, BUY_PATH)), TransactionType.Buy)
+            stocksToSell = self.preFilterStocks(self.filterOpenMarkets(await self.runBlocking(self.fetchTickers, SELL_PATH)), TransactionType.Sell)
+            await self.runBlocking(self.prefetchTickerIds, [stocksToBuy, stocksToSell])
+            await self.subscribeMarketData([stocksToBuy, stocksToSell])
+
             try:
-                stocksToBuy = self.fetchTickers(BUY_PATH)
-                if self.blockTransactions is False and self.blockPurchases is False and stocksToBuy is not None and len(stocksToBuy['list']) > 0:
-                    self.doStocksTransaction(stocksToBuy['list'], TransactionType.Buy)
-                    time.sleep(120)
+                if self.blockTransactions is False and self.blockPurchases is False and stocksToBuy is not None and len(stocksToBuy) > 0:
+                    await self.runBlocking(self.doStocksTransaction, stocksToBuy, TransactionType.Buy)
+                    await self.sleep(120)
+                    # The sell list is outdated after buying. Its tickers are already resolved.
+                    stocksToSell = self.preFilterStocks(self.filterOpenMarkets(await self.runBlocking(self.fetchTickers, SELL_PATH)), TransactionType.Sell)
+                    await self.runBlocking(self.prefetchTickerIds, [stocksToSell])
+                    await self.subscribeMarketData([stocksToSell])
             except Exception as ex:
                 self.addEvent(EventType.Exception)
                 log.log(LogType.Trace, f"Exception during buy, {ex}")
 
             try:
-                stocksToSell = self.fetchTickers(SELL_PATH)
-                if self.blockTransactions is False and stocksToSell is not None and len(stocksToSell['list']) > 0:
-                    self.doStocksTransaction(stocksToSell['list'], TransactionType.Sell)
-                    time.sleep(120)
+                if self.blockTransactions is False and stocksToSell is not None and len(stocksToSell) > 0:
+                    await self.runBlocking(self.doStocksTransaction, stocksToSell, TransactionType.Sell)
+                    await self.sleep(120)
             except Exception as ex:
                 self.addEvent(EventType.Exception)
                 log.log(LogType.Trace, f"Exception during sell, {ex}")
 
-            time.sleep(60)
+            await self.sleep(60)
 
-        print("Terminating!!!")
-        sys.exit()
+        overviewRefresher.cancel()
+        if sharedStateServer is not None:
+            sharedStateServer.cancel()
+
+    # ##############################################################################################################
+    # Keeps the shared overview snapshot fresh, so /getfunds and the connection check do not call avanza
+    # ##############################################################################################################
+    async def refreshOverviewPeriodically(self):
+        while not self.terminate:
+            try:
+                await self.runBlocking(self.overviewCache.refreshIfOld)
+            except Exception as ex:
+                log.log(LogType.Trace, f"Could not refresh overview, {ex}")
+
+            await asyncio.sleep(self.overviewCache.refreshIntervalSec / 2)
+
+    # ##############################################################################################################
+    # Multi worker serving. Runs commands forwarded by the other workers and publishes what they serve.
+    # ##############################################################################################################
+    async def serveSharedState(self):
+        lastPublished = 0
+        while not self.terminate:
+            try:
+                for command in await self.runBlocking(self.sharedState.popCommands):
+                    self.handleSharedCommand(command)
+
+                if time.time() - lastPublished > SHARED_STATE_PUBLISH_INTERVAL_SEC:
+                    lastPublished = time.time()
+                    await self.runBlocking(self.publishSharedState)
+            except Exception as ex:
+                log.log(LogType.Trace, f"Could not serve shared state, {ex}")
+
+            await asyncio.sleep(SHARED_STATE_COMMAND_POLL_SEC)
+
+    # ##############################################################################################################
+    # Tested
+    # ##############################################################################################################
+    def handleSharedCommand(self, command: str):
+        log.log(LogType.Trace, f"Command from other worker: {command}")
+
+        if command == "blockPurchases":
+            self.doBlockPurchases()
+        elif command == "unblockPurchases":
+            self.doUnblockPurchases()
+        elif command == "terminate":
+            self.doTerminate()
+            if self.onTerminate is not None:
+                self.onTerminate()
+
+    # ##############################################################################################################
+    # Tested
+    # ##############################################################################################################
+    def publishSharedState(self):
+        self.sharedState.put("health", self.getHealth())
+        self.sharedState.put("metrics", self.getMetrics())
+
+        try:
+            self.sharedState.put("funds", self.getCurrentFunds())
+        except Exception as ex:
+            log.log(LogType.Trace, f"Could not publish funds, {ex}")
+
+        try:
+            self.avanzaHandler.transactionStore.sync(self.avanzaHandler.fetchTransactionsFrom)
+        except Exception as ex:
+            log.log(LogType.Trace, f"Could not sync transactions, {ex}")
 
     # ##############################################################################################################
     # ...
     # ##############################################################################################################
-    def waitForConnectonToTradingPal(self):
-        while True:
-            if self.fetchTickers(BUY_PATH) is not None:
+    async def runBlocking(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    # ##############################################################################################################
+    # Sleeps up to seconds. Returns at once when woken by wake(), e.g. on killswitch or unblock.
+    # ##############################################################################################################
+    async def sleep(self, seconds: float):
+
+        if self.terminate:
+            return
+
+        try:
+            await asyncio.wait_for(self.wakeEvent.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+        self.wakeEvent.clear()
+
+    # ##############################################################################################################
+    # Thread safe. Interrupts the current sleep of the trading loop.
+    # ##############################################################################################################
+    def wake(self):
+
+        if self.loop is None or self.wakeEvent is None:
+            return
+
+        try:
+            self.loop.call_soon_threadsafe(self.wakeEvent.set)
+        except RuntimeError:
+            pass
+
+    # ##############################################################################################################
+    # Resolve all tickers in the buy/sell lists up front, so no search latency lands on the order path
+    # ##############################################################################################################
+    def prefetchTickerIds(self, stockLists):
+
+        yahooTickers = []
+        for stocks in stockLists:
+            if stocks is not None:
+                yahooTickers += [stock.tickerName for stock in stocks if stock.tickerName is not None]
+
+        if len(yahooTickers) == 0:
+            return
+
+        try:
+            self.refreshAvanzaHandler()
+            self.avanzaHandler.resolveTickers(yahooTickers)
+        except Exception as ex:
+            log.log(LogType.Trace, f"Could not prefetch ticker ids, {ex}")
+
+    # ##############################################################################################################
+    # Streams quotes for the (already resolved) tickers in the lists, getTickerDetails is then served from the stream
+    # ##############################################################################################################
+    async def subscribeMarketData(self, stockLists):
+        tickerIds = []
+        for stocks in stockLists:
+            if stocks is not None:
+                tickerIds += [self.avanzaHandler.tickerIdCache.get(stock.tickerName) for stock in stocks]
+
+        try:
+            await self.marketData.subscribe(tickerIds)
+        except Exception as ex:
+            log.log(LogType.Trace, f"Could not subscribe to market data, {ex}")
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    async def waitForConnectonToTradingPal(self):
+        while not self.terminate:
+            if await self.runBlocking(self.fetchTickers, BUY_PATH) is not None:
                 log.log(LogType.Trace, "Connection to trading pal algorithm OK!")
                 break
             else:
                 log.log(LogType.Trace, f"Connection to tradingpal is still not OK. Retrying...")
-                time.sleep(15)
+                await self.sleep(15)
 
     # ##############################################################################################################
-    # ...
+    # The tradingpal list as TradeInstructions, None on failure
     # ##############################################################################################################
     def fetchTickers(self, path: str):
 
         try:
-            retData = requests.get(BASEURL + path)
+            retData = self.tradingPal.get(path)
 
             if retData.status_code != 200:
                 log.log(LogType.Trace, f"{datetime.datetime.utcnow()} Failed to fetch stocks... retrying")
                 time.sleep(20)
 
-            return json.loads(retData.content)
+            return TradeInstruction.parseList(json.loads(retData.content))
         except Exception as ex:
             log.log(LogType.Trace, f"{datetime.datetime.utcnow()} Failed to fetch tickers: {ex}")
             return None
@@ -322,7 +745,7 @@ class MainBroker:
     # ##############################################################################################################
     # ...
     # ##############################################################################################################
-    def updateStock(self, tickerName: str, boughtAt: float, soldAt: float, countAtStart: int, count: int, spent: int, lockKey: int, name: str, totalInvestedSek: int, tickerId):
+    def updateStock(self, tickerName: str, boughtAt: float, soldAt: float, countAtStart: int, count: int, spent: int, lockKey: int, name: str, totalInvestedSek: int, tickerId, accountId: str = None):
 
         body = {
             'ticker': tickerName,
@@ -335,18 +758,150 @@ class MainBroker:
             'tradedByBot': True
         }
 
+        registerData = {'countAtStart': countAtStart, 'spent': spent, 'avanzaTickerId': tickerId, 'accountId': accountId}
+
+        # The trade is registered as soon as it is done, a killswitch or crash before the flush must not lose it
+        log.log(LogType.Register, {**body, **registerData})
+        self.tradeRegister.append({**body, **registerData})
+
+        # Sent to tradingpal in one batch by flushStockUpdates, once per doStocksTransaction
+        with self.stateLock:
+            self.pendingStockUpdates.append(body)
+
+    # ##############################################################################################################
+    # Posts the pending updates to tradingpal. If the batch call fails each stock is posted on its own, a failure
+    # for one stock does not stop the others.
+    # ##############################################################################################################
+    def flushStockUpdates(self):
+
+        with self.stateLock:
+            bodies = self.pendingStockUpdates
+            self.pendingStockUpdates = []
+
+        if len(bodies) == 0:
+            return
+
+        if self.batchSupported:
+            try:
+                failed = self.postBatch("updateStocks", {"stocks": bodies})
+            except Exception as ex:
+                log.log(LogType.Trace, f"updateStocks failed, posting one stock at a time, {ex}")
+                failed = None
+
+            if failed is not None:
+                if len(failed) > 0:
+                    self.addEvent(EventType.Exception)
+                    log.log(LogType.Trace, f"Failed to update stocks {failed}")
+                return
+
+        failedTickers = []
+        for body in bodies:
+            try:
+                self.postStockUpdate(body)
+            except Exception:
+                failedTickers.append(body['ticker'])
+
+        if len(failedTickers) > 0:
+            self.addEvent(EventType.Exception)
+            log.log(LogType.Trace, f"Failed to update stocks {failedTickers}")
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def postStockUpdate(self, body):
+
         try:
-            retData = requests.post(BASEURL + "updateStock", json=body)
+            retData = self.tradingPal.post("updateStock", body)
             if retData.status_code != 200:
-                raise RuntimeError(f"Failed to update stock {tickerName}, {retData.content}")
+                raise RuntimeError(f"Failed to update stock {body['ticker']}, {retData.content}")
         except Exception as ex:
-            log.log(LogType.Trace, f"Failed to update stock {tickerName}, {ex}")
+            log.log(LogType.Trace, f"Failed to update stock {body['ticker']}, {ex}")
             raise ex
-        finally:
-            body['countAtStart'] = countAtStart
-            body['spent'] = spent
-            body['avanzaTickerId'] = tickerId
-            log.log(LogType.Register, body)
+
+    # ##############################################################################################################
+    # Locks as many of the tickers as possible. Returns {ticker: lockKey} for the ones that got locked.
+    # ##############################################################################################################
+    def lockStocks(self, tickers):
+
+        if len(tickers) == 0:
+            return {}
+
+        if self.batchSupported:
+            try:
+                retData = self.tradingPal.post("lockBatch", {"tickers": tickers})
+                if retData.status_code == 200:
+                    reply = json.loads(retData.content)
+                    if len(reply.get('failed', {})) > 0:
+                        log.log(LogType.Trace, f"Could not lock stocks: {reply['failed']}")
+                    return reply.get('locks', {})
+                self.checkBatchSupported(retData, "lockBatch")
+            except Exception as ex:
+                log.log(LogType.Trace, f"Failed to lock stocks {tickers}, {ex}")
+                raise ex
+
+        locks = {}
+        for ticker in tickers:
+            if ticker in locks:
+                continue
+            try:
+                locks[ticker] = self.lockStock(ticker)
+            except Exception:
+                pass
+
+        return locks
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def unlockStocks(self, locks):
+
+        if len(locks) == 0:
+            return
+
+        try:
+            if self.batchSupported:
+                failed = self.postBatch("unlockBatch", {"locks": [{"ticker": ticker, "lockKey": lockKey} for ticker, lockKey in locks.items()]})
+                if failed is not None:
+                    if len(failed) > 0:
+                        raise RuntimeError(f"Failed to unlock stocks {failed}")
+                    return
+
+            failed = []
+            for ticker, lockKey in locks.items():
+                try:
+                    self.unlockStock(ticker, lockKey)
+                except Exception:
+                    failed.append(ticker)
+
+            if len(failed) > 0:
+                raise RuntimeError(f"Failed to unlock stocks {failed}")
+        except Exception as ex:
+            self.addEvent(EventType.Exception)
+            log.log(LogType.Trace, f"Failed to unlock stocks, {ex}")
+
+    # ##############################################################################################################
+    # Returns the failed entries of a batch call, or None if tradingpal does not support batch calls
+    # ##############################################################################################################
+    def postBatch(self, endpoint: str, body):
+
+        retData = self.tradingPal.post(endpoint, body)
+        if retData.status_code == 200:
+            return json.loads(retData.content).get('failed', {})
+
+        self.checkBatchSupported(retData, endpoint)
+        return None
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def checkBatchSupported(self, retData, endpoint: str):
+
+        if retData.status_code == 404:
+            log.log(LogType.Trace, f"tradingpal does not support {endpoint}, falling back to one call per stock")
+            self.batchSupported = False
+            return
+
+        raise RuntimeError(f"{endpoint} failed, {retData.status_code} {retData.content}")
 
     # ##############################################################################################################
     # ...
@@ -354,7 +909,7 @@ class MainBroker:
     def lockStock(self, ticker: str):
 
         try:
-            retData = requests.post(BASEURL + "lock", json= {"ticker": ticker})
+            retData = self.tradingPal.post("lock", {"ticker": ticker})
             if retData.status_code != 200:
                 raise RuntimeError(f"Failed to lock stock {ticker}, {retData.content}")
             return json.loads(retData.content)['lockKey']
@@ -371,7 +926,7 @@ class MainBroker:
             return
 
         try:
-            retData = requests.post(BASEURL + "unlock", json= {"ticker": ticker, "lockKey": lockKey})
+            retData = self.tradingPal.post("unlock", {"ticker": ticker, "lockKey": lockKey})
             if retData.status_code != 200:
                 raise RuntimeError(f"Failed to unlock stock {ticker}, {retData.content}")
         except Exception as ex:
@@ -382,72 +937,108 @@ class MainBroker:
     # ...
     # ##############################################################################################################
     def marketsOpenDaytime(self):
+        return self.marketCalendar.anyOpen()
 
-        hour = datetime.datetime.now(pytz.timezone('Europe/Stockholm')).hour
-        weekday = datetime.datetime.now(pytz.timezone('Europe/Stockholm')).weekday()
+    # ##############################################################################################################
+    # Tested. Drops stocks on closed markets from a tradingpal list, before anything is asked from avanza
+    # ##############################################################################################################
+    def filterOpenMarkets(self, stocks):
 
-        return (hour >= MARKET_OPEN_HOUR and hour < MARKET_CLOSE_HOUR) and (weekday >= 0 and weekday <= 4)
+        if stocks is None:
+            return None
+
+        openStocks = []
+        for stock in stocks:
+            tickerAndFlagCode = self.avanzaHandler.yahooTickerToAvanzaTicker(stock.tickerName)
+            if tickerAndFlagCode is not None and not self.marketCalendar.isOpen(tickerAndFlagCode[1]):
+                log.log(LogType.Trace, f"Market closed for {stock.tickerName}, skipping")
+                continue
+            openStocks.append(stock)
+
+        return openStocks
 
     # ##############################################################################################################
     # ...
     # ##############################################################################################################
     def resetEventCounters(self):
 
-        self.events = {
-            "day": datetime.datetime.now(pytz.timezone('Europe/Stockholm')).day,
-            EventType.AvanzaTransaction: {"count": 0, "maxAllowed": 10},
-            EventType.AvanzaErrors: {"count": 0, "maxAllowed": 10},
-            EventType.Exception: {"count": 0, "maxAllowed": 20}
-        }
+        with self.stateLock:
+            self.events = {
+                "day": TimeUtils.now().day,
+                EventType.AvanzaTransaction: {"count": 0, "maxAllowed": 10},
+                EventType.AvanzaErrors: {"count": 0, "maxAllowed": 10},
+                EventType.Exception: {"count": 0, "maxAllowed": 20}
+            }
 
-        self.blockTransactions = False
+            self.blockTransactions = False
 
     # ##############################################################################################################
     # ...
     # ##############################################################################################################
     def refreshEventCounter(self):
 
-        if self.events is None:
-            self.resetEventCounters()
-            return
+        with self.stateLock:
+            if self.events is None:
+                self.resetEventCounters()
+                return
 
-        if self.events['day'] != datetime.datetime.now(pytz.timezone('Europe/Stockholm')).day:
-            self.resetEventCounters()
+            if self.events['day'] != TimeUtils.now().day:
+                self.resetEventCounters()
 
     # ##############################################################################################################
     # ...
     # ##############################################################################################################
     def addEvent(self, event: EventType):
 
-        self.refreshEventCounter()
-        self.events[event]["count"] += 1
+        with self.stateLock:
+            self.refreshEventCounter()
+            self.events[event]["count"] += 1
 
     # ##############################################################################################################
     # ...
     # ##############################################################################################################
     def resetEvent(self, event: EventType):
-        self.refreshEventCounter()
-        self.events[event]['count'] = 0
+        with self.stateLock:
+            self.refreshEventCounter()
+            self.events[event]['count'] = 0
 
     # ##############################################################################################################
     # ...
     # ##############################################################################################################
     def isEventAllowed(self, event: EventType):
 
-        self.refreshEventCounter()
-        return self.events[event]['count'] <= self.events[event]['maxAllowed']
+        with self.stateLock:
+            self.refreshEventCounter()
+            return self.events[event]['count'] <= self.events[event]['maxAllowed']
 
     # ##############################################################################################################
     # ...
     # ##############################################################################################################
     def areAllEventsOk(self):
-        for event, data in self.events.items():
+        with self.stateLock:
+            for event, data in list(self.events.items()):
+
+                if event in EventType:
+                    if not self.isEventAllowed(event):
+                        return False
 
-            if event in EventType:
-                if not self.isEventAllowed(event):
-                    return False
+            return True
 
-        return True
+    # ##############################################################################################################
+    # Metrics collector, copies the event counters to gauges
+    # ##############################################################################################################
+    def collectEventMetrics(self):
+        with self.stateLock:
+            for event, data in list(self.events.items()):
+                if isinstance(event, EventType):
+                    self.metrics.set("tradingpal_events", data["count"], {"event": event.name})
+                    self.metrics.set("tradingpal_events_max_allowed", data["maxAllowed"], {"event": event.name})
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def getMetrics(self):
+        return self.metrics.render()
 
     # ##############################################################################################################
     # ...
@@ -459,39 +1050,70 @@ class MainBroker:
     # ##############################################################################################################
     # ...
     # ##############################################################################################################
-    def getYieldByDate(self, date: str):
+    def getYieldByDate(self, date: str, toDate: str = None):
+        self.refreshAvanzaHandler()
+        return self.avanzaHandler.getYield(date, toDate)
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def getTaxByDate(self, date: str, toDate: str = None):
         self.refreshAvanzaHandler()
-        return self.avanzaHandler.getYield(date)
+        return self.avanzaHandler.getTax(date, toDate)
 
     # ##############################################################################################################
     # ...
     # ##############################################################################################################
-    def getTaxByDate(self, date: str):
+    def getTransactionSummary(self, fromDate: str, toDate: str, types):
         self.refreshAvanzaHandler()
-        return self.avanzaHandler.getTax(date)
+        return self.avanzaHandler.getTransactionSummary(fromDate, toDate, types)
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def getTradeRegister(self, ticker: str = None, accountId: str = None, fromDate: str = None, toDate: str = None):
+        return {
+            "trades": self.tradeRegister.query(ticker, accountId, fromDate, toDate),
+            "profitAndLoss": self.tradeRegister.getProfitAndLoss(ticker, accountId, fromDate, toDate)
+        }
 
     # ##############################################################################################################
     # ...
     # ##############################################################################################################
     def doBlockPurchases(self):
         log.log(LogType.Trace, "BLOCKING ALL PURCHASES!")
-        self.blockPurchases = True
+        with self.stateLock:
+            self.blockPurchases = True
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def doBlockTransactions(self):
+        log.log(LogType.Trace, "BLOCKING ALL TRANSACTIONS!")
+        with self.stateLock:
+            self.blockTransactions = True
 
     # ##############################################################################################################
     # ...
     # ##############################################################################################################
     def doUnblockPurchases(self):
         log.log(LogType.Trace, "UN-BLOCKING ALL PURCHASES!")
-        self.resetEventCounters()
-        self.blockPurchases = False
-        self.blockTransactions = False
+        with self.stateLock:
+            self.resetEventCounters()
+            self.blockPurchases = False
+            self.blockTransactions = False
+
+        self.wake()
 
     # ##############################################################################################################
     # ...
     # ##############################################################################################################
     def doTerminate(self):
         log.log(LogType.Trace, "KILLSWITCH PULLED: TERMINATING!")
-        self.terminate = True
+        with self.stateLock:
+            self.terminate = True
+
+        self.wake()
 
 # ##############################################################################################################
 # ...
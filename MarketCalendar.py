@@ -0,0 +1,160 @@
+import bisect, datetime, json, os, time, pytz
+
+# Regular trading sessions per avanza flag code, see AvanzaHandler.yahooTickerToAvanzaTicker
+MARKET_SESSIONS = {
+    'SE': ('Europe/Stockholm', "09:00", "17:30"),
+    'NO': ('Europe/Oslo', "09:00", "16:20"),
+    'FI': ('Europe/Helsinki', "10:00", "18:30"),
+    'DK': ('Europe/Copenhagen', "09:00", "17:00"),
+    'DE': ('Europe/Berlin', "09:00", "17:30"),
+    'CA': ('America/Toronto', "09:30", "16:00"),
+    'US': ('America/New_York', "09:30", "16:00"),
+}
+
+# Holidays on the same date every year. Moving holidays (easter, midsummer, thanksgiving...) go in the json file
+# TP_MARKET_HOLIDAYS: {"SE": ["2026-04-03", ...], ...}
+FIXED_MARKET_HOLIDAYS = {
+    'SE': ["01-01", "01-06", "05-01", "06-06", "12-24", "12-25", "12-26", "12-31"],
+    'NO': ["01-01", "05-01", "05-17", "12-24", "12-25", "12-26", "12-31"],
+    'FI': ["01-01", "01-06", "05-01", "12-06", "12-24", "12-25", "12-26", "12-31"],
+    'DK': ["01-01", "06-05", "12-24", "12-25", "12-26", "12-31"],
+    'DE': ["01-01", "05-01", "12-24", "12-25", "12-26", "12-31"],
+    'CA': ["01-01", "07-01", "12-25", "12-26"],
+    'US': ["01-01", "06-19", "07-04", "12-25"],
+}
+MARKET_HOLIDAYS_PATH = os.getenv('TP_MARKET_HOLIDAYS', "/passwords/marketHolidays.json")
+
+# Sessions are precomputed this many days ahead
+CALENDAR_DAYS = 14
+
+# Returned by secondsUntilNextOpen when no market opens within the calendar
+NO_OPEN_SLEEP_SEC = 3600
+
+class MarketCalendar:
+
+    # ##############################################################################################################
+    # Precomputed trading sessions per market, clipped to the hours the broker trades at all (window)
+    # ##############################################################################################################
+    def __init__(self, window = ('Europe/Stockholm', 9, 23), sessions = None, holidays = None, days: int = CALENDAR_DAYS):
+        self.window = window
+        self.sessions = sessions if sessions is not None else MARKET_SESSIONS
+        self.holidays = holidays if holidays is not None else self.readHolidays()
+        self.days = days
+        self.opens = {}
+        self.closes = {}
+        self.validFrom = 0
+        self.validUntil = 0
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def readHolidays(self):
+        holidays = {flagCode: set() for flagCode in MARKET_SESSIONS}
+
+        try:
+            if os.path.isfile(MARKET_HOLIDAYS_PATH):
+                with open(MARKET_HOLIDAYS_PATH, "r") as jsonFile:
+                    for flagCode, dates in json.load(jsonFile).items():
+                        holidays.setdefault(flagCode, set()).update(dates)
+        except Exception as ex:
+            print(f"Could not read market holidays from {MARKET_HOLIDAYS_PATH}, {ex}")
+
+        return holidays
+
+    # ##############################################################################################################
+    # Tested
+    # ##############################################################################################################
+    def isHoliday(self, flagCode: str, date: datetime.date):
+        return date.weekday() >= 5 or date.strftime("%m-%d") in FIXED_MARKET_HOLIDAYS.get(flagCode, []) or \
+               date.isoformat() in self.holidays.get(flagCode, ())
+
+    # ##############################################################################################################
+    # Sessions as sorted epoch seconds, from yesterday and days ahead
+    # ##############################################################################################################
+    def build(self, now: float):
+        windowZone = pytz.timezone(self.window[0])
+        opens = {}
+        closes = {}
+
+        for flagCode, (zoneName, openTime, closeTime) in self.sessions.items():
+            zone = pytz.timezone(zoneName)
+            today = datetime.datetime.fromtimestamp(now, zone).date()
+            opens[flagCode] = []
+            closes[flagCode] = []
+
+            for dayOffset in range(-1, self.days + 1):
+                date = today + datetime.timedelta(days=dayOffset)
+                if self.isHoliday(flagCode, date):
+                    continue
+
+                sessionOpen = self.toEpoch(zone, date, openTime)
+                sessionClose = self.toEpoch(zone, date, closeTime)
+
+                windowDate = datetime.datetime.fromtimestamp(sessionOpen, windowZone).date()
+                sessionOpen = max(sessionOpen, self.toEpoch(windowZone, windowDate, f"{self.window[1]:02}:00"))
+                sessionClose = min(sessionClose, self.toEpoch(windowZone, windowDate, f"{self.window[2]:02}:00"))
+
+                if sessionOpen < sessionClose:
+                    opens[flagCode].append(sessionOpen)
+                    closes[flagCode].append(sessionClose)
+
+        self.opens = opens
+        self.closes = closes
+        self.validFrom = now
+        self.validUntil = now + (self.days - 1) * 86400
+
+    @staticmethod
+    def toEpoch(zone, date: datetime.date, hourMinute: str):
+        hour, minute = hourMinute.split(":")
+        return zone.localize(datetime.datetime(date.year, date.month, date.day, int(hour), int(minute))).timestamp()
+
+    def ensureBuilt(self, now: float):
+        if now < self.validFrom or now >= self.validUntil:
+            self.build(now)
+
+    # ##############################################################################################################
+    # Tested. Markets we have no calendar for are open whenever the broker trades
+    # ##############################################################################################################
+    def isOpen(self, flagCode: str, now: float = None):
+        now = now if now is not None else time.time()
+        self.ensureBuilt(now)
+
+        if flagCode not in self.opens:
+            return self.isWindowOpen(now)
+
+        index = bisect.bisect_right(self.opens[flagCode], now) - 1
+        return index >= 0 and now < self.closes[flagCode][index]
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def isWindowOpen(self, now: float):
+        windowTime = datetime.datetime.fromtimestamp(now, pytz.timezone(self.window[0]))
+        return self.window[1] <= windowTime.hour < self.window[2] and windowTime.weekday() <= 4
+
+    # ##############################################################################################################
+    # Tested
+    # ##############################################################################################################
+    def anyOpen(self, flagCodes = None, now: float = None):
+        flagCodes = flagCodes if flagCodes is not None else self.sessions.keys()
+        return any(self.isOpen(flagCode, now) for flagCode in flagCodes)
+
+    # ##############################################################################################################
+    # Tested. 0 if any of the markets is open now
+    # ##############################################################################################################
+    def secondsUntilNextOpen(self, flagCodes = None, now: float = None):
+        now = now if now is not None else time.time()
+        self.ensureBuilt(now)
+        flagCodes = flagCodes if flagCodes is not None else self.sessions.keys()
+
+        if self.anyOpen(flagCodes, now):
+            return 0
+
+        nextOpens = []
+        for flagCode in flagCodes:
+            opens = self.opens.get(flagCode, [])
+            index = bisect.bisect_right(opens, now)
+            if index < len(opens):
+                nextOpens.append(opens[index])
+
+        return min(nextOpens) - now if len(nextOpens) > 0 else NO_OPEN_SLEEP_SEC
@@ -0,0 +1,131 @@
+import threading, time
+from Logger import LogType
+import TimeUtils
+
+try:
+    from avanza import ChannelType
+    QUOTES_CHANNEL = ChannelType.QUOTES
+    ORDER_DEPTH_CHANNEL = ChannelType.ORDERDEPTHS
+except ImportError:
+    QUOTES_CHANNEL = "quotes"
+    ORDER_DEPTH_CHANNEL = "orderdepths"
+
+# Streamed quotes not updated for this long are not used, getTickerDetails falls back to get_stock_info
+MARKET_DATA_MAX_AGE_SEC = 60
+
+class OrderBookStore:
+
+    # ##############################################################################################################
+    # Latest streamed quote and order depth per orderbook id
+    # ##############################################################################################################
+    def __init__(self, maxAgeSec: float = MARKET_DATA_MAX_AGE_SEC):
+        self.maxAgeSec = maxAgeSec
+        self.lock = threading.Lock()
+        self.books = {}
+
+    # ##############################################################################################################
+    # Tested
+    # ##############################################################################################################
+    def applyQuote(self, orderbookId: str, data):
+        with self.lock:
+            book = self.books.setdefault(str(orderbookId), {'orderDepthLevels': []})
+            for key in ('buyPrice', 'sellPrice', 'lastPrice', 'highestPrice', 'lowestPrice'):
+                if data.get(key) is not None:
+                    book[key] = data[key]
+            book['lastUpdatedMs'] = data.get('lastUpdated', data.get('updated', time.time() * 1000))
+            book['received'] = time.monotonic()
+
+    # ##############################################################################################################
+    # Tested. Accepts levels as buySide/sellSide or buy/sell
+    # ##############################################################################################################
+    def applyOrderDepth(self, orderbookId: str, data):
+        levels = []
+        for level in data.get('levels', []):
+            buy = level.get('buySide', level.get('buy'))
+            sell = level.get('sellSide', level.get('sell'))
+            if buy is not None and sell is not None:
+                levels.append({'buy': {'price': buy.get('price'), 'volume': buy.get('volume')},
+                               'sell': {'price': sell.get('price'), 'volume': sell.get('volume')}})
+
+        with self.lock:
+            book = self.books.setdefault(str(orderbookId), {'orderDepthLevels': []})
+            book['orderDepthLevels'] = levels
+
+    # ##############################################################################################################
+    # Tested. The fields of a get_stock_info reply that we use, without positions. None if no fresh quote.
+    # ##############################################################################################################
+    def getStockInfo(self, orderbookId: str):
+        with self.lock:
+            book = self.books.get(str(orderbookId))
+            if book is None or 'received' not in book or time.monotonic() - book['received'] > self.maxAgeSec:
+                return None
+            book = dict(book)
+
+        book.pop('received')
+        book['lastPriceUpdated'] = TimeUtils.formatTimestamp(book.pop('lastUpdatedMs') / 1000)
+        return book
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def retain(self, orderbookIds):
+        orderbookIds = set(str(orderbookId) for orderbookId in orderbookIds)
+        with self.lock:
+            for orderbookId in list(self.books.keys()):
+                if orderbookId not in orderbookIds:
+                    del self.books[orderbookId]
+
+class MarketDataStream:
+
+    # ##############################################################################################################
+    # Keeps quote and order depth subscriptions for the tickers in the current buy/sell lists and feeds the store.
+    # getClient() returns the object with subscribe_to_id, normally the current avanza client. All subscribing
+    # happens on the asyncio loop.
+    # ##############################################################################################################
+    def __init__(self, log, getClient, store: OrderBookStore = None):
+        self.log = log
+        self.getClient = getClient
+        self.store = store if store is not None else OrderBookStore()
+        self.client = None
+        self.subscribed = set()
+        self.wanted = set()
+
+    # ##############################################################################################################
+    # Tested. Subscribes to new ids, again to all if the client changed (new login). Unused ids are dropped from
+    # the store, their messages are ignored.
+    # ##############################################################################################################
+    async def subscribe(self, orderbookIds):
+        self.wanted = set(str(orderbookId) for orderbookId in orderbookIds if orderbookId is not None)
+        self.store.retain(self.wanted)
+
+        client = self.getClient()
+        if client is None or not hasattr(client, 'subscribe_to_id'):
+            return
+
+        if client is not self.client:
+            self.client = client
+            self.subscribed = set()
+
+        for orderbookId in sorted(self.wanted - self.subscribed):
+            try:
+                await client.subscribe_to_id(QUOTES_CHANNEL, orderbookId, self.onMessage)
+                await client.subscribe_to_id(ORDER_DEPTH_CHANNEL, orderbookId, self.onMessage)
+                self.subscribed.add(orderbookId)
+            except Exception as ex:
+                self.log.log(LogType.Trace, f"Could not subscribe to market data for {orderbookId}, {ex}")
+
+    # ##############################################################################################################
+    # Tested. Stream callback, message: {'channel': '/quotes/5479', 'data': {...}}
+    # ##############################################################################################################
+    def onMessage(self, message):
+        try:
+            channel, orderbookId = message['channel'].strip('/').split('/')[:2]
+            if orderbookId not in self.wanted:
+                return
+
+            if channel == "quotes":
+                self.store.applyQuote(orderbookId, message['data'])
+            elif channel == "orderdepths":
+                self.store.applyOrderDepth(orderbookId, message['data'])
+        except Exception as ex:
+            self.log.log(LogType.Trace, f"Malformed market data message {message}, {ex}")
@@ -0,0 +1,147 @@
+import threading
+
+# Latency buckets for calls to avanza, seconds
+AVANZA_CALL_BUCKETS_SEC = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Order fill time buckets, seconds. Orders not filled in 3 seconds are deleted.
+ORDER_FILL_BUCKETS_SEC = (0.25, 0.5, 1.0, 1.5, 2.0, 3.0)
+
+# Number of retries (price steps) before an order was filled, or the last attempt was done
+TRANSACTION_RETRY_BUCKETS = (0, 1, 2)
+
+sharedMetrics = None
+sharedMetricsLock = threading.Lock()
+
+class Metrics:
+
+    # ##############################################################################################################
+    # Counters, gauges and histograms, rendered in the prometheus text format
+    # ##############################################################################################################
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self.collectors = []
+
+        self.describe("tradingpal_avanza_call_seconds", "histogram", "Latency of calls to avanza", AVANZA_CALL_BUCKETS_SEC)
+        self.describe("tradingpal_avanza_call_errors_total", "counter", "Calls to avanza that raised")
+        self.describe("tradingpal_ticker_id_cache_total", "counter", "tickerToId lookups by result: hit, index or search")
+        self.describe("tradingpal_order_fill_seconds", "histogram", "Time from placing an order until it was filled", ORDER_FILL_BUCKETS_SEC)
+        self.describe("tradingpal_orders_total", "counter", "Placed orders by result: filled or timeout")
+        self.describe("tradingpal_buying_power_rejections_total", "counter", "Buys not placed for lack of reserved buying power")
+        self.describe("tradingpal_order_amends_total", "counter", "Repriced orders by result: edited or replaced (deleted and placed again)")
+        self.describe("tradingpal_transaction_retries", "histogram", "Retries per transaction in doOneTransactionWithRetries", TRANSACTION_RETRY_BUCKETS)
+        self.describe("tradingpal_events", "gauge", "MainBroker event counters for today")
+        self.describe("tradingpal_events_max_allowed", "gauge", "MainBroker max allowed events per day")
+
+    # ##############################################################################################################
+    # One registry shared by all AvanzaHandler instances and the broker
+    # ##############################################################################################################
+    @staticmethod
+    def getShared():
+        global sharedMetrics
+
+        with sharedMetricsLock:
+            if sharedMetrics is None:
+                sharedMetrics = Metrics()
+            return sharedMetrics
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def describe(self, name: str, type: str, help: str, buckets = None):
+        with self.lock:
+            self.metrics[name] = {"type": type, "help": help, "buckets": buckets, "values": {}}
+
+    # ##############################################################################################################
+    # collector() is called before each render, to set gauges from state kept elsewhere
+    # ##############################################################################################################
+    def addCollector(self, collector):
+        with self.lock:
+            self.collectors.append(collector)
+
+    # ##############################################################################################################
+    # Tested
+    # ##############################################################################################################
+    def inc(self, name: str, labels: dict = None, amount: float = 1):
+        key = self.labelsToKey(labels)
+        with self.lock:
+            values = self.metrics[name]["values"]
+            values[key] = values.get(key, 0) + amount
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def set(self, name: str, value: float, labels: dict = None):
+        key = self.labelsToKey(labels)
+        with self.lock:
+            self.metrics[name]["values"][key] = value
+
+    # ##############################################################################################################
+    # Tested
+    # ##############################################################################################################
+    def observe(self, name: str, value: float, labels: dict = None):
+        key = self.labelsToKey(labels)
+        with self.lock:
+            metric = self.metrics[name]
+            histogram = metric["values"].get(key)
+            if histogram is None:
+                histogram = {"buckets": [0] * len(metric["buckets"]), "sum": 0.0, "count": 0}
+                metric["values"][key] = histogram
+
+            for index, bound in enumerate(metric["buckets"]):
+                if value <= bound:
+                    histogram["buckets"][index] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    # ##############################################################################################################
+    # Current value of a counter or gauge, or {'buckets', 'sum', 'count'} of a histogram. None if never set.
+    # ##############################################################################################################
+    def get(self, name: str, labels: dict = None):
+        with self.lock:
+            value = self.metrics[name]["values"].get(self.labelsToKey(labels))
+            return dict(value, buckets=list(value["buckets"])) if isinstance(value, dict) else value
+
+    # ##############################################################################################################
+    # Observer for ObservedAvanza, see AvanzaHandler.callObservers
+    # ##############################################################################################################
+    def observeAvanzaCall(self, method: str, seconds: float, ex):
+        self.observe("tradingpal_avanza_call_seconds", seconds, {"method": method})
+        if ex is not None:
+            self.inc("tradingpal_avanza_call_errors_total", {"method": method})
+
+    # ##############################################################################################################
+    # Tested
+    # ##############################################################################################################
+    def render(self):
+        for collector in list(self.collectors):
+            collector()
+
+        lines = []
+        with self.lock:
+            for name, metric in self.metrics.items():
+                lines.append(f"# HELP {name} {metric['help']}")
+                lines.append(f"# TYPE {name} {metric['type']}")
+
+                for key, value in sorted(metric["values"].items()):
+                    if metric["type"] != "histogram":
+                        lines.append(f"{name}{self.formatLabels(key)} {value}")
+                        continue
+
+                    for bound, count in zip(metric["buckets"], value["buckets"]):
+                        lines.append(f"{name}_bucket{self.formatLabels(key + (('le', str(bound)),))} {count}")
+                    lines.append(f"{name}_bucket{self.formatLabels(key + (('le', '+Inf'),))} {value['count']}")
+                    lines.append(f"{name}_sum{self.formatLabels(key)} {value['sum']}")
+                    lines.append(f"{name}_count{self.formatLabels(key)} {value['count']}")
+
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def labelsToKey(labels: dict):
+        return tuple(sorted(labels.items())) if labels else ()
+
+    @staticmethod
+    def formatLabels(key):
+        if len(key) == 0:
+            return ""
+        return "{" + ",".join(f'{label}="{value}"' for label, value in key) + "}"
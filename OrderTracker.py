@@ -0,0 +1,139 @@
+import asyncio, enum, threading, time
+import concurrent.futures
+from Logger import LogType
+from Records import OrderResult
+
+# How often all outstanding orders are checked. One request per poll no matter how many orders are on the market.
+ORDER_POLL_INTERVAL_SEC = 0.3
+
+# An order that never shows up in deals or orders is considered closed after this time
+ORDER_VISIBLE_GRACE_SEC = 2.0
+
+class OrderStatus(enum.Enum):
+    Filled = 1
+    Closed = 2
+
+class OrderTracker:
+
+    # ##############################################################################################################
+    # fetchDealsAndOrders shall return {'orders': {orderId: order}, 'deals': {orderId: dealtVolume}}
+    # If loop is set to a running asyncio loop the polling runs as a task on that loop, else on a thread.
+    # ##############################################################################################################
+    def __init__(self, log, fetchDealsAndOrders, pollIntervalSec: float = ORDER_POLL_INTERVAL_SEC, loop = None):
+        self.log = log
+        self.fetchDealsAndOrders = fetchDealsAndOrders
+        self.pollIntervalSec = pollIntervalSec
+        self.loop = loop
+        self.outstanding = {}
+        self.lock = threading.Lock()
+        self.polling = False
+
+    # ##############################################################################################################
+    # Returns a future that completes with an OrderResult when the order
+    # is filled or no longer on the market.
+    # ##############################################################################################################
+    def track(self, orderId: str, volume: int):
+        future = concurrent.futures.Future()
+
+        with self.lock:
+            self.outstanding[orderId] = {
+                'future': future,
+                'volume': abs(volume),
+                'placed': time.monotonic(),
+                'seen': False
+            }
+
+            if not self.polling:
+                self.polling = True
+                if self.loop is not None and self.loop.is_running():
+                    asyncio.run_coroutine_threadsafe(self.runAsync(), self.loop)
+                else:
+                    threading.Thread(target=self.run, name="orderTracker", daemon=True).start()
+
+        return future
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def untrack(self, orderId: str):
+        with self.lock:
+            order = self.outstanding.pop(orderId, None)
+
+        if order is not None and not order['future'].done():
+            order['future'].cancel()
+
+    # ##############################################################################################################
+    # Volume dealt so far on one order, asked now. For orders that are not tracked (any more).
+    # ##############################################################################################################
+    def dealtVolume(self, orderId: str):
+        return self.fetchDealsAndOrders()['deals'].get(orderId, 0)
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def run(self):
+        while self.isPollingNeeded():
+            self.pollOnceSafe()
+            time.sleep(self.pollIntervalSec)
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    async def runAsync(self):
+        try:
+            while self.isPollingNeeded():
+                await asyncio.get_running_loop().run_in_executor(None, self.pollOnceSafe)
+                await asyncio.sleep(self.pollIntervalSec)
+        except BaseException:
+            # Cancelled, e.g. the loop is shutting down. A normal exit is handled by isPollingNeeded under the lock,
+            # clearing the flag here as well could stop a poller that track() started right after.
+            with self.lock:
+                self.polling = False
+            raise
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def isPollingNeeded(self):
+        with self.lock:
+            if len(self.outstanding) == 0:
+                self.polling = False
+            return self.polling
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def pollOnceSafe(self):
+        try:
+            self.pollOnce()
+        except Exception as ex:
+            self.log.log(LogType.Trace, f"Could not poll deals and orders, {ex}")
+
+    # ##############################################################################################################
+    # One request for all outstanding orders
+    # ##############################################################################################################
+    def pollOnce(self):
+        dealsAndOrders = self.fetchDealsAndOrders()
+        openOrders = dealsAndOrders['orders']
+        deals = dealsAndOrders['deals']
+        now = time.monotonic()
+        done = []
+
+        with self.lock:
+            for orderId, order in self.outstanding.items():
+                filledVolume = deals.get(orderId, 0)
+
+                if orderId in openOrders or filledVolume > 0:
+                    order['seen'] = True
+
+                if filledVolume >= order['volume']:
+                    done.append((orderId, order, OrderStatus.Filled, filledVolume))
+                elif orderId not in openOrders and (order['seen'] or now - order['placed'] > ORDER_VISIBLE_GRACE_SEC):
+                    done.append((orderId, order, OrderStatus.Closed, filledVolume))
+
+            for orderId, order, status, filledVolume in done:
+                del self.outstanding[orderId]
+
+        for orderId, order, status, filledVolume in done:
+            if not order['future'].done():
+                order['future'].set_result(OrderResult(orderId, status, filledVolume, now - order['placed']))
@@ -0,0 +1,93 @@
+import threading, time
+from Logger import LogType
+
+# The snapshot is refreshed in the background when older than this
+OVERVIEW_REFRESH_INTERVAL_SEC = 60
+
+# A snapshot older than this is never served, the caller waits for a new get_overview instead
+OVERVIEW_MAX_STALE_SEC = 600
+
+class OverviewCache:
+
+    # ##############################################################################################################
+    # Shared account overview snapshot with stale-while-revalidate. fetchOverview returns the raw get_overview().
+    # ##############################################################################################################
+    def __init__(self, log, fetchOverview, refreshIntervalSec: float = OVERVIEW_REFRESH_INTERVAL_SEC, maxStaleSec: float = OVERVIEW_MAX_STALE_SEC):
+        self.log = log
+        self.fetchOverview = fetchOverview
+        self.refreshIntervalSec = refreshIntervalSec
+        self.maxStaleSec = maxStaleSec
+        self.snapshot = None
+        self.updated = 0.0
+        self.lastRefreshOk = False
+        self.revalidating = False
+        self.lock = threading.Lock()
+        self.fetchLock = threading.Lock()
+
+    # ##############################################################################################################
+    # Returns the snapshot. A stale one is returned at once and refreshed in the background.
+    # ##############################################################################################################
+    def get(self):
+        with self.lock:
+            snapshot = self.snapshot
+            age = time.monotonic() - self.updated
+
+            if snapshot is not None and age < self.maxStaleSec:
+                if age >= self.refreshIntervalSec and not self.revalidating:
+                    self.revalidating = True
+                    threading.Thread(target=self.revalidate, name="overviewRefresh", daemon=True).start()
+                return snapshot
+
+        return self.refresh()
+
+    # ##############################################################################################################
+    # Fetches a new snapshot now. Raises if avanza can not be reached.
+    # ##############################################################################################################
+    def refresh(self):
+        with self.fetchLock:
+            try:
+                snapshot = self.fetchOverview()
+            except Exception as ex:
+                with self.lock:
+                    self.lastRefreshOk = False
+                raise ex
+
+            with self.lock:
+                self.snapshot = snapshot
+                self.updated = time.monotonic()
+                self.lastRefreshOk = True
+
+            return snapshot
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def refreshIfOld(self):
+        if self.getAgeSec() >= self.refreshIntervalSec:
+            self.refresh()
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def revalidate(self):
+        try:
+            self.refresh()
+        except Exception as ex:
+            self.log.log(LogType.Trace, f"Could not refresh overview, {ex}")
+        finally:
+            with self.lock:
+                self.revalidating = False
+
+    # ##############################################################################################################
+    # True if the last get_overview succeeded within the refresh interval, i.e. the connection is known to be OK
+    # ##############################################################################################################
+    def isFresh(self):
+        with self.lock:
+            return self.lastRefreshOk and self.snapshot is not None and time.monotonic() - self.updated < self.refreshIntervalSec
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def getAgeSec(self):
+        with self.lock:
+            return time.monotonic() - self.updated if self.snapshot is not None else float('inf')
@@ -0,0 +1,120 @@
+import numpy as np
+
+# Exchanges with a tick table that depends on the price only: flagCode -> [(from price, tick size)], ascending.
+# The nordic MiFID II tables also depend on the liquidity band of each stock, for those the tick size is guessed
+# from the prices in the quote.
+TICK_TABLES = {
+    'US': [(0.0, 0.0001), (1.0, 0.01)],
+    'CA': [(0.0, 0.005), (0.5, 0.01)],
+}
+
+# The retry ladder in MainBroker.doOneTransactionWithRetries
+PRICE_LADDER_STEPS = 3
+
+PRICE_DECIMALS = 4
+
+# ##############################################################################################################
+# All prices found in one get_stock_info reply, duplicates included
+# ##############################################################################################################
+def extractPrices(data):
+    prices = [data[key] for key in ('lastPrice', 'lowestPrice', 'highestPrice', 'buyPrice', 'sellPrice') if key in data]
+
+    for nextDepth in data.get('orderDepthLevels', []):
+        try:
+            sellPrice = nextDepth['sell']['price']
+            buyPrice = nextDepth['buy']['price']
+            prices.append(sellPrice)
+            prices.append(buyPrice)
+        except Exception:
+            pass
+
+    for nextTrade in data.get('latestTrades', []):
+        if 'price' in nextTrade:
+            prices.append(nextTrade['price'])
+
+    return prices
+
+# ##############################################################################################################
+# Tested. Order depth of one get_stock_info reply as bids and asks, [(price, volume)] best price first. Levels
+# without price or volume are skipped.
+# ##############################################################################################################
+def extractDepth(data):
+    bids = []
+    asks = []
+
+    for nextDepth in data.get('orderDepthLevels', []):
+        for side, levels in (('buy', bids), ('sell', asks)):
+            level = nextDepth.get(side) or {}
+            if level.get('price') is not None and level.get('volume'):
+                levels.append((level['price'], level['volume']))
+
+    bids.sort(key=lambda level: -level[0])
+    asks.sort(key=lambda level: level[0])
+    return bids, asks
+
+# ##############################################################################################################
+# Tested. Twice the smallest difference between two distinct prices of each quote, -1 if less than two prices
+# ##############################################################################################################
+def guessTickSizes(quotes):
+    priceLists = [extractPrices(data) for data in quotes]
+    width = max([len(prices) for prices in priceLists] + [2])
+
+    prices = np.full((len(priceLists), width), np.nan)
+    for row, rowPrices in enumerate(priceLists):
+        prices[row, :len(rowPrices)] = rowPrices
+
+    prices.sort(axis=1)
+    diffs = np.diff(prices, axis=1)
+    diffs[~(diffs > 0)] = np.inf
+    smallest = diffs.min(axis=1)
+
+    return np.where(np.isfinite(smallest), np.round(smallest * 2, PRICE_DECIMALS), -1.0)
+
+# ##############################################################################################################
+# Tested. Tick size by the exchange tick table, nan where the exchange has none
+# ##############################################################################################################
+def tableTickSizes(prices, flagCodes):
+    prices = np.asarray(prices, dtype=float)
+    retData = np.full(len(prices), np.nan)
+
+    for flagCode, table in TICK_TABLES.items():
+        rows = np.array([code is not None and code.upper() == flagCode for code in flagCodes], dtype=bool)
+        if not rows.any():
+            continue
+        bounds = np.array([bound for bound, tick in table])
+        ticks = np.array([tick for bound, tick in table])
+        retData[rows] = ticks[np.searchsorted(bounds, prices[rows], side='right') - 1]
+
+    return retData
+
+# ##############################################################################################################
+# Tested. Tick size, spread, tick1Percent and the buy/sell retry ladders for a batch of get_stock_info replies.
+# Returns arrays, one row per quote. Prices that are missing are -1, ladders are then nan.
+# ##############################################################################################################
+def analyzeQuotes(quotes, flagCodes = None, steps: int = PRICE_LADDER_STEPS):
+    flagCodes = flagCodes if flagCodes is not None else [data.get('flagCode') for data in quotes]
+
+    buyPrice = np.array([data.get('buyPrice', -1) for data in quotes], dtype=float)
+    sellPrice = np.array([data.get('sellPrice', -1) for data in quotes], dtype=float)
+    hasPrices = (buyPrice > 0) & (sellPrice > 0)
+    mid = np.where(hasPrices, (buyPrice + sellPrice) / 2, np.nan)
+
+    tickSize = guessTickSizes(quotes)
+    tableTick = tableTickSizes(np.where(hasPrices, mid, 0), flagCodes)
+    tickSize = np.where(np.isnan(tableTick), tickSize, tableTick)
+
+    valid = hasPrices & (tickSize > 0)
+    safeTick = np.where(valid, tickSize, 1.0)
+    ticksPerPercent = np.maximum(np.floor(np.where(valid, 0.01 * mid, 0) / safeTick), 1)
+    tick1Percent = np.where(valid, np.round(ticksPerPercent * safeTick, PRICE_DECIMALS), -1.0)
+
+    # Buying starts one step above the ask, selling one step below the bid
+    stepsUp = np.arange(1, steps + 1) * np.where(valid, tick1Percent, np.nan)[:, None]
+
+    return {
+        'tickSize': tickSize,
+        'spread': np.where(hasPrices, np.round(sellPrice - buyPrice, PRICE_DECIMALS), -1.0),
+        'tick1Percent': tick1Percent,
+        'buyLadder': np.round(sellPrice[:, None] + stepsUp, PRICE_DECIMALS),
+        'sellLadder': np.round(buyPrice[:, None] - stepsUp, PRICE_DECIMALS)
+    }
@@ -0,0 +1,83 @@
+import threading, time
+import concurrent.futures
+
+# Quotes younger than this are served from the cache instead of a new get_stock_info
+QUOTE_CACHE_TTL_SEC = 2.0
+
+class QuoteCache:
+
+    # ##############################################################################################################
+    # Short lived cache of raw stock info by orderbook id. Concurrent requests for the same id share one fetch.
+    # Each key has a generation that invalidate bumps, data fetched before an invalidate is never stored.
+    # ##############################################################################################################
+    def __init__(self, ttlSec: float = QUOTE_CACHE_TTL_SEC):
+        self.ttlSec = ttlSec
+        self.entries = {}
+        self.inFlight = {}
+        self.generations = {}
+        self.lock = threading.Lock()
+
+    # ##############################################################################################################
+    # bypass=True always fetches new data, e.g. when checking if an order has been filled
+    # ##############################################################################################################
+    def get(self, key: str, fetch, bypass: bool = False):
+
+        if bypass:
+            generation = self.generation(key)
+            data = fetch(key)
+            self.put(key, data, generation)
+            return data
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttlSec:
+                return entry[1]
+
+            future = self.inFlight.get(key)
+            isOwner = future is None
+            if isOwner:
+                future = concurrent.futures.Future()
+                self.inFlight[key] = future
+                generation = self.generations.get(key, 0)
+
+        if not isOwner:
+            return future.result()
+
+        try:
+            data = fetch(key)
+            self.put(key, data, generation)
+            future.set_result(data)
+            return data
+        except Exception as ex:
+            future.set_exception(ex)
+            raise ex
+        finally:
+            with self.lock:
+                if self.inFlight.get(key) is future:
+                    del self.inFlight[key]
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def generation(self, key: str):
+        with self.lock:
+            return self.generations.get(key, 0)
+
+    # ##############################################################################################################
+    # Tested. generation is the one from before the fetch, data from an older generation is dropped. None stores
+    # unconditionally.
+    # ##############################################################################################################
+    def put(self, key: str, data, generation: int = None):
+        with self.lock:
+            if generation is not None and generation != self.generations.get(key, 0):
+                return
+            self.entries[key] = (time.monotonic(), data)
+
+    # ##############################################################################################################
+    # Tested. Also detaches a fetch in flight, later requests start a new one instead of waiting for old data.
+    # ##############################################################################################################
+    def invalidate(self, key: str):
+        with self.lock:
+            self.generations[key] = self.generations.get(key, 0) + 1
+            self.entries.pop(key, None)
+            self.inFlight.pop(key, None)
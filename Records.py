@@ -0,0 +1,112 @@
+class Record:
+
+    # ##############################################################################################################
+    # Base for the slotted records below. Only the fields we use are kept from the raw json.
+    # ##############################################################################################################
+    __slots__ = ()
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)})"
+
+class Position(Record):
+
+    # ##############################################################################################################
+    # Holding of one stock in one account
+    # ##############################################################################################################
+    __slots__ = ('accountId', 'volume', 'value')
+
+    def __init__(self, accountId: str, volume: int, value: float):
+        self.accountId = accountId
+        self.volume = volume
+        self.value = value
+
+    # ##############################################################################################################
+    # From a position in get_stock_info or get_positions
+    # ##############################################################################################################
+    @staticmethod
+    def fromJson(data):
+        return Position(str(data['accountId']), data.get('volume', 0), data.get('value', 0))
+
+class Quote(Record):
+
+    # ##############################################################################################################
+    # What the broker needs of a stock from avanza: prices, tick analysis, our position (None if not owned in an
+    # allowed account) and the order depth as [(price, volume)], best first. Prices that are missing are -1.
+    # ##############################################################################################################
+    __slots__ = ('tickerId', 'buyPrice', 'sellPrice', 'spread', 'tickSize', 'tick1Percent', 'buyLadder', 'sellLadder',
+                 'secondsSinceUpdated', 'position', 'bids', 'asks')
+
+    def __init__(self, tickerId: str, buyPrice: float, sellPrice: float, spread: float, tickSize: float, tick1Percent: float,
+                 buyLadder, sellLadder, secondsSinceUpdated: int, position: Position = None, bids = (), asks = ()):
+        self.tickerId = tickerId
+        self.buyPrice = buyPrice
+        self.sellPrice = sellPrice
+        self.spread = spread
+        self.tickSize = tickSize
+        self.tick1Percent = tick1Percent
+        self.buyLadder = buyLadder
+        self.sellLadder = sellLadder
+        self.secondsSinceUpdated = secondsSinceUpdated
+        self.position = position
+        self.bids = bids
+        self.asks = asks
+
+    @property
+    def accountId(self):
+        return self.position.accountId if self.position is not None else None
+
+    @property
+    def currentCount(self):
+        return self.position.volume if self.position is not None else 0
+
+class TradeInstruction(Record):
+
+    # ##############################################################################################################
+    # One stock in the tradingpal buy or sell list. Missing fields are None, see MainBroker.localSanityCheck.
+    # ##############################################################################################################
+    __slots__ = ('tickerName', 'numberToBuy', 'numberToSell', 'singleStockPriceSek', 'priceOrigCurrancy', 'name', 'count', 'totalInvestedSek')
+
+    def __init__(self, tickerName: str, numberToBuy: int, numberToSell: int, singleStockPriceSek: float, priceOrigCurrancy: float,
+                 name: str, count: int, totalInvestedSek: float):
+        self.tickerName = tickerName
+        self.numberToBuy = numberToBuy
+        self.numberToSell = numberToSell
+        self.singleStockPriceSek = singleStockPriceSek
+        self.priceOrigCurrancy = priceOrigCurrancy
+        self.name = name
+        self.count = count
+        self.totalInvestedSek = totalInvestedSek
+
+    # ##############################################################################################################
+    # Tested
+    # ##############################################################################################################
+    @staticmethod
+    def fromJson(data):
+        currentStock = data.get('currentStock') or {}
+        return TradeInstruction(data.get('tickerName'), data.get('numberToBuy'), data.get('numberToSell'), data.get('singleStockPriceSek'),
+                                data.get('priceOrigCurrancy'), currentStock.get('name'), currentStock.get('count'), currentStock.get('totalInvestedSek'))
+
+    # ##############################################################################################################
+    # Tested. getStocksToBuy / getStocksToSell reply -> list, None if malformed
+    # ##############################################################################################################
+    @staticmethod
+    def parseList(data):
+        if data is None or 'list' not in data:
+            return None
+        return [TradeInstruction.fromJson(stock) for stock in data['list']]
+
+class OrderResult(Record):
+
+    # ##############################################################################################################
+    # How a tracked order ended, see OrderTracker
+    # ##############################################################################################################
+    __slots__ = ('orderId', 'status', 'filledVolume', 'fillTimeSec')
+
+    def __init__(self, orderId: str, status, filledVolume: int, fillTimeSec: float):
+        self.orderId = orderId
+        self.status = status
+        self.filledVolume = filledVolume
+        self.fillTimeSec = fillTimeSec
@@ -1,45 +1,135 @@
-import sys
+import sys, os, signal, time
 
 from flask import Flask, request, Response
 import threading
 import MainBroker
+import SharedState
+import TimeUtils
+from FollowerBroker import FollowerBroker
 import logging
 log = logging.getLogger('werkzeug')
 log.setLevel(logging.ERROR)
 
+# Set by gunicorn.conf.py. Several server processes, one of them (the leader) runs the trading loop.
+MULTI_WORKER = os.getenv('TP_MULTI_WORKER') == "true"
+
+# How often a follower worker tries to take over the leadership, in case the leader process has died
+LEADERSHIP_RETRY_SEC = 5
+
 app = Flask(__name__)
-mainBroker = MainBroker.MainBroker()
+mainBroker = None
+followerBroker = None
+leadership = None
+leadershipLock = threading.Lock()
+
+def startLeader():
+    global mainBroker
+    broker = MainBroker.MainBroker()
+    broker.sharedState = SharedState.SharedState()
+    broker.onTerminate = shutdownServer
+    threading.Thread(target=broker.run, daemon=True).start()
+    mainBroker = broker
+
+# Returns True if this worker is the leader
+def tryLeadership():
+    global leadership
+
+    with leadershipLock:
+        if leadership is None:
+            leadership = SharedState.acquireLeadership()
+            if leadership is not None:
+                startLeader()
+        return leadership is not None
+
+# Followers retry in the background, never on the request path
+def retryLeadershipPeriodically():
+    while not tryLeadership():
+        time.sleep(LEADERSHIP_RETRY_SEC)
+
+# The leader serves all calls itself, followers serve them from the shared state
+def getBroker():
+    return mainBroker if mainBroker is not None else followerBroker
+
+def shutdownServer():
+    os.kill(os.getppid(), signal.SIGTERM)
+
+if MULTI_WORKER:
+    followerBroker = FollowerBroker(MainBroker.log, SharedState.SharedState())
+    if not tryLeadership():
+        threading.Thread(target=retryLeadershipPeriodically, name="leadership", daemon=True).start()
+else:
+    mainBroker = MainBroker.MainBroker()
 
 @app.route("/tradingpalavanza/getfunds", methods=['GET'])
 def getFunds():
 
-    return {"funds": mainBroker.getCurrentFunds()}
+    return {"funds": getBroker().getCurrentFunds()}
+
+# The legacy date parameter is one day unless to is given. from without to is everything up to today.
+def requestedDateRange():
+    date = request.args.get("date")
+    if date is not None:
+        return date, request.args.get("to", date)
+
+    return request.args.get("from"), request.args.get("to", TimeUtils.today())
 
 @app.route("/tradingpalavanza/getyield", methods=['GET'])
 def getYield():
-    date = request.args.get("date")
+    date, toDate = requestedDateRange()
 
-    return {"yields": mainBroker.getYieldByDate(date)}
+    return {"yields": getBroker().getYieldByDate(date, toDate)}
 
 @app.route("/tradingpalavanza/gettax", methods=['GET'])
 def getTax():
-    date = request.args.get("date")
+    date, toDate = requestedDateRange()
+
+    return {"taxes": getBroker().getTaxByDate(date, toDate)}
+
+@app.route("/tradingpalavanza/getsummary", methods=['GET'])
+def getSummary():
+    fromDate = request.args.get("from")
+    toDate = request.args.get("to")
+    types = request.args.get("types", "DIVIDEND,FOREIGN_TAX").split(",")
+
+    return {"summary": getBroker().getTransactionSummary(fromDate, toDate, types)}
+
+@app.route("/tradingpalavanza/getregister", methods=['GET'])
+def getRegister():
+    ticker = request.args.get("ticker")
+    account = request.args.get("account")
+    fromDate = request.args.get("from")
+    toDate = request.args.get("to")
+
+    return getBroker().getTradeRegister(ticker, account, fromDate, toDate)
+
+@app.route("/tradingpalavanza/health", methods=['GET'])
+def health():
+    return getBroker().getHealth()
 
-    return {"taxes": mainBroker.getTaxByDate(date)}
+@app.route("/tradingpalavanza/metrics", methods=['GET'])
+def metrics():
+    return Response(getBroker().getMetrics(), mimetype="text/plain; version=0.0.4")
 
 @app.route("/tradingpalavanza/blockpurchases", methods=['GET'])
 def blockPurchases():
-    mainBroker.doBlockPurchases()
+    getBroker().doBlockPurchases()
     return {}
 
 @app.route("/tradingpalavanza/unblockpurchases", methods=['GET'])
 def unblockPurchases():
-    mainBroker.doUnblockPurchases()
+    getBroker().doUnblockPurchases()
     return {}
 
 @app.route("/tradingpalavanza/killswitch", methods=['GET'])
 def killswitch():
-    mainBroker.doTerminate()
+    broker = getBroker()
+    broker.doTerminate()
+
+    if MULTI_WORKER:
+        # A follower has forwarded the command, the leader shuts down the server when it gets it
+        if broker is mainBroker:
+            shutdownServer()
+        return {}
 
     func = request.environ.get('werkzeug.server.shutdown')
     if func is not None:
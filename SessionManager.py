@@ -0,0 +1,123 @@
+import threading, time
+from Logger import LogType
+
+# Avanza sessions are re-created proactively when older than this, before avanza expires them
+AVANZA_SESSION_MAX_AGE_SEC = 20 * 3600
+
+# Without any successful avanza call within this time, the session is probed before use
+AVANZA_SESSION_IDLE_PROBE_SEC = 300
+
+class SessionManager:
+
+    # ##############################################################################################################
+    # Owns the logged in AvanzaHandler. createHandler returns a new logged in handler. Every avanza call made
+    # through the handler reports back here, so a session in use is known to be alive without extra requests.
+    # ##############################################################################################################
+    def __init__(self, log, createHandler, maxAgeSec: float = AVANZA_SESSION_MAX_AGE_SEC, idleProbeSec: float = AVANZA_SESSION_IDLE_PROBE_SEC):
+        self.log = log
+        self.createHandler = createHandler
+        self.maxAgeSec = maxAgeSec
+        self.idleProbeSec = idleProbeSec
+        self.handler = None
+        self.loginTime = 0.0
+        self.lastSuccess = 0.0
+        self.lastFailure = 0.0
+        self.lastError = None
+        self.logins = 0
+        self.probes = 0
+        self.lock = threading.RLock()
+        self.refreshDone = threading.Condition(self.lock)
+        self.refreshing = False
+        self.refreshes = 0
+
+    # ##############################################################################################################
+    # True if the handler can be used without any check towards avanza
+    # ##############################################################################################################
+    def isHealthy(self):
+        with self.lock:
+            now = time.monotonic()
+            return self.handler is not None and \
+                now - self.loginTime < self.maxAgeSec and \
+                now - self.lastSuccess < self.idleProbeSec and \
+                self.lastSuccess >= self.lastFailure
+
+    # ##############################################################################################################
+    # Returns a handler with a working session. Only probes or logs in when needed. The probe and login are done
+    # outside the lock by one thread, others wait for it and get its handler. avanza calls on the current handler
+    # (onAvanzaCall) are never held up by a login.
+    # ##############################################################################################################
+    def ensureSession(self):
+        with self.lock:
+            refreshes = self.refreshes
+            while self.refreshing:
+                self.refreshDone.wait()
+
+            if self.isHealthy() or self.refreshes != refreshes:
+                return self.handler
+
+            self.refreshing = True
+            handler = self.handler
+            expired = time.monotonic() - self.loginTime >= self.maxAgeSec
+
+        refreshed = False
+        try:
+            if handler is None:
+                handler = self.login("no session")
+            elif expired:
+                handler = self.login("session about to expire")
+            else:
+                try:
+                    with self.lock:
+                        self.probes += 1
+                    handler.testAvanzaConnection()
+                except Exception as ex:
+                    handler = self.login(f"session probe failed, {ex}")
+            refreshed = True
+        finally:
+            with self.lock:
+                self.refreshing = False
+                if refreshed:
+                    self.refreshes += 1
+                self.refreshDone.notify_all()
+
+        return handler
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def login(self, reason: str):
+        self.log.log(LogType.Trace, f"Need to refresh AvanzaHandler... ({reason})")
+        handler = self.createHandler()
+        handler.callObservers.append(self.onAvanzaCall)
+        with self.lock:
+            self.loginTime = time.monotonic()
+            self.logins += 1
+            self.handler = handler
+        handler.testAvanzaConnection()
+        return handler
+
+    # ##############################################################################################################
+    # Called by the handler after each avanza call. ex is None for successful calls.
+    # ##############################################################################################################
+    def onAvanzaCall(self, method: str, seconds: float, ex: Exception):
+        with self.lock:
+            if ex is None:
+                self.lastSuccess = time.monotonic()
+            else:
+                self.lastFailure = time.monotonic()
+                self.lastError = f"{method}: {ex}"
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def getHealth(self):
+        with self.lock:
+            now = time.monotonic()
+            return {
+                "healthy": self.isHealthy(),
+                "sessionAgeSec": round(now - self.loginTime, 1) if self.handler is not None else None,
+                "lastSuccessAgeSec": round(now - self.lastSuccess, 1) if self.lastSuccess > 0 else None,
+                "lastError": self.lastError,
+                "logins": self.logins,
+                "probes": self.probes
+            }
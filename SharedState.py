@@ -0,0 +1,77 @@
+import fcntl, json, os, sqlite3, threading, time
+
+SHARED_STATE_PATH = os.getenv('TP_SHARED_STATE', "/tmp/tradingpalavanza.state.db")
+LEADER_LOCK_PATH = os.getenv('TP_LEADER_LOCK', "/tmp/tradingpalavanza.leader")
+
+# ##############################################################################################################
+# Returns the open lock file if this process became the leader, else None. Leadership lasts while the file is open.
+# ##############################################################################################################
+def acquireLeadership(path: str = LEADER_LOCK_PATH):
+    lockFile = open(path, "a+")
+    try:
+        fcntl.flock(lockFile, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lockFile.close()
+        return None
+
+    lockFile.seek(0)
+    lockFile.truncate()
+    lockFile.write(str(os.getpid()))
+    lockFile.flush()
+    return lockFile
+
+class SharedState:
+
+    # ##############################################################################################################
+    # State shared between the server worker processes: values published by the leader and commands to the leader
+    # ##############################################################################################################
+    def __init__(self, path: str = SHARED_STATE_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT, updated REAL)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS commands (id INTEGER PRIMARY KEY AUTOINCREMENT, command TEXT, created REAL)")
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def put(self, key: str, value):
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO state (key, value, updated) VALUES (?, ?, ?)", (key, json.dumps(value), time.time()))
+
+    # ##############################################################################################################
+    # Returns (value, ageSec), or (None, None) if never published
+    # ##############################################################################################################
+    def get(self, key: str):
+        with self.lock:
+            row = self.db.execute("SELECT value, updated FROM state WHERE key = ?", (key,)).fetchone()
+
+        if row is None:
+            return None, None
+
+        return json.loads(row[0]), time.time() - row[1]
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def pushCommand(self, command: str):
+        with self.lock:
+            self.db.execute("INSERT INTO commands (command, created) VALUES (?, ?)", (command, time.time()))
+
+    # ##############################################################################################################
+    # Returns and removes all pending commands, oldest first
+    # ##############################################################################################################
+    def popCommands(self):
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self.db.execute("SELECT id, command FROM commands ORDER BY id").fetchall()
+                if len(rows) > 0:
+                    self.db.execute("DELETE FROM commands WHERE id <= ?", (rows[-1][0],))
+                self.db.execute("COMMIT")
+            except Exception as ex:
+                self.db.execute("ROLLBACK")
+                raise ex
+
+        return [command for id, command in rows]
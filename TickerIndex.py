@@ -0,0 +1,93 @@
+import os, sqlite3, threading, time
+from Logger import LogType
+
+TICKER_INDEX_PATH = os.getenv('TP_TICKER_INDEX', "/logs/tradingPalTickerIndex.db")
+
+# Bump when the table layout or the meaning of the stored ids change. Old index files are then rebuilt.
+TICKER_INDEX_VERSION = 1
+
+# A resolved ticker is searched again in avanza after this time, to catch de-listings and id changes.
+TICKER_INDEX_TTL_SEC = 7 * 24 * 3600
+
+# A ticker that could not be resolved is not searched again until this time has passed.
+TICKER_INDEX_NEGATIVE_TTL_SEC = 6 * 3600
+
+sharedTickerIndex = None
+sharedTickerIndexLock = threading.Lock()
+
+class TickerIndex:
+
+    # ##############################################################################################################
+    # Persistent yahoo ticker -> avanza orderbook id index. The file is opened lazily at first lookup.
+    # ##############################################################################################################
+    def __init__(self, log, path: str = TICKER_INDEX_PATH):
+        self.log = log
+        self.path = path
+        self.db = None
+        self.lock = threading.Lock()
+
+    # ##############################################################################################################
+    # One index shared by all AvanzaHandler instances, so it survives refreshAvanzaHandler
+    # ##############################################################################################################
+    @staticmethod
+    def getShared(log):
+        global sharedTickerIndex
+
+        with sharedTickerIndexLock:
+            if sharedTickerIndex is None:
+                sharedTickerIndex = TickerIndex(log)
+            return sharedTickerIndex
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def open(self):
+        if self.db is not None:
+            return
+
+        try:
+            self.db = sqlite3.connect(self.path, check_same_thread=False)
+            self.createTables()
+        except Exception as ex:
+            self.log.log(LogType.Trace, f"Could not open ticker index {self.path}, keeping it in memory only, {ex}")
+            self.db = sqlite3.connect(":memory:", check_same_thread=False)
+            self.createTables()
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def createTables(self):
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+
+        if row is None or int(row[0]) != TICKER_INDEX_VERSION:
+            self.db.execute("DROP TABLE IF EXISTS tickers")
+            self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (str(TICKER_INDEX_VERSION),))
+
+        self.db.execute("CREATE TABLE IF NOT EXISTS tickers (yahooTicker TEXT PRIMARY KEY, tickerId TEXT, updated REAL)")
+        self.db.commit()
+
+    # ##############################################################################################################
+    # Returns (found, tickerId, fresh). tickerId is None for a cached negative result.
+    # ##############################################################################################################
+    def lookup(self, yahooTicker: str):
+        with self.lock:
+            self.open()
+            row = self.db.execute("SELECT tickerId, updated FROM tickers WHERE yahooTicker = ?", (yahooTicker,)).fetchone()
+
+        if row is None:
+            return False, None, False
+
+        tickerId, updated = row
+        ttl = TICKER_INDEX_TTL_SEC if tickerId is not None else TICKER_INDEX_NEGATIVE_TTL_SEC
+        return True, tickerId, (time.time() - updated) < ttl
+
+    # ##############################################################################################################
+    # Store None as tickerId to remember that the ticker could not be resolved
+    # ##############################################################################################################
+    def store(self, yahooTicker: str, tickerId):
+        with self.lock:
+            self.open()
+            self.db.execute("INSERT OR REPLACE INTO tickers (yahooTicker, tickerId, updated) VALUES (?, ?, ?)",
+                            (yahooTicker, tickerId, time.time()))
+            self.db.commit()
@@ -0,0 +1,113 @@
+import datetime, time, pytz
+
+# The zone all avanza timestamps and our own dates are in. Looked up once, pytz.timezone() is not free.
+STOCKHOLM_TZ = pytz.timezone('Europe/Stockholm')
+
+# Avanza timestamp format, e.g. '2021-11-17T15:31:24.000+0100'
+AVANZA_TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S.000%z'
+
+# The parse caches are cleared when they grow past this, they normally hold a few days and offsets
+MAX_CACHE_SIZE = 10000
+
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+# 'YYYY-MM-DD' -> epoch seconds at 00:00 UTC
+dayStartCache = {}
+
+# Everything after the seconds, e.g. '.000+0100' -> fraction minus utc offset in seconds
+tailCache = {}
+
+# ##############################################################################################################
+# ...
+# ##############################################################################################################
+def now():
+    return datetime.datetime.now(STOCKHOLM_TZ)
+
+def today():
+    return now().strftime("%Y-%m-%d")
+
+# ##############################################################################################################
+# Tested. Epoch seconds as an avanza timestamp in swedish time
+# ##############################################################################################################
+def formatTimestamp(epochSec: float):
+    return datetime.datetime.fromtimestamp(epochSec, STOCKHOLM_TZ).strftime(AVANZA_TIMESTAMP_FORMAT)
+
+def dayStart(date: str):
+    retVal = dayStartCache.get(date)
+    if retVal is None:
+        if len(dayStartCache) >= MAX_CACHE_SIZE:
+            dayStartCache.clear()
+        retVal = (datetime.date(int(date[0:4]), int(date[5:7]), int(date[8:10])).toordinal() - EPOCH_ORDINAL) * 86400
+        dayStartCache[date] = retVal
+    return retVal
+
+# ##############################################################################################################
+# Tested. '.000+0100', '.5+01:00', 'Z', '+01' -> fraction minus utc offset in seconds. A timestamp without zone
+# is an error, we can not know what it is relative to.
+# ##############################################################################################################
+def tailSeconds(tail: str):
+    retVal = tailCache.get(tail)
+    if retVal is not None:
+        return retVal
+
+    fraction = 0.0
+    zone = tail
+    if tail[:1] == '.':
+        end = 1
+        while end < len(tail) and tail[end].isdigit():
+            end += 1
+        fraction = float(tail[:end])
+        zone = tail[end:]
+
+    if zone == 'Z':
+        offset = 0
+    else:
+        digits = zone[1:].replace(':', '')
+        if zone[:1] not in ('+', '-') or len(digits) not in (2, 4) or not digits.isdigit():
+            raise ValueError(f"no utc offset in '{tail}'")
+        offset = int(digits[:2]) * 3600 + int(digits[2:] or 0) * 60
+        offset = offset if zone[0] == '+' else -offset
+
+    if len(tailCache) >= MAX_CACHE_SIZE:
+        tailCache.clear()
+    retVal = fraction - offset
+    tailCache[tail] = retVal
+    return retVal
+
+# ##############################################################################################################
+# Tested. Avanza timestamp -> epoch seconds. Fixed position parsing with the date and zone part cached, about
+# ten times faster than strptime. Raises ValueError if malformed.
+# ##############################################################################################################
+def parseTimestamp(timestamp: str):
+    if len(timestamp) < 20 or timestamp[4] != '-' or timestamp[7] != '-' or timestamp[10] != 'T' or \
+            timestamp[13] != ':' or timestamp[16] != ':':
+        raise ValueError(f"mal formatted timestamp {timestamp}")
+
+    return dayStart(timestamp[:10]) + int(timestamp[11:13]) * 3600 + int(timestamp[14:16]) * 60 + int(timestamp[17:19]) + \
+           tailSeconds(timestamp[19:])
+
+# ##############################################################################################################
+# Tested. Seconds from the timestamp until now, negative if it is in the future. Not wrapped at one day as
+# timedelta.seconds is.
+# ##############################################################################################################
+def secondsSince(timestamp: str, now: float = None):
+    return (now if now is not None else time.time()) - parseTimestamp(timestamp)
+
+# ##############################################################################################################
+# Tested. Batch version for transaction lists: 'YYYY-MM-DD' or a timestamp starting with one -> 'YYYY-MM-DD',
+# None where missing or malformed. Each distinct value is only checked once, a transaction list has few dates.
+# ##############################################################################################################
+def parseDates(dates):
+    parsed = {}
+    retData = []
+
+    for date in dates:
+        if date not in parsed:
+            try:
+                parsed[date] = datetime.date(int(date[0:4]), int(date[5:7]), int(date[8:10])).isoformat() \
+                    if len(date) >= 10 and date[4] == '-' and date[7] == '-' else None
+            except (TypeError, ValueError):
+                parsed[date] = None
+        retData.append(parsed[date])
+
+    return retData
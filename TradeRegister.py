@@ -0,0 +1,123 @@
+import bisect, json, os, threading
+import TimeUtils
+from Logger import LogType
+
+TRADE_REGISTER_PATH = os.getenv('TP_TRADE_REGISTER', "/logs/tradingPalTradeRegister.jsonl")
+
+class TradeRegister:
+
+    # ##############################################################################################################
+    # Append only register of all trades, one json object per line. Indexed on ticker, date and account in memory.
+    # The file is read incrementally, so trades appended by another process show up in the next query.
+    # ##############################################################################################################
+    def __init__(self, log, path: str = TRADE_REGISTER_PATH):
+        self.log = log
+        self.path = path
+        self.lock = threading.Lock()
+        self.readOffset = 0
+        self.fileErrorLogged = False
+        self.records = []
+        self.dates = []
+        self.byTicker = {}
+        self.byAccount = {}
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def append(self, trade):
+
+        now = TimeUtils.now()
+        record = {'date': now.strftime("%Y-%m-%d"), 'time': now.isoformat(), **trade}
+        line = json.dumps(record) + "\n"
+
+        with self.lock:
+            self.readNewRecords()
+            try:
+                with open(self.path, "a") as file_object:
+                    file_object.write(line)
+                    file_object.flush()
+                    os.fsync(file_object.fileno())
+                self.readOffset += len(line.encode())
+            except Exception as ex:
+                self.logFileError(ex)
+
+            self.index(record)
+
+    # ##############################################################################################################
+    # All filters are optional. Dates are inclusive, 'YYYY-MM-DD'.
+    # ##############################################################################################################
+    def query(self, ticker: str = None, accountId: str = None, fromDate: str = None, toDate: str = None):
+
+        with self.lock:
+            self.readNewRecords()
+
+            start = bisect.bisect_left(self.dates, fromDate) if fromDate is not None else 0
+            end = bisect.bisect_right(self.dates, toDate) if toDate is not None else len(self.dates)
+            candidates = range(start, end)
+
+            if ticker is not None:
+                candidates = [i for i in self.byTicker.get(ticker, []) if start <= i < end]
+            if accountId is not None:
+                accountRecords = set(self.byAccount.get(accountId, []))
+                candidates = [i for i in candidates if i in accountRecords]
+
+            return [self.records[i] for i in candidates]
+
+    # ##############################################################################################################
+    # Per ticker: number of trades, stocks bought/sold, net SEK spent and the last known count / invested SEK
+    # ##############################################################################################################
+    def getProfitAndLoss(self, ticker: str = None, accountId: str = None, fromDate: str = None, toDate: str = None):
+
+        retData = {}
+        for trade in self.query(ticker, accountId, fromDate, toDate):
+            summary = retData.setdefault(trade['ticker'], {
+                'trades': 0, 'boughtCount': 0, 'soldCount': 0, 'netSpentSek': 0.0, 'count': 0, 'totalInvestedSek': 0})
+
+            transacted = trade['count'] - trade['countAtStart']
+            summary['trades'] += 1
+            summary['boughtCount'] += transacted if transacted > 0 else 0
+            summary['soldCount'] += -transacted if transacted < 0 else 0
+            summary['netSpentSek'] += trade['spent']
+            summary['count'] = trade['count']
+            summary['totalInvestedSek'] = trade['totalInvestedSek']
+
+        return retData
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def readNewRecords(self):
+        try:
+            if not os.path.isfile(self.path) or os.path.getsize(self.path) <= self.readOffset:
+                return
+
+            with open(self.path, "rb") as file_object:
+                file_object.seek(self.readOffset)
+                for line in file_object:
+                    if not line.endswith(b"\n"):
+                        break
+                    self.readOffset += len(line)
+                    try:
+                        self.index(json.loads(line))
+                    except ValueError:
+                        self.log.log(LogType.Trace, f"WARN: Malformatted line in trade register {line}")
+        except Exception as ex:
+            self.logFileError(ex)
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def index(self, record):
+        position = len(self.records)
+        self.records.append(record)
+        self.dates.append(record.get('date', ''))
+        self.byTicker.setdefault(record.get('ticker'), []).append(position)
+        self.byAccount.setdefault(record.get('accountId'), []).append(position)
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def logFileError(self, ex: Exception):
+        if not self.fileErrorLogged:
+            self.log.log(LogType.Trace, f"Could not access trade register {self.path}, keeping it in memory only, {ex}")
+            self.fileErrorLogged = True
@@ -0,0 +1,129 @@
+import random, threading, time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+from Logger import LogType
+
+# Timeout per tradingpal endpoint. (connect, read) in seconds.
+ENDPOINT_TIMEOUTS_SEC = {
+    "getStocksToBuy": (3, 30),
+    "getStocksToSell": (3, 30),
+    "lock": (3, 5),
+    "unlock": (3, 5),
+    "updateStock": (3, 10)
+}
+DEFAULT_TIMEOUT_SEC = (3, 10)
+
+# Retries after the first attempt. POSTs are only retried if the request never reached the server.
+MAX_RETRIES = 2
+RETRY_BACKOFF_SEC = 0.5
+RETRY_ON_STATUS = [502, 503, 504]
+
+# Number of keep-alive connections kept towards tradingpal
+CONNECTION_POOL_SIZE = 8
+
+class TradingPalClient:
+
+    # ##############################################################################################################
+    # One pooled keep-alive session for all REST calls towards the tradingpal algorithm
+    # ##############################################################################################################
+    def __init__(self, baseUrl: str, log, session: requests.Session = None):
+        self.baseUrl = baseUrl
+        self.log = log
+        self.latency = {}
+        self.latencyLock = threading.Lock()
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=CONNECTION_POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+
+        self.session = session
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def get(self, endpoint: str):
+        return self.request("GET", endpoint)
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def post(self, endpoint: str, body):
+        return self.request("POST", endpoint, body)
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def request(self, method: str, endpoint: str, body=None):
+
+        timeout = ENDPOINT_TIMEOUTS_SEC.get(endpoint, DEFAULT_TIMEOUT_SEC)
+
+        for attempt in range(MAX_RETRIES + 1):
+            start = time.monotonic()
+            try:
+                retData = self.session.request(method, self.baseUrl + endpoint, json=body, timeout=timeout)
+            except Exception as ex:
+                self.recordLatency(endpoint, time.monotonic() - start, True)
+                if attempt >= MAX_RETRIES or not self.isRetryable(method, ex):
+                    raise ex
+                self.log.log(LogType.Trace, f"{method} {endpoint} failed, retrying... {ex}")
+                self.backoff(attempt)
+                continue
+
+            self.recordLatency(endpoint, time.monotonic() - start, retData.status_code >= 500)
+
+            if method == "GET" and retData.status_code in RETRY_ON_STATUS and attempt < MAX_RETRIES:
+                self.log.log(LogType.Trace, f"{method} {endpoint} returned {retData.status_code}, retrying...")
+                self.backoff(attempt)
+                continue
+
+            return retData
+
+    # ##############################################################################################################
+    # Tested. A GET is retried on any connection error or timeout. A POST only if the connection was never made,
+    # a reset or read timeout may come after the server already acted on it (e.g. a lock).
+    # ##############################################################################################################
+    def isRetryable(self, method: str, ex: Exception):
+        if method == "GET":
+            return isinstance(ex, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+        return isinstance(ex, requests.exceptions.ConnectTimeout) or self.isNewConnectionError(ex)
+
+    @staticmethod
+    def isNewConnectionError(ex: Exception):
+        if not isinstance(ex, requests.exceptions.ConnectionError):
+            return False
+        reason = ex.args[0] if len(ex.args) > 0 else None
+        return isinstance(getattr(reason, "reason", reason), NewConnectionError)
+
+    # ##############################################################################################################
+    # Exponential backoff with full jitter
+    # ##############################################################################################################
+    def backoff(self, attempt: int):
+        time.sleep(random.uniform(0, RETRY_BACKOFF_SEC * (2 ** attempt)))
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def recordLatency(self, endpoint: str, seconds: float, failed: bool):
+        with self.latencyLock:
+            if endpoint not in self.latency:
+                self.latency[endpoint] = {"count": 0, "errors": 0, "totalSec": 0.0, "maxSec": 0.0}
+
+            stats = self.latency[endpoint]
+            stats["count"] += 1
+            stats["errors"] += 1 if failed else 0
+            stats["totalSec"] += seconds
+            stats["maxSec"] = max(stats["maxSec"], seconds)
+
+    # ##############################################################################################################
+    # Returns {endpoint: {count, errors, totalSec, maxSec, avgSec}}
+    # ##############################################################################################################
+    def getLatencyStats(self):
+        with self.latencyLock:
+            retData = {}
+            for endpoint, stats in self.latency.items():
+                retData[endpoint] = dict(stats)
+                retData[endpoint]["avgSec"] = stats["totalSec"] / stats["count"] if stats["count"] > 0 else 0.0
+            return retData
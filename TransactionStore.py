@@ -0,0 +1,173 @@
+import datetime, json, os, sqlite3, threading, time
+from Logger import LogType
+import TimeUtils
+
+TRANSACTION_STORE_PATH = os.getenv('TP_TRANSACTION_STORE', "/logs/tradingPalTransactions.db")
+
+# Bump when the table layout changes. Old store files are then rebuilt with a full sync.
+TRANSACTION_STORE_VERSION = 1
+
+# A query triggers a sync towards avanza if the last sync is older than this
+TRANSACTION_SYNC_INTERVAL_SEC = 300
+
+# Transactions are fetched from this many days before the newest known one, to catch late bookings
+TRANSACTION_SYNC_OVERLAP_DAYS = 7
+
+sharedTransactionStore = None
+sharedTransactionStoreLock = threading.Lock()
+
+class TransactionStore:
+
+    # ##############################################################################################################
+    # Local copy of the avanza transactions in sqlite, indexed by date, type and account, synced incrementally
+    # ##############################################################################################################
+    def __init__(self, log, path: str = TRANSACTION_STORE_PATH):
+        self.log = log
+        self.path = path
+        self.db = None
+        self.lock = threading.RLock()
+        self.lastSync = 0
+
+    # ##############################################################################################################
+    # One store shared by all AvanzaHandler instances
+    # ##############################################################################################################
+    @staticmethod
+    def getShared(log):
+        global sharedTransactionStore
+
+        with sharedTransactionStoreLock:
+            if sharedTransactionStore is None:
+                sharedTransactionStore = TransactionStore(log)
+            return sharedTransactionStore
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def open(self):
+        if self.db is not None:
+            return
+
+        try:
+            self.db = sqlite3.connect(self.path, check_same_thread=False)
+            self.createTables()
+        except Exception as ex:
+            self.log.log(LogType.Trace, f"Could not open transaction store {self.path}, keeping it in memory only, {ex}")
+            self.db = sqlite3.connect(":memory:", check_same_thread=False)
+            self.createTables()
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def createTables(self):
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+
+        if row is None or int(row[0]) != TRANSACTION_STORE_VERSION:
+            self.db.execute("DROP TABLE IF EXISTS transactions")
+            self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (str(TRANSACTION_STORE_VERSION),))
+
+        self.db.execute("""CREATE TABLE IF NOT EXISTS transactions (
+            id TEXT PRIMARY KEY, verificationDate TEXT, transactionType TEXT, accountId TEXT, data TEXT)""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS transactionsByDate ON transactions (verificationDate)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS transactionsByType ON transactions (transactionType, verificationDate)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS transactionsByAccount ON transactions (accountId, verificationDate)")
+        self.db.commit()
+
+    # ##############################################################################################################
+    # fetchTransactions(fromDate) shall return the raw avanza transactions from fromDate ('YYYY-MM-DD'), or all
+    # transactions if fromDate is None. Returns the number of new transactions.
+    # ##############################################################################################################
+    def sync(self, fetchTransactions, force: bool = False):
+
+        with self.lock:
+            if not force and time.monotonic() - self.lastSync < TRANSACTION_SYNC_INTERVAL_SEC and self.lastSync > 0:
+                return 0
+
+            self.open()
+            newestDate = self.db.execute("SELECT MAX(verificationDate) FROM transactions").fetchone()[0]
+            fromDate = None
+            if newestDate is not None:
+                fromDate = (datetime.date.fromisoformat(newestDate) - datetime.timedelta(days=TRANSACTION_SYNC_OVERLAP_DAYS)).isoformat()
+
+            transactions = fetchTransactions(fromDate)
+            countBefore = self.db.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+
+            transactions = [t for t in transactions if 'id' in t]
+            dates = TimeUtils.parseDates([t.get('verificationDate') for t in transactions])
+            self.db.executemany("INSERT OR IGNORE INTO transactions (id, verificationDate, transactionType, accountId, data) VALUES (?, ?, ?, ?, ?)",
+                                [(t['id'], date, t.get('transactionType'), t.get('account', {}).get('id'), json.dumps(t))
+                                 for t, date in zip(transactions, dates)])
+            self.db.commit()
+
+            newCount = self.db.execute("SELECT COUNT(*) FROM transactions").fetchone()[0] - countBefore
+            self.lastSync = time.monotonic()
+            self.log.log(LogType.Trace, f"Synced transactions from {fromDate}, {newCount} new")
+            return newCount
+
+    # ##############################################################################################################
+    # All filters are optional. Dates are inclusive, 'YYYY-MM-DD'. Newest transactions first.
+    # ##############################################################################################################
+    def query(self, fromDate: str = None, toDate: str = None, transactionTypes = None, accountIds = None):
+
+        where = []
+        params = []
+
+        if fromDate is not None:
+            where.append("verificationDate >= ?")
+            params.append(fromDate)
+        if toDate is not None:
+            where.append("verificationDate <= ?")
+            params.append(toDate)
+        if transactionTypes is not None:
+            where.append(f"transactionType IN ({','.join('?' * len(transactionTypes))})")
+            params += list(transactionTypes)
+        if accountIds is not None:
+            where.append(f"accountId IN ({','.join('?' * len(accountIds))})")
+            params += list(accountIds)
+
+        sql = "SELECT data FROM transactions"
+        if len(where) > 0:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY verificationDate DESC, rowid"
+
+        with self.lock:
+            self.open()
+            return [json.loads(row[0]) for row in self.db.execute(sql, params)]
+
+    # ##############################################################################################################
+    # One pass over the transactions in the range. Returns per type: total, count and the amounts per instrument
+    # (isin), per account and per instrument currency. Amounts are the booked amounts, i.e. in SEK.
+    # ##############################################################################################################
+    def aggregate(self, fromDate: str = None, toDate: str = None, transactionTypes = None, accountIds = None):
+
+        retData = {}
+        if transactionTypes is not None:
+            for transactionType in transactionTypes:
+                retData[transactionType] = {"total": 0.0, "count": 0, "perTicker": {}, "perAccount": {}, "perCurrency": {}}
+
+        for transaction in self.query(fromDate, toDate, transactionTypes, accountIds):
+            summary = retData.setdefault(transaction['transactionType'], {"total": 0.0, "count": 0, "perTicker": {}, "perAccount": {}, "perCurrency": {}})
+            amount = transaction.get('amount', 0.0)
+            orderbook = transaction.get('orderbook', {})
+            isin = orderbook.get('isin', 'UNKNOWN')
+            accountId = transaction['account']['id']
+            currency = orderbook.get('currency', transaction.get('currency', 'UNKNOWN'))
+
+            summary["total"] += amount
+            summary["count"] += 1
+
+            ticker = summary["perTicker"].setdefault(isin, {"name": orderbook.get('name', ''), "amount": 0.0, "count": 0})
+            ticker["amount"] += amount
+            ticker["count"] += 1
+
+            summary["perAccount"][accountId] = summary["perAccount"].get(accountId, 0.0) + amount
+            summary["perCurrency"][currency] = summary["perCurrency"].get(currency, 0.0) + amount
+
+        for summary in retData.values():
+            summary["total"] = round(summary["total"], 2)
+            for ticker in summary["perTicker"].values():
+                ticker["amount"] = round(ticker["amount"], 2)
+            for key in ["perAccount", "perCurrency"]:
+                summary[key] = {k: round(v, 2) for k, v in summary[key].items()}
+
+        return retData
@@ -0,0 +1,12 @@
+# Production serving: gunicorn -c gunicorn.conf.py RestServer:app
+# One worker wins the leader lock and runs the trading loop, the others serve reads from the shared state.
+# TP_SHARED_STATE, TP_LEADER_LOCK, TP_TRANSACTION_STORE and TP_TRADE_REGISTER must point to files all workers can reach.
+import os
+
+os.environ["TP_MULTI_WORKER"] = "true"
+
+bind = "0.0.0.0:5002"
+workers = int(os.getenv("TP_WORKERS", "4"))
+worker_class = "gthread"
+threads = int(os.getenv("TP_WORKER_THREADS", "4"))
+timeout = 120
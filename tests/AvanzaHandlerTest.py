@@ -1,5 +1,9 @@
+import datetime, time
 from AvanzaHandler import AvanzaHandler, TransactionType
+from TickerIndex import TickerIndex
+from TransactionStore import TransactionStore
 from Logger import Log
+from avanza import InstrumentType, OrderType
 from unittest.mock import MagicMock
 
 getTransactionsReply = {'transactions': [{'account': {'type': 'Kapitalforsakring', 'name': 'Jonas KF', 'id': '9288043'}, 'sum': -54.99, 'currency': 'USD', 'description': 'Sålt 1', 'orderbook': {'isin': 'US0886061086', 'currency': 'USD', 'name': 'BHP Group Ltd', 'flagCode': 'US', 'id': '35068', 'type': 'STOCK'}, 'price': 54.99, 'volume': -1, 'transactionType': 'SELL', 'verificationDate': '2021-11-11', 'id': 'DEAL-9288043-391275580'}, {'account': {'type': 'Kapitalforsakring', 'name': 'Jonas KF', 'id': '9288043'}, 'sum': -40.88, 'currency': 'CAD', 'description': 'Sålt 8', 'orderbook': {'isin': 'CA47009M8896', 'currency': 'CAD', 'name': 'Jaguar Mining Inc', 'flagCode': 'CA', 'id': '85697', 'type': 'STOCK'}, 'price': 5.11, 'volume': -8, 'transactionType': 'SELL', 'verificationDate': '2021-11-11', 'id': 'DEAL-9288043-391275524'}, {'account': {'type': 'Kapitalforsakring', 'name': 'Jonas KF', 'id': '9288043'}, 'sum': -47.55, 'currency': 'CAD', 'description': 'Sålt 3', 'orderbook': {'isin': 'CA8910546032', 'currency': 'CAD', 'name': 'Torex Gold Resources Inc', 'flagCode': 'CA', 'id': '282537', 'type': 'STOCK'}, 'price': 15.85, 'volume': -3, 'transactionType': 'SELL', 'verificationDate': '2021-11-11', 'id': 'DEAL-9288043-391115211'}, {'account': {'type': 'Kapitalforsakring', 'name': 'Jonas KF', 'id': '9288043'}, 'sum': 174.46, 'currency': 'SEK', 'description': 'Sålt 11 st till kurs 15,86000 CAD Rättelse BOSTON PIZZA ROYALTIES INCOME FUND', 'amount': -1712.0, 'orderbook': {'isin': 'CA1010841015', 'currency': 'CAD', 'name': 'Boston Pizza Royalties Income Fund', 'flagCode': 'CA', 'id': '194368', 'type': 'STOCK'}, 'currencyRate': 9.87121, 'price': 15.86, 'volume': 11.0, 'commission': -10.0, 'noteId': 'RBBDWMDJ', 'transactionType': 'SELL', 'verificationDate': '2021-11-10', 'id': '2926528986RBBDWMDJ4'}, {'account': {'type': 'Kapitalforsakring', 'name': 'Jonas KF', 'id': '9288043'}, 'sum': -174.46, 'currency': 'SEK', 'description': 'Sålt 11 st till kurs 15,86000 CAD BOSTON PIZZA ROYALTIES INCOME FUND', 'amount': 1193.0, 'orderbook': {'isin': 'CA1010841015', 'currency': 'CAD', 'name': 'Boston Pizza Royalties Income Fund', 'flagCode': 'CA', 'id': '194368', 'type': 'STOCK'}, 'currencyRate': 6.877364, 'price': 15.86, 'volume': -11.0, 'commission': 7.0, 'noteId': 'GRGSJQFM', 'transactionType': 'SELL', 'verificationDate': '2021-11-10', 'id': '2924450929GRGSJQFM4'}, {'account': {'type': 'Investeringssparkonto', 'name': 'Sophia ISK', 'id': '9950862'}, 'sum': 12.0, 'currency': 'SEK', 'description': 'Utdelning 12 st à 1,00 INVESTOR B', 'amount': 12.0, 'orderbook': {'isin': 'SE0015811963', 'currency': 'SEK', 'name': 'Investor B', 'flagCode': 'SE', 'id': '5247', 'type': 'STOCK'}, 'price': 1.0, 'volume': 12.0, 'transactionType': 'DIVIDEND', 'verificationDate': '2021-11-10', 'id': '2924121972ABBBPNPT79827'}, {'account': {'type': 'Investeringssparkonto', 'name': 'Theodor ISK', 'id': '9920769'}, 'sum': 12.0, 'currency': 'SEK', 'description': 'Utdelning 12 st à 1,00 INVESTOR B', 'amount': 12.0, 'orderbook': {'isin': 'SE0015811963', 'currency': 'SEK', 'name': 'Investor B', 'flagCode': 'SE', 'id': '5247', 'type': 'STOCK'}, 'price': 1.0, 'volume': 12.0, 'transactionType': 'DIVIDEND', 'verificationDate': '2021-11-10', 'id': '2924121107ABBBPNPT78963'}, {'account': {'type': 'Investeringssparkonto', 'name': 'Alexander ISK', 'id': '9920025'}, 'sum': 12.0, 'currency': 'SEK', 'description': 'Utdelning 12 st à 1,00 INVESTOR B', 'amount': 12.0, 'orderbook': {'isin': 'SE0015811963', 'currency': 'SEK', 'name': 'Investor B', 'flagCode': 'SE', 'id': '5247', 'type': 'STOCK'}, 'price': 1.0, 'volume': 12.0, 'transactionType': 'DIVIDEND', 'verificationDate': '2021-11-10', 'id': '2924121077ABBBPNPT78933'}, {'account': {'type': 'Investeringssparkonto', 'name': 'Jonas ISK', 'id': '4397855'}, 'sum': 27.0, 'currency': 'SEK', 'description': 'Utdelning 27 st à 1,00 INVESTOR B', 'amount': 27.0, 'orderbook': {'isin': 'SE0015811963', 'currency': 'SEK', 'name': 'Investor B', 'flagCode': 'SE', 'id': '5247', 'type': 'STOCK'}, 'price': 1.0, 'volume': 27.0, 'transactionType': 'DIVIDEND', 'verificationDate': '2021-11-10', 'id': '2923959680ABBBPNPS17711'}, {'account': {'type': 'AktieFondkonto', 'name': 'Jonas buffertkonto', 'id': '4397847'}, 'currency': 'SEK', 'description': 'Överföring från Collector 6700698', 'amount': 49.0, 'transactionType': 'DEPOSIT', 'verificationDate': '2021-11-10', 'id': '2923736182ECQKDLQK1'}, {'account': {'type': 'SparkontoPlus', 'name': 'AlexanderVeckopeng', 'id': '6700698'}, 'currency': 'SEK', 'description': 'Överföring till Avanzakonto 4397847', 'amount': -49.0, 'transactionType': 'WITHDRAW', 'verificationDate': '2021-11-10', 'id': '2923736166ECQKDLPN1'}, {'account': {'type': 'Kapitalforsakring', 'name': 'Jonas KF', 'id': '9288043'}, 'sum': -174.46, 'currency': 'SEK', 'description': 'Sålt 11 st till kurs 15,86000 CAD BOSTON PIZZA ROYALTIES INCOME FUND', 'amount': 1712.0, 'orderbook': {'isin': 'CA1010841015', 'currency': 'CAD', 'name': 'Boston Pizza Royalties Income Fund', 'flagCode': 'CA', 'id': '194368', 'type': 'STOCK'}, 'currencyRate': 9.87121, 'price': 15.86, 'volume': -11.0, 'commission': 10.0, 'noteId': 'GRGRLKHK', 'transactionType': 'SELL', 'verificationDate': '2021-11-09', 'id': '2923445394GRGRLKHK4'}, {'account': {'type': 'Kapitalforsakring', 'name': 'Jonas KF', 'id': '9288043'}, 'sum': -99.97, 'currency': 'SEK', 'description': 'Sålt 1 st till kurs 99,97000 USD AMERESCO INC', 'amount': 846.0, 'orderbook': {'isin': 'US02361E1082', 'currency': 'USD', 'name': 'Ameresco Inc', 'flagCode': 'US', 'id': '326657', 'type': 'STOCK'}, 'currencyRate': 8.555059, 'price': 99.97, 'volume': -1.0, 'commission': 9.0, 'noteId': 'GRGJKXNJ', 'transactionType': 'SELL', 'verificationDate': '2021-11-08', 'id': '2920499791GRGJKXNJ4'}, {'account': {'type': 'Kapitalforsakring', 'name': 'Jonas KF', 'id': '9288043'}, 'currency': 'SEK', 'description': 'Utländsk källskatt DNB BANK ASA 25%', 'amount': -56.48, 'orderbook': {'isin': 'NO0010161896', 'currency': 'NOK', 'name': 'DNB Bank', 'flagCode': 'NO', 'id': '52628', 'type': 'STOCK'}, 'volume': 25.0, 'transactionType': 'FOREIGN_TAX', 'verificationDate': '2021-11-08', 'id': '2917854474ABBBPNNL2553'}, {'account': {'type': 'Kapitalforsakring', 'name': 'Jonas KF', 'id': '9288043'}, 'sum': 225.93, 'currency': 'SEK', 'description': 'Utdelning 25 st à 9,03 DNB BANK ASA', 'amount': 225.93, 'orderbook': {'isin': 'NO0010161896', 'currency': 'NOK', 'name': 'DNB Bank', 'flagCode': 'NO', 'id': '52628', 'type': 'STOCK'}, 'price': 9.037323, 'volume': 25.0, 'transactionType': 'DIVIDEND', 'verificationDate': '2021-11-08', 'id': '2917854473ABBBPNNL2552'}, {'account': {'type': 'Kapitalforsakring', 'name': 'Jonas KF', 'id': '9288043'}, 'currency': 'SEK', 'description': 'Riskpremie', 'amount': -0.49, 'transactionType': 'UNKNOWN', 'verificationDate': '2021-11-08', 'id': '2917529679LBGPBZKK1'}, {'account': {'type': 'Kapitalforsakring', 'name': 'Jonas KF', 'id': '9288043'}, 'sum': 135.42, 'currency': 'SEK', 'description': 'Köpt 6 st till kurs 22,57000 USD SINOPEC SHANGHI PETROCHEM ADR', 'amount': -1175.0, 'orderbook': {'isin': 'US82935M1099', 'currency': 'USD', 'name': 'Sinopec Shanghai Petrochemical Co Ltd', 'flagCode': 'US', 'id': '496178', 'type': 'STOCK'}, 'currencyRate': 8.610473, 'price': 22.57, 'volume': 6.0, 'commission': 9.0, 'noteId': 'GRFRJDPL', 'transactionType': 'BUY', 'verificationDate': '2021-11-04', 'id': '2915137462GRFRJDPL4'}, {'account': {'type': 'Kapitalforsakring', 'name': 'Jonas KF', 'id': '9288043'}, 'sum': 49.34, 'currency': 'SEK', 'description': 'Köpt 2 st till kurs 24,67000 USD AT&T INC', 'amount': -434.0, 'orderbook': {'isin': 'US00206R1023', 'currency': 'USD', 'name': 'AT&T Inc', 'flagCode': 'US', 'id': '3507', 'type': 'STOCK'}, 'currencyRate': 8.610473, 'price': 24.67, 'volume': 2.0, 'commission': 9.0, 'noteId': 'GRFRJDNQ', 'transactionType': 'BUY', 'verificationDate': '2021-11-04', 'id': '2915137388GRFRJDNQ4'}, {'account': {'type': 'Kapitalforsakring', 'name': 'Jonas KF', 'id': '9288043'}, 'currency': 'SEK', 'description': 'Överföring från Avanzakonto 4397855', 'amount': 2900.0, 'transactionType': 'DEPOSIT', 'verificationDate': '2021-11-04', 'id': '2914903191ECQGXTGP1'}, {'account': {'type': 'Investeringssparkonto', 'name': 'Jonas ISK', 'id': '4397855'}, 'currency': 'SEK', 'description': 'Överföring till Avanzakonto 9288043', 'amount': -2900.0, 'transactionType': 'WITHDRAW', 'verificationDate': '2021-11-04', 'id': '2914903190ECQGXTGN1'}], 'totalNumberOfTransactions': 20}
@@ -7,6 +11,7 @@ getStockInfoReply= {'priceThreeMonthsAgo': 1.54, 'priceOneWeekAgo': 1.99, 'price
 placeOrderReply = {'status': 'SUCCESS', 'messages': [''], 'orderId': '385663370', 'requestId': '-1'}
 deleteOrderReply = {'status': 'SUCCESS', 'messages': [''], 'orderId': '385663370', 'requestId': '-1'}
 searchForStockReply = {'totalNumberOfHits': 2, 'hits': [{'instrumentType': 'STOCK', 'numberOfHits': 2, 'topHits': [{'currency': 'USD', 'lastPrice': 157.29, 'changePercent': -2.05, 'flagCode': 'US', 'tradable': True, 'tickerSymbol': 'TXG', 'name': '10X Genomics Inc', 'id': '996635'}, {'currency': 'CAD', 'lastPrice': 16.32, 'changePercent': 1.68, 'flagCode': 'CA', 'tradable': True, 'tickerSymbol': 'TXG', 'name': 'Torex Gold Resources Inc', 'id': '282537'}]}]}
+getDealsAndOrdersReply = {'orders': [{'orderId': '385663371', 'account': {'id': '9288043'}, 'orderbook': {'id': '76426'}, 'volume': 10, 'price': 1.78, 'type': 'BUY', 'status': 'ACTIVE'}], 'deals': [{'orderId': '385663370', 'dealId': '1', 'volume': 6, 'price': 1.79, 'type': 'BUY'}, {'orderId': '385663370', 'dealId': '2', 'volume': 4, 'price': 1.79, 'type': 'BUY'}], 'accounts': []}
 getOverviewReply = {'accounts': [{'accountType': 'Investeringssparkonto', 'interestRate': 0.0, 'depositable': True, 'performancePercent': 28.141565920369494, 'totalProfit': 10000.89, 'performance': 15000.09999999999, 'attorney': False, 'active': True, 'accountId': '4397855', 'tradable': True, 'totalBalance': 10000.0, 'accountPartlyOwned': False, 'totalBalanceDue': 0.0, 'ownCapital': 25000.43, 'buyingPower': 10001.0, 'totalProfitPercent': 14.44, 'name': 'Jonas ISK'}, {'accountType': 'Kapitalforsakring', 'interestRate': 0.0, 'depositable': True, 'performancePercent': 40.231653483118876, 'totalProfit': 12000.1, 'performance': 25001.82000000002, 'attorney': False, 'active': True, 'accountId': '9288043', 'tradable': True, 'totalBalance': 15002.13, 'accountPartlyOwned': False, 'totalBalanceDue': 0.0, 'ownCapital': 29999.83, 'buyingPower': 35000.13, 'totalProfitPercent': 12.77, 'name': 'Jonas KF'}], 'numberOfOrders': 0, 'numberOfDeals': 0, 'numberOfTransfers': 0, 'numberOfIntradayTransfers': 0, 'totalBuyingPower': 500.0, 'totalOwnCapital': 1000.0, 'totalPerformance': 23000.42, 'totalPerformancePercent': 31.88555687370771, 'totalBalance': 1500.0, 'totalbuyingPower': 500.0}
 
 def testGetTransactions():
@@ -24,23 +29,61 @@ def testGetTransactions():
     assert len(retVal) == 3
 
 def testGetYieldByDate():
-    objUnderTest = AvanzaHandler(Log())
+    objUnderTest = AvanzaHandler(Log(), transactionStore=TransactionStore(Log(), ":memory:"))
     objUnderTest.avanza = MagicMock()
     objUnderTest.avanza.get_transactions.return_value = getTransactionsReply
 
-    retVal = objUnderTest.getYieldByDate('2021-11-10')
+    retVal = objUnderTest.getYield('2021-11-10')
 
     assert retVal is not None and len(retVal) is 1
 
 def testGetTaxByDate():
-    objUnderTest = AvanzaHandler(Log())
+    objUnderTest = AvanzaHandler(Log(), transactionStore=TransactionStore(Log(), ":memory:"))
     objUnderTest.avanza = MagicMock()
     objUnderTest.avanza.get_transactions.return_value = getTransactionsReply
 
-    retVal = objUnderTest.getTaxByDate('2021-11-08')
+    retVal = objUnderTest.getTax('2021-11-08')
 
     assert retVal is not None and len(retVal) is 1
 
+def testGetYieldByDateRange():
+    objUnderTest = AvanzaHandler(Log(), transactionStore=TransactionStore(Log(), ":memory:"))
+    objUnderTest.avanza = MagicMock()
+    objUnderTest.avanza.get_transactions.return_value = getTransactionsReply
+
+    retVal = objUnderTest.getYield('2021-11-01', '2021-11-30')
+
+    assert len(retVal) == 2
+
+def testGetTransactionSummary():
+    objUnderTest = AvanzaHandler(Log(), transactionStore=TransactionStore(Log(), ":memory:"))
+    objUnderTest.avanza = MagicMock()
+    objUnderTest.avanza.get_transactions.return_value = getTransactionsReply
+
+    retVal = objUnderTest.getTransactionSummary('2021-11-01', '2021-11-30')
+
+    assert retVal['DIVIDEND']['count'] == 2
+    assert retVal['DIVIDEND']['total'] == 252.93
+    assert retVal['DIVIDEND']['perAccount'] == {'9288043': 225.93, '4397855': 27.0}
+    assert retVal['DIVIDEND']['perCurrency'] == {'NOK': 225.93, 'SEK': 27.0}
+    assert retVal['DIVIDEND']['perTicker']['NO0010161896']['amount'] == 225.93
+    assert retVal['FOREIGN_TAX']['total'] == -56.48
+    assert objUnderTest.avanza.get_transactions.call_count == 1
+
+def testTransactionStoreIncrementalSync():
+    transactionStore = TransactionStore(Log(), ":memory:")
+    objUnderTest = AvanzaHandler(Log(), transactionStore=transactionStore)
+    objUnderTest.avanza = MagicMock()
+    objUnderTest.avanza.get_transactions.return_value = getTransactionsReply
+
+    assert transactionStore.sync(objUnderTest.fetchTransactionsFrom) == 20
+    assert transactionStore.sync(objUnderTest.fetchTransactionsFrom) == 0
+    assert transactionStore.sync(objUnderTest.fetchTransactionsFrom, force=True) == 0
+    objUnderTest.avanza.get_transactions.assert_called_with(transactions_from=datetime.date(2021, 11, 4))
+
+    assert len(transactionStore.query(fromDate='2021-11-10', toDate='2021-11-11')) == 11
+    assert len(transactionStore.query(transactionTypes=['DIVIDEND'], accountIds=['4397855'])) == 1
+
 def testGetOverview():
     objUnderTest = AvanzaHandler(Log())
     objUnderTest.avanza = MagicMock()
@@ -60,6 +103,17 @@ def testGetFunds():
     assert retVal is not None
     assert retVal > 0
 
+def testGetBuyingPower():
+    objUnderTest = AvanzaHandler(Log())
+    objUnderTest.avanza = MagicMock()
+    objUnderTest.avanza.get_overview.return_value = getOverviewReply
+
+    buyingPower, fetchedAt = objUnderTest.getBuyingPower()
+
+    assert buyingPower['4397855'] == 10001.0
+    assert set(buyingPower.keys()) <= set(objUnderTest.allowedAcconts)
+    assert fetchedAt <= time.monotonic()
+
 def testplaceOrder():
     objUnderTest = AvanzaHandler(Log())
     objUnderTest.PRODUCTION = "true" # OK cause we mock the avanza
@@ -70,6 +124,32 @@ def testplaceOrder():
 
     assert retVal is not None
 
+def testEditOrder():
+    objUnderTest = AvanzaHandler(Log())
+    objUnderTest.PRODUCTION = "true" # OK cause we mock the avanza
+    objUnderTest.avanza = MagicMock()
+    objUnderTest.avanza.edit_order.return_value = {'messages': [], 'orderId': '420807539', 'requestId': '-1', 'status': 'SUCCESS'}
+
+    retVal = objUnderTest.editOrder("1234", "420807539", "4532", TransactionType.Sell, 2.62, 2)
+
+    assert retVal == {'orderRequestStatus': 'SUCCESS', 'message': '', 'orderId': '420807539'}
+    kwargs = objUnderTest.avanza.edit_order.call_args.kwargs
+    assert kwargs['instrument_type'] == InstrumentType.STOCK
+    assert kwargs['order_id'] == "420807539"
+    assert kwargs['order_book_id'] == "4532"
+    assert kwargs['order_type'] == OrderType.SELL
+    assert kwargs['volume'] == 2
+
+def testEditOrderFailed():
+    objUnderTest = AvanzaHandler(Log())
+    objUnderTest.PRODUCTION = "true" # OK cause we mock the avanza
+    objUnderTest.avanza = MagicMock()
+    objUnderTest.avanza.edit_order.return_value = {'messages': ['Order not found'], 'requestId': '-1', 'status': 'ERROR'}
+
+    retVal = objUnderTest.editOrder("1234", "420807539", "4532", TransactionType.Buy, 2.6, 2)
+
+    assert retVal == {'orderRequestStatus': 'ERROR', 'message': 'Order not found', 'orderId': '420807539'}
+
 def testGenerateOrderValidDate():
     objUnderTest = AvanzaHandler(Log())
 
@@ -92,22 +172,91 @@ def testGetTickerDetails():
     retVal = objUnderTest.getTickerDetails("AKSO.ST")
 
     assert retVal is not None
+    assert retVal.accountId in AvanzaHandler.allowedAcconts
+    assert retVal.tick1Percent > 0 and len(retVal.buyLadder) == 3
 
-def testTickerToId():
+def testGetTickerDetailsOnlyOtherAccounts():
+    objUnderTest = AvanzaHandler(Log())
+    objUnderTest.avanza = MagicMock()
+    objUnderTest.avanza.get_stock_info.return_value = dict(getStockInfoReply, positions=[dict(getStockInfoReply['positions'][0], accountId='6700698')])
+
+    try:
+        objUnderTest.getTickerDetails("76426")
+        assert False
+    except RuntimeError as ex:
+        assert "allowed accounts" in str(ex)
+
+def testGetTickerDetailsCached():
     objUnderTest = AvanzaHandler(Log())
     objUnderTest.avanza = MagicMock()
+    objUnderTest.avanza.get_stock_info.return_value = getStockInfoReply
+
+    objUnderTest.getTickerDetails("76426")
+    objUnderTest.getTickerDetails("76426")
+    assert objUnderTest.avanza.get_stock_info.call_count == 1
+
+    objUnderTest.getTickerDetails("76426", bypassCache=True)
+    assert objUnderTest.avanza.get_stock_info.call_count == 2
+
+def testGetTickerDetailsTickTableFromTicker():
+    objUnderTest = AvanzaHandler(Log(), TickerIndex(Log(), ":memory:"))
+    objUnderTest.avanza = MagicMock()
+    objUnderTest.avanza.search_for_stock.return_value = searchForStockReply
+    objUnderTest.avanza.get_stock_info.return_value = dict(getStockInfoReply, flagCode='US', buyPrice=0.4, sellPrice=0.405, lastPrice=0.4,
+                                                           lowestPrice=0.4, highestPrice=0.405, orderDepthLevels=[])
+
+    tickerId = objUnderTest.tickerToId("TXG.TO")
+    retVal = objUnderTest.getTickerDetails(tickerId)
+
+    assert retVal.tickSize == 0.005
+
+def testTickerToId():
+    objUnderTest = AvanzaHandler(Log(), TickerIndex(Log(), ":memory:"))
+    objUnderTest.avanza = MagicMock()
     objUnderTest.avanza.search_for_stock.return_value = searchForStockReply
 
     retVal = objUnderTest.tickerToId("TXG")
 
     assert retVal is not None
 
+def testTickerToIdPersistentIndex():
+    tickerIndex = TickerIndex(Log(), ":memory:")
+    objUnderTest = AvanzaHandler(Log(), tickerIndex)
+    objUnderTest.avanza = MagicMock()
+    objUnderTest.avanza.search_for_stock.return_value = searchForStockReply
+
+    assert objUnderTest.tickerToId("TXG.TO") == '282537'
+    assert objUnderTest.tickerToId("NOSUCH.ST") is None
+
+    refreshedHandler = AvanzaHandler(Log(), tickerIndex)
+    refreshedHandler.avanza = MagicMock()
+
+    assert refreshedHandler.tickerToId("TXG.TO") == '282537'
+    assert refreshedHandler.tickerToId("NOSUCH.ST") is None
+    assert refreshedHandler.avanza.search_for_stock.call_count == 0
+
+def testResolveTickers():
+    objUnderTest = AvanzaHandler(Log(), TickerIndex(Log(), ":memory:"))
+    objUnderTest.avanza = MagicMock()
+    objUnderTest.avanza.search_for_stock.return_value = searchForStockReply
+
+    retVal = objUnderTest.resolveTickers(["TXG.TO", "TXG.TO", "TXG", "NOSUCH.ST", None])
+
+    assert retVal == {"TXG.TO": '282537', "TXG": '996635', "NOSUCH.ST": None}
+    assert objUnderTest.avanza.search_for_stock.call_count == 3
+
 def testSecondsSinceDate():
     objUnderTest = AvanzaHandler(Log())
 
     retVal = objUnderTest.secondsSinceDate('2021-11-17T15:31:24.000+0100')
 
-    assert retVal > 0
+    assert retVal > 365 * 86400
+
+    try:
+        objUnderTest.secondsSinceDate('2021-11-17')
+        assert False
+    except RuntimeError:
+        pass
 
 def testYhooTickerToAvanzaTicker():
     objUnderTest = AvanzaHandler(Log())
@@ -127,17 +276,41 @@ def testDeleteOrder():
     assert retVal is not None
     assert 'status' in retVal and retVal['status'] == 'SUCCESS'
 
+def testGetDealsAndOrders():
+    objUnderTest = AvanzaHandler(Log())
+    objUnderTest.avanza = MagicMock()
+    objUnderTest.avanza.get_deals_and_orders.return_value = getDealsAndOrdersReply
+
+    retVal = objUnderTest.getDealsAndOrders()
+
+    assert '385663371' in retVal['orders']
+    assert retVal['deals']['385663370'] == 10
+    assert objUnderTest.getOrderDetails('385663371') is not None
+    assert objUnderTest.getOrderDetails('1234') is None
+
 if __name__ == "__main__":
     testGetTransactions()
-    #testGetYieldByDate()
-    #testGetTaxByDate()
+    testGetYieldByDate()
+    testGetTaxByDate()
+    testGetYieldByDateRange()
+    testGetTransactionSummary()
+    testTransactionStoreIncrementalSync()
     testGetOverview()
     testGetFunds()
+    testGetBuyingPower()
     testplaceOrder()
+    testEditOrder()
+    testEditOrderFailed()
     testGenerateOrderValidDate()
     testGuessTickSize()
     testGetTickerDetails()
+    testGetTickerDetailsOnlyOtherAccounts()
+    testGetTickerDetailsCached()
+    testGetTickerDetailsTickTableFromTicker()
     testTickerToId()
+    testTickerToIdPersistentIndex()
+    testResolveTickers()
     testSecondsSinceDate()
     testYhooTickerToAvanzaTicker()
-    testDeleteOrder()
\ No newline at end of file
+    testDeleteOrder()
+    testGetDealsAndOrders()
\ No newline at end of file
@@ -0,0 +1,108 @@
+# End to end throughput of MainBroker.doStocksTransaction against FakeAvanza and FakeTradingPalServer.
+# Run from the repo root: PYTHONPATH=. python tests/BrokerBenchmark.py
+import argparse, time
+from unittest.mock import patch, MagicMock
+import MainBroker
+from AvanzaHandler import AvanzaHandler, ObservedAvanza, TransactionType
+from TickerIndex import TickerIndex
+from TransactionStore import TransactionStore
+from TradingPalClient import TradingPalClient
+from Metrics import Metrics
+from ExecutionEngine import createExecutionEngine, EXECUTION_ENGINE
+from Logger import Log
+from FakeAvanza import FakeAvanza
+from Records import TradeInstruction
+from FakeTradingPalServer import FakeTradingPalServer
+
+# ##############################################################################################################
+# A broker wired to the simulators. Nothing leaves the machine.
+# ##############################################################################################################
+def createSimulatedBroker(fakeAvanza: FakeAvanza, server: FakeTradingPalServer, engine: str = EXECUTION_ENGINE):
+    with patch.object(MainBroker.MainBroker, 'refreshAvanzaHandler'):
+        broker = MainBroker.MainBroker()
+    broker.refreshAvanzaHandler = MagicMock()
+    broker.metrics = Metrics()
+    broker.tradingPal = TradingPalClient(server.baseUrl, MainBroker.log)
+    broker.executionEngine = createExecutionEngine(engine)
+
+    avanzaHandler = AvanzaHandler(Log(), TickerIndex(Log(), ":memory:"), TransactionStore(Log(), ":memory:"), metrics=broker.metrics)
+    avanzaHandler.PRODUCTION = "true"
+    avanzaHandler.avanza = ObservedAvanza(fakeAvanza, avanzaHandler.callObservers)
+    broker.avanzaHandler = avanzaHandler
+    return broker
+
+# ##############################################################################################################
+# numberOfStocks instruments SIM0.ST, SIM1.ST ... with a 0.1% spread, none owned
+# ##############################################################################################################
+def addSimulatedStocks(fakeAvanza: FakeAvanza, numberOfStocks: int, levelVolume: int = 1000):
+    for index in range(numberOfStocks):
+        fakeAvanza.addInstrument(f"SIM{index}", "SE", str(100000 + index), bid=100.0, ask=100.1, tickSize=0.05, levelVolume=levelVolume)
+
+# ##############################################################################################################
+# Volume weighted distance of the fill prices from the mid price, in basis points. Positive is worse for us.
+# ##############################################################################################################
+def slippageBps(fakeAvanza: FakeAvanza):
+    weighted = 0.0
+    volume = 0
+    for deal in fakeAvanza.deals:
+        instrument = fakeAvanza.instruments[deal['orderbookId']]
+        mid = (instrument['bid'] + instrument['ask']) / 2
+        weighted += deal['volume'] * 10000 * (deal['price'] - mid) / mid * (1 if deal['isBuy'] else -1)
+        volume += deal['volume']
+    return round(weighted / volume, 1) if volume > 0 else None
+
+# ##############################################################################################################
+# The tradingpal instruction for each simulated (swedish) stock, with the count avanza currently reports
+# ##############################################################################################################
+def createInstructions(fakeAvanza: FakeAvanza, numberToTransact: int):
+    return [TradeInstruction(f"{instrument['tickerSymbol']}.ST", numberToTransact, numberToTransact, instrument['ask'],
+                             (instrument['bid'] + instrument['ask']) / 2, instrument['name'], instrument['volume'], 0)
+            for instrument in fakeAvanza.instruments.values()]
+
+# ##############################################################################################################
+# One buy cycle and one sell cycle. Returns stocks per minute, order to fill latency and avanza calls per trade.
+# ##############################################################################################################
+def runBenchmark(numberOfStocks: int = 20, numberToTransact: int = 5, engine: str = EXECUTION_ENGINE, levelVolume: int = 1000, **fakeAvanzaArgs):
+    fakeAvanza = FakeAvanza(**fakeAvanzaArgs)
+    addSimulatedStocks(fakeAvanza, numberOfStocks, levelVolume)
+    server = FakeTradingPalServer().start()
+
+    try:
+        broker = createSimulatedBroker(fakeAvanza, server, engine)
+
+        start = time.monotonic()
+        broker.doStocksTransaction(createInstructions(fakeAvanza, numberToTransact), TransactionType.Buy)
+        broker.doStocksTransaction(createInstructions(fakeAvanza, numberToTransact), TransactionType.Sell)
+        elapsedSec = time.monotonic() - start
+
+        fills = broker.metrics.get("tradingpal_order_fill_seconds") or {"sum": 0.0, "count": 0}
+        trades = len(server.updates)
+        return {
+            "stocks": 2 * numberOfStocks,
+            "trades": trades,
+            "elapsedSec": round(elapsedSec, 3),
+            "stocksPerMinute": round(60 * trades / elapsedSec, 1) if elapsedSec > 0 else 0,
+            "avgOrderToFillSec": round(fills["sum"] / fills["count"], 3) if fills["count"] > 0 else None,
+            "slippageBps": slippageBps(fakeAvanza),
+            "avanzaCallsPerTrade": round(fakeAvanza.getCallCount() / trades, 1) if trades > 0 else None,
+            "avanzaCalls": dict(fakeAvanza.calls),
+            "tradingPalCalls": len(server.calls)
+        }
+    finally:
+        server.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stocks", type=int, default=20)
+    parser.add_argument("--engine", default=EXECUTION_ENGINE)
+    parser.add_argument("--fillLatencySec", type=float, default=0.1)
+    parser.add_argument("--apiLatencySec", type=float, default=0.02)
+    parser.add_argument("--partialFillRatio", type=float, default=0.0)
+    parser.add_argument("--missRatio", type=float, default=0.0)
+    args = parser.parse_args()
+
+    result = runBenchmark(args.stocks, engine=args.engine, fillLatencySec=args.fillLatencySec, apiLatencySec=args.apiLatencySec,
+                          partialFillRatio=args.partialFillRatio, missRatio=args.missRatio)
+
+    for key, value in result.items():
+        print(f"{key:>22}: {value}")
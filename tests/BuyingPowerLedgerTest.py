@@ -0,0 +1,61 @@
+import threading, time
+from BuyingPowerLedger import BuyingPowerLedger
+
+def testReserveAndRelease():
+    objUnderTest = BuyingPowerLedger(margin=1.0)
+    objUnderTest.seed({'9288043': 1000.0})
+
+    first = objUnderTest.reserve('9288043', 600)
+    assert first is not None
+    assert objUnderTest.reserve('9288043', 600) is None
+    assert objUnderTest.available('9288043') == 400
+
+    objUnderTest.release(first, spentSek=500)
+    assert objUnderTest.available('9288043') == 500
+    assert objUnderTest.reserve('9288043', 500) is not None
+
+def testUnknownAccountNotLimited():
+    objUnderTest = BuyingPowerLedger()
+    objUnderTest.seed({'9288043': 100.0})
+
+    assert objUnderTest.available('4397855') is None
+    assert objUnderTest.reserve('4397855', 1000000) is not None
+
+def testSeedKeepsFillsAfterSnapshot():
+    objUnderTest = BuyingPowerLedger(margin=1.0)
+    objUnderTest.seed({'9288043': 1000.0}, fetchedAt=time.monotonic())
+
+    snapshotBeforeFill = time.monotonic()
+    objUnderTest.release(objUnderTest.reserve('9288043', 300), spentSek=300)
+    objUnderTest.seed({'9288043': 1000.0}, fetchedAt=snapshotBeforeFill)
+    assert objUnderTest.available('9288043') == 700
+
+    objUnderTest.seed({'9288043': 700.0}, fetchedAt=time.monotonic())
+    assert objUnderTest.available('9288043') == 700
+
+    objUnderTest.seed({'9288043': 5000.0}, fetchedAt=snapshotBeforeFill)
+    assert objUnderTest.available('9288043') == 700
+
+def testReserveThreadSafe():
+    objUnderTest = BuyingPowerLedger(margin=1.0)
+    objUnderTest.seed({'9288043': 1000.0})
+    reservations = []
+
+    def reserve():
+        for a in range(100):
+            reservationId = objUnderTest.reserve('9288043', 1)
+            if reservationId is not None:
+                reservations.append(reservationId)
+
+    threads = [threading.Thread(target=reserve) for a in range(20)]
+    [t.start() for t in threads]
+    [t.join() for t in threads]
+
+    assert len(reservations) == 1000
+    assert objUnderTest.available('9288043') == 0
+
+if __name__ == "__main__":
+    testReserveAndRelease()
+    testUnknownAccountNotLimited()
+    testSeedKeepsFillsAfterSnapshot()
+    testReserveThreadSafe()
@@ -0,0 +1,42 @@
+# The ladder and depth execution engines side by side on the same simulated scenarios.
+# FakeAvanza fills at the limit price (no price improvement), so slippage is how far from mid the order was priced.
+# Run from the repo root: PYTHONPATH=. python tests/ExecutionBenchmark.py
+import argparse
+from unittest.mock import patch
+import MainBroker
+import BrokerBenchmark
+
+# name -> runBenchmark arguments
+SCENARIOS = {
+    "liquid": {'levelVolume': 1000},
+    "thinBook": {'levelVolume': 2},
+    "missedOrders": {'levelVolume': 1000, 'missRatio': 0.5},
+}
+
+# ##############################################################################################################
+# {scenario: {engine: result}}, see BrokerBenchmark.runBenchmark
+# ##############################################################################################################
+def runComparison(numberOfStocks: int = 10, numberToTransact: int = 5, waitSec: float = 0.5, engines = ("ladder", "depth"), scenarios = None):
+    scenarios = scenarios if scenarios is not None else SCENARIOS
+    retData = {}
+
+    with patch.object(MainBroker, "WAIT_SEC_FOR_COMPLETION", waitSec):
+        for scenario, args in scenarios.items():
+            retData[scenario] = {engine: BrokerBenchmark.runBenchmark(numberOfStocks, numberToTransact, engine=engine, fillLatencySec=0.05, **args)
+                                 for engine in engines}
+
+    return retData
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stocks", type=int, default=10)
+    parser.add_argument("--waitSec", type=float, default=0.5)
+    args = parser.parse_args()
+
+    columns = ["trades", "elapsedSec", "slippageBps", "avanzaCallsPerTrade"]
+    print(f"{'scenario':>14} {'engine':>8} " + " ".join(f"{column:>20}" for column in columns) + f" {'place/edit/delete':>20}")
+    for scenario, results in runComparison(args.stocks, waitSec=args.waitSec).items():
+        for engine, result in results.items():
+            calls = result["avanzaCalls"]
+            orderCalls = f"{calls.get('place_order', 0)}/{calls.get('edit_order', 0)}/{calls.get('delete_order', 0)}"
+            print(f"{scenario:>14} {engine:>8} " + " ".join(f"{str(result[column]):>20}" for column in columns) + f" {orderCalls:>20}")
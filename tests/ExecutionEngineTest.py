@@ -0,0 +1,48 @@
+from ExecutionEngine import LadderExecution, DepthExecution, createExecutionEngine
+from AvanzaHandler import TransactionType
+from Records import Quote
+
+def createQuote(bids, asks):
+    return Quote("4532", 100.0, 100.1, 0.1, 0.05, 1.0, [101.1, 102.1, 103.1], [99.0, 98.0, 97.0], 1, None, bids, asks)
+
+def testLadderPrices():
+    objUnderTest = LadderExecution()
+    quote = createQuote([(100.0, 10)], [(100.1, 10)])
+
+    assert objUnderTest.limitPrices(quote, TransactionType.Buy, 5) == [101.1, 102.1, 103.1]
+    assert objUnderTest.limitPrices(quote, TransactionType.Sell, 5) == [99.0, 98.0, 97.0]
+    assert objUnderTest.amendOrders is False
+
+def testDepthPrices():
+    objUnderTest = DepthExecution()
+    quote = createQuote([(100.0, 2), (99.95, 2), (99.9, 2)], [(100.1, 2), (100.15, 2), (100.2, 2)])
+
+    assert objUnderTest.limitPrices(quote, TransactionType.Buy, 2) == [100.1, 101.1, 102.1, 103.1]
+    assert objUnderTest.limitPrices(quote, TransactionType.Buy, 5) == [100.2, 101.1, 102.1, 103.1]
+    assert objUnderTest.limitPrices(quote, TransactionType.Sell, 3) == [99.95, 99.0, 98.0, 97.0]
+    assert objUnderTest.amendOrders is True
+
+def testDepthPricesFallBackToLadder():
+    objUnderTest = DepthExecution()
+
+    assert objUnderTest.limitPrices(createQuote([], []), TransactionType.Buy, 5) == [101.1, 102.1, 103.1]
+    assert objUnderTest.limitPrices(createQuote([(100.0, 1)], [(100.1, 1)]), TransactionType.Buy, 5) == [101.1, 102.1, 103.1]
+
+def testDepthPricesCappedByLadder():
+    objUnderTest = DepthExecution()
+    quote = createQuote([(90.0, 100)], [(110.0, 100)])
+
+    assert objUnderTest.limitPrices(quote, TransactionType.Buy, 5) == [103.1]
+    assert objUnderTest.limitPrices(quote, TransactionType.Sell, 5) == [97.0]
+
+def testCreateExecutionEngine():
+    assert isinstance(createExecutionEngine("depth"), DepthExecution)
+    assert type(createExecutionEngine("ladder")) is LadderExecution
+    assert type(createExecutionEngine("nosuch")) is LadderExecution
+
+if __name__ == "__main__":
+    testLadderPrices()
+    testDepthPrices()
+    testDepthPricesFallBackToLadder()
+    testDepthPricesCappedByLadder()
+    testCreateExecutionEngine()
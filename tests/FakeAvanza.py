@@ -0,0 +1,197 @@
+import contextlib, random, threading, time
+import TimeUtils
+
+# Price levels on each side of the simulated order books
+DEPTH_LEVELS = 5
+
+class FakeAvanza:
+
+    # ##############################################################################################################
+    # Offline stand-in for the avanza client. Keeps an order book (DEPTH_LEVELS levels of levelVolume from best
+    # bid/ask, tickSize apart) and a position per instrument. Orders at or through the spread fill at their limit
+    # price after fillLatencySec, up to the volume of the levels they reach. partialFillRatio of them fill only half
+    # the volume, missRatio of them never fill. Buys above the buying power (balance minus open buys) are rejected.
+    # Every call sleeps apiLatencySec and is counted in calls.
+    # ##############################################################################################################
+    def __init__(self, accountId: str = "9288043", fillLatencySec: float = 0.1, apiLatencySec: float = 0.0,
+                 partialFillRatio: float = 0.0, missRatio: float = 0.0, seed: int = 1):
+        self.accountId = accountId
+        self.fillLatencySec = fillLatencySec
+        self.apiLatencySec = apiLatencySec
+        self.partialFillRatio = partialFillRatio
+        self.missRatio = missRatio
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.instruments = {}
+        self.orders = {}
+        self.deals = []
+        self.nextOrderId = 500000000
+        self.calls = {}
+        self.totalBalance = 100000.0
+        self.rejectedOrders = 0
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def addInstrument(self, tickerSymbol: str, flagCode: str, instrumentId: str, bid: float, ask: float, tickSize: float, volume: int = 0,
+                      levelVolume: int = 1000):
+        self.instruments[instrumentId] = {
+            'tickerSymbol': tickerSymbol, 'flagCode': flagCode, 'id': instrumentId, 'name': f"{tickerSymbol} Inc",
+            'bid': bid, 'ask': ask, 'tickSize': tickSize, 'volume': volume, 'levelVolume': levelVolume
+        }
+        return self
+
+    # ##############################################################################################################
+    # Total number of calls, or calls to one method
+    # ##############################################################################################################
+    def getCallCount(self, method: str = None):
+        with self.lock:
+            if method is not None:
+                return self.calls.get(method, 0)
+            return sum(self.calls.values())
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def search_for_stock(self, query: str):
+        with self.call("search_for_stock"):
+            hits = [{'currency': 'SEK', 'lastPrice': instrument['bid'], 'flagCode': instrument['flagCode'], 'tradable': True,
+                     'tickerSymbol': instrument['tickerSymbol'], 'name': instrument['name'], 'id': instrument['id']}
+                    for instrument in self.instruments.values() if instrument['tickerSymbol'].lower() == query.lower()]
+
+            if len(hits) == 0:
+                return {'totalNumberOfHits': 0, 'hits': []}
+            return {'totalNumberOfHits': len(hits), 'hits': [{'instrumentType': 'STOCK', 'numberOfHits': len(hits), 'topHits': hits}]}
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def get_stock_info(self, instrumentId: str):
+        with self.call("get_stock_info"):
+            instrument = self.instruments[instrumentId]
+            depth = [{'buy': {'price': buyPrice, 'volume': instrument['levelVolume']}, 'sell': {'price': sellPrice, 'volume': instrument['levelVolume']}}
+                     for buyPrice, sellPrice in zip(self.levelPrices(instrument, False), self.levelPrices(instrument, True))]
+
+            return {
+                'id': instrumentId,
+                'name': instrument['name'],
+                'lastPriceUpdated': TimeUtils.formatTimestamp(time.time()),
+                'buyPrice': instrument['bid'],
+                'sellPrice': instrument['ask'],
+                'lastPrice': instrument['bid'],
+                'orderDepthLevels': depth,
+                'positions': [{'accountId': self.accountId, 'volume': instrument['volume'], 'value': instrument['volume'] * instrument['bid']}]
+            }
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def place_order(self, account_id: str, order_book_id: str, order_type, price: float, valid_until, volume: int):
+        with self.call("place_order"):
+            instrument = self.instruments[order_book_id]
+            isBuy = getattr(order_type, 'name', str(order_type)) == "BUY"
+            if isBuy and price * volume > self.getBuyingPower():
+                self.rejectedOrders += 1
+                return {'orderRequestStatus': 'ERROR', 'message': 'Du har tyvärr inte tillräcklig täckning på din depå för att genomföra ordern.'}
+            self.nextOrderId += 1
+            orderId = str(self.nextOrderId)
+            self.orders[orderId] = {
+                'orderId': orderId, 'accountId': account_id, 'orderbookId': order_book_id, 'isBuy': isBuy,
+                'price': price, 'volume': volume, 'fillVolume': self.decideFillVolume(instrument, isBuy, price, volume),
+                'fillAt': time.monotonic() + self.fillLatencySec
+            }
+
+            return {'orderRequestStatus': 'SUCCESS', 'message': '', 'orderId': orderId}
+
+    # ##############################################################################################################
+    # New price and volume for an open order, the fill is decided again. Same signature as avanza-api 6.0.0.
+    # ##############################################################################################################
+    def edit_order(self, instrument_type, order_id: str, account_id: str, order_book_id: str, order_type, price: float, valid_until, volume: int):
+        with self.call("edit_order"):
+            order = self.orders.get(order_id)
+            if order is None or order['orderbookId'] != order_book_id or order['isBuy'] != (getattr(order_type, 'name', str(order_type)) == "BUY"):
+                return {'messages': ['Order not found'], 'orderId': order_id, 'requestId': '-1', 'status': 'ERROR'}
+
+            order['price'] = price
+            order['volume'] = volume
+            order['fillVolume'] = self.decideFillVolume(self.instruments[order['orderbookId']], order['isBuy'], price, volume)
+            order['fillAt'] = time.monotonic() + self.fillLatencySec
+            return {'messages': [], 'orderId': order_id, 'requestId': '-1', 'status': 'SUCCESS'}
+
+    # ##############################################################################################################
+    # Order book prices, best first
+    # ##############################################################################################################
+    def levelPrices(self, instrument, asks: bool):
+        if asks:
+            return [round(instrument['ask'] + level * instrument['tickSize'], 4) for level in range(DEPTH_LEVELS)]
+        return [round(instrument['bid'] - level * instrument['tickSize'], 4) for level in range(DEPTH_LEVELS)]
+
+    def decideFillVolume(self, instrument, isBuy: bool, price: float, volume: int):
+        reachedLevels = [levelPrice for levelPrice in self.levelPrices(instrument, isBuy) if (levelPrice <= price if isBuy else levelPrice >= price)]
+        available = len(reachedLevels) * instrument['levelVolume']
+
+        if available == 0 or self.random.random() < self.missRatio:
+            return 0
+        fillVolume = volume // 2 if self.random.random() < self.partialFillRatio else volume
+        return min(fillVolume, available)
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def delete_order(self, account_id: str, order_id: str):
+        with self.call("delete_order"):
+            if self.orders.pop(order_id, None) is None:
+                return {'orderRequestStatus': 'ERROR', 'message': 'Order not found', 'orderId': order_id}
+            return {'orderRequestStatus': 'SUCCESS', 'message': '', 'orderId': order_id}
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def get_deals_and_orders(self):
+        with self.call("get_deals_and_orders"):
+            return {
+                'orders': [{'orderId': order['orderId'], 'accountId': order['accountId'], 'price': order['price'], 'volume': order['volume']}
+                           for order in self.orders.values()],
+                'deals': list(self.deals)
+            }
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def get_overview(self):
+        with self.call("get_overview"):
+            return {'accounts': [{'accountId': self.accountId, 'totalBalance': self.totalBalance, 'buyingPower': self.getBuyingPower()}]}
+
+    def getBuyingPower(self):
+        return self.totalBalance - sum(order['price'] * order['volume'] for order in self.orders.values() if order['isBuy'])
+
+    # ##############################################################################################################
+    # Counts the call, simulates the round trip and executes the fills that are due
+    # ##############################################################################################################
+    @contextlib.contextmanager
+    def call(self, method: str):
+        if self.apiLatencySec > 0:
+            time.sleep(self.apiLatencySec)
+
+        with self.lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            self.executeDueFills()
+            yield
+
+    def executeDueFills(self):
+        now = time.monotonic()
+        for orderId, order in list(self.orders.items()):
+            if order['fillVolume'] == 0 or order['fillAt'] > now:
+                continue
+
+            instrument = self.instruments[order['orderbookId']]
+            instrument['volume'] += order['fillVolume'] if order['isBuy'] else -order['fillVolume']
+            self.totalBalance -= (order['fillVolume'] if order['isBuy'] else -order['fillVolume']) * order['price']
+            self.deals.append({'orderId': orderId, 'orderbookId': order['orderbookId'], 'isBuy': order['isBuy'],
+                               'volume': order['fillVolume'], 'price': order['price']})
+
+            if order['fillVolume'] >= order['volume']:
+                del self.orders[orderId]
+            else:
+                order['volume'] -= order['fillVolume']
+                order['fillVolume'] = 0
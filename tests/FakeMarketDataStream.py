@@ -0,0 +1,32 @@
+import asyncio
+
+class FakeMarketDataStream:
+
+    # ##############################################################################################################
+    # Local stand-in for the avanza push stream (subscribe_to_id). push() delivers a message to the subscribers.
+    # ##############################################################################################################
+    def __init__(self):
+        self.subscriptions = {}
+
+    async def subscribe_to_id(self, channel, id: str, callback):
+        channelName = getattr(channel, 'value', channel)
+        self.subscriptions.setdefault(f"/{channelName}/{id}", []).append(callback)
+        await asyncio.sleep(0)
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def push(self, channelName: str, id: str, data):
+        channel = f"/{channelName}/{id}"
+        for callback in self.subscriptions.get(channel, []):
+            callback({'channel': channel, 'data': data})
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def pushQuote(self, id: str, bid: float, ask: float, tickSize: float, updatedMs: float):
+        self.push("quotes", id, {'orderbookId': id, 'buyPrice': bid, 'sellPrice': ask, 'lastPrice': bid,
+                                 'highestPrice': ask, 'lowestPrice': bid, 'updated': updatedMs})
+        self.push("orderdepths", id, {'orderbookId': id, 'levels': [
+            {'buySide': {'price': round(bid - level * tickSize, 4), 'volume': 100}, 'sellSide': {'price': round(ask + level * tickSize, 4), 'volume': 100}}
+            for level in range(3)]})
@@ -0,0 +1,131 @@
+import json, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class FakeTradingPalServer:
+
+    # ##############################################################################################################
+    # Local stand-in for the tradingpal algorithm REST API, incl. the batch endpoints. Use port 0 for a free port.
+    # ##############################################################################################################
+    def __init__(self, stocksToBuy=None, stocksToSell=None, supportsBatch: bool = True, port: int = 0):
+        self.stocksToBuy = stocksToBuy if stocksToBuy is not None else []
+        self.stocksToSell = stocksToSell if stocksToSell is not None else []
+        self.supportsBatch = supportsBatch
+        self.locks = {}
+        self.nextLockKey = 1000
+        self.updates = []
+        self.calls = []
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self.createHandler())
+        self.baseUrl = f"http://127.0.0.1:{self.server.server_address[1]}/tradingpal/"
+        self.thread = None
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def lockTicker(self, ticker: str):
+        if ticker in self.locks:
+            return None
+        self.nextLockKey += 1
+        self.locks[ticker] = self.nextLockKey
+        return self.nextLockKey
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def unlockTicker(self, ticker: str, lockKey: int):
+        if self.locks.get(ticker) != lockKey:
+            return False
+        del self.locks[ticker]
+        return True
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def updateTicker(self, body):
+        if self.locks.get(body.get('ticker')) != body.get('lockKey'):
+            return False
+        self.updates.append(body)
+        return True
+
+    # ##############################################################################################################
+    # Returns (statusCode, reply)
+    # ##############################################################################################################
+    def handle(self, method: str, endpoint: str, body):
+
+        with self.lock:
+            self.calls.append(endpoint)
+
+            if method == "GET" and endpoint == "getStocksToBuy":
+                return 200, {"list": self.stocksToBuy}
+            if method == "GET" and endpoint == "getStocksToSell":
+                return 200, {"list": self.stocksToSell}
+
+            if method == "POST" and endpoint == "lock":
+                lockKey = self.lockTicker(body['ticker'])
+                return (200, {"lockKey": lockKey}) if lockKey is not None else (409, {"error": "locked"})
+            if method == "POST" and endpoint == "unlock":
+                return (200, {}) if self.unlockTicker(body['ticker'], body['lockKey']) else (409, {"error": "bad lockKey"})
+            if method == "POST" and endpoint == "updateStock":
+                return (200, {}) if self.updateTicker(body) else (409, {"error": "not locked"})
+
+            if self.supportsBatch and method == "POST" and endpoint == "lockBatch":
+                locks, failed = {}, {}
+                for ticker in body['tickers']:
+                    lockKey = self.lockTicker(ticker)
+                    if lockKey is not None:
+                        locks[ticker] = lockKey
+                    else:
+                        failed[ticker] = "locked"
+                return 200, {"locks": locks, "failed": failed}
+            if self.supportsBatch and method == "POST" and endpoint == "unlockBatch":
+                failed = {l['ticker']: "bad lockKey" for l in body['locks'] if not self.unlockTicker(l['ticker'], l['lockKey'])}
+                return 200, {"failed": failed}
+            if self.supportsBatch and method == "POST" and endpoint == "updateStocks":
+                failed = {b['ticker']: "not locked" for b in body['stocks'] if not self.updateTicker(b)}
+                return 200, {"failed": failed}
+
+            return 404, {"error": "not found"}
+
+    # ##############################################################################################################
+    # ...
+    # ##############################################################################################################
+    def createHandler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                self.reply("GET", None)
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                self.reply("POST", json.loads(self.rfile.read(length)) if length > 0 else None)
+
+            def reply(self, method, body):
+                statusCode, reply = fake.handle(method, self.path.split("/tradingpal/")[-1], body)
+                content = json.dumps(reply).encode()
+                self.send_response(statusCode)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
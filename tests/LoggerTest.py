@@ -0,0 +1,48 @@
+import os, tempfile, threading
+import Logger
+from Logger import Log, LogType
+from unittest.mock import patch
+
+def readLines(path):
+    with open(path) as file_object:
+        return file_object.read().splitlines()
+
+def testLogFromManyThreads():
+    logDir = tempfile.mkdtemp()
+    paths = {name: os.path.join(logDir, name) for name in ["register.txt", "audit.txt", "trace.txt"]}
+
+    with patch.object(Logger, "tradeRegisterPath", paths["register.txt"]), \
+         patch.object(Logger, "auditLogPath", paths["audit.txt"]), \
+         patch.object(Logger, "traceLogPath", paths["trace.txt"]):
+        objUnderTest = Log()
+
+        def logMany(threadId):
+            for a in range(100):
+                objUnderTest.log(LogType.Trace, f"trace {threadId} {a}")
+                objUnderTest.log(LogType.Audit, f"audit {threadId} {a}")
+            objUnderTest.log(LogType.Register, {"thread": threadId})
+
+        threads = [threading.Thread(target=logMany, args=(t,)) for t in range(4)]
+        [t.start() for t in threads]
+        [t.join() for t in threads]
+        objUnderTest.flush()
+
+    assert len(readLines(paths["register.txt"])) == 4
+    assert len(readLines(paths["audit.txt"])) == 404
+    assert len(readLines(paths["trace.txt"])) == 804
+
+def testIdenticalTraceLoggedOnce():
+    logDir = tempfile.mkdtemp()
+    tracePath = os.path.join(logDir, "trace.txt")
+
+    with patch.object(Logger, "traceLogPath", tracePath):
+        objUnderTest = Log()
+        objUnderTest.log(LogType.Trace, "traceLog")
+        objUnderTest.log(LogType.Trace, "traceLog")
+        objUnderTest.flush()
+
+    assert len(readLines(tracePath)) == 1
+
+if __name__ == "__main__":
+    testLogFromManyThreads()
+    testIdenticalTraceLoggedOnce()
@@ -0,0 +1,396 @@
+import threading, time
+import MainBroker
+from AvanzaHandler import AvanzaHandler, ObservedAvanza, TransactionType
+from Records import TradeInstruction, Quote, Position, OrderResult
+from OrderTracker import OrderStatus
+import concurrent.futures
+from TradingPalClient import TradingPalClient
+from FakeTradingPalServer import FakeTradingPalServer
+from FakeAvanza import FakeAvanza
+import BrokerBenchmark
+from unittest.mock import MagicMock, patch
+
+def createBroker():
+    with patch.object(MainBroker.MainBroker, 'refreshAvanzaHandler'):
+        objUnderTest = MainBroker.MainBroker()
+    objUnderTest.refreshAvanzaHandler = MagicMock()
+    objUnderTest.avanzaHandler = MagicMock()
+    objUnderTest.lockStocks = MagicMock(side_effect=lambda tickers: {ticker: 1234 for ticker in tickers})
+    objUnderTest.unlockStocks = MagicMock()
+    objUnderTest.sanityCheckStock = MagicMock(return_value=None)
+    return objUnderTest
+
+def createStock(ticker):
+    return TradeInstruction(ticker, 1, 1, 10, 1.0, ticker, 0, 0)
+
+def testDoStocksTransactionParallel():
+    objUnderTest = createBroker()
+    objUnderTest.avanzaHandler.getTickerDetails.return_value = Quote("4532", 1.0, 1.01, 0.01, 0.01, 0.01, [], [], 1, Position('9288043', 0, 0))
+
+    inFlight = {'now': 0, 'max': 0}
+    inFlightLock = threading.Lock()
+
+    def transact(*args):
+        with inFlightLock:
+            inFlight['now'] += 1
+            inFlight['max'] = max(inFlight['max'], inFlight['now'])
+        time.sleep(0.05)
+        with inFlightLock:
+            inFlight['now'] -= 1
+
+    objUnderTest.doOneTransactionWithRetries = MagicMock(side_effect=transact)
+
+    stocks = [createStock(f"T{a}.ST") for a in range(8)]
+    objUnderTest.doStocksTransaction(stocks, TransactionType.Buy)
+
+    assert objUnderTest.doOneTransactionWithRetries.call_count == 8
+    assert len(objUnderTest.unlockStocks.call_args[0][0]) == 8
+    assert 1 < inFlight['max'] <= MainBroker.MAX_PARALLEL_TRANSACTIONS_PER_ACCOUNT
+
+def testDoStocksTransactionBlockedPurchases():
+    objUnderTest = createBroker()
+    objUnderTest.doOneTransactionWithRetries = MagicMock()
+    objUnderTest.doBlockPurchases()
+
+    objUnderTest.doStocksTransaction([createStock("AKSO.ST"), createStock("TXG.TO")], TransactionType.Buy)
+
+    assert objUnderTest.lockStocks.call_count == 0
+    assert objUnderTest.doOneTransactionWithRetries.call_count == 0
+
+def testAddEventThreadSafe():
+    objUnderTest = createBroker()
+
+    def addEvents():
+        for a in range(1000):
+            objUnderTest.addEvent(MainBroker.EventType.Exception)
+
+    threads = [threading.Thread(target=addEvents) for a in range(4)]
+    [t.start() for t in threads]
+    [t.join() for t in threads]
+
+    assert objUnderTest.events[MainBroker.EventType.Exception]['count'] == 4000
+
+@patch("MainBroker.sys.exit")
+def testKillswitchInterruptsSleep(exit):
+    objUnderTest = createBroker()
+    objUnderTest.fetchTickers = MagicMock(return_value=[])
+
+    thread = threading.Thread(target=objUnderTest.run)
+    thread.start()
+    time.sleep(0.2)
+
+    start = time.monotonic()
+    objUnderTest.doTerminate()
+    thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert time.monotonic() - start < 0.5
+    assert exit.call_count == 1
+
+def testGetCurrentFundsFromSnapshot():
+    with patch.object(MainBroker.MainBroker, 'refreshAvanzaHandler'):
+        objUnderTest = MainBroker.MainBroker()
+    avanza = MagicMock()
+    avanza.get_overview.return_value = {'accounts': [{'accountId': '9288043', 'totalBalance': 100.0}]}
+    avanzaHandler = AvanzaHandler(MainBroker.log)
+    avanzaHandler.avanza = ObservedAvanza(avanza, avanzaHandler.callObservers)
+    avanzaHandler.overviewCache = objUnderTest.overviewCache
+
+    def createAvanzaHandler():
+        objUnderTest.avanzaHandler = avanzaHandler
+        return avanzaHandler
+
+    objUnderTest.sessionManager.createHandler = createAvanzaHandler
+
+    for a in range(5):
+        assert objUnderTest.getCurrentFunds() == 100.0
+
+    assert avanza.get_overview.call_count == 1
+    assert objUnderTest.getHealth()['healthy'] is True
+    assert objUnderTest.getHealth()['logins'] == 1
+
+def createBrokerWithFakeTradingPal(server):
+    with patch.object(MainBroker.MainBroker, 'refreshAvanzaHandler'):
+        objUnderTest = MainBroker.MainBroker()
+    objUnderTest.tradingPal = TradingPalClient(server.baseUrl, MainBroker.log)
+    return objUnderTest
+
+def testBatchLockUpdateUnlock():
+    server = FakeTradingPalServer().start()
+    try:
+        objUnderTest = createBrokerWithFakeTradingPal(server)
+        server.lockTicker("TXG.TO")
+
+        locks = objUnderTest.lockStocks(["AKSO.ST", "TXG.TO", "BBD-B.TO"])
+        assert sorted(locks.keys()) == ["AKSO.ST", "BBD-B.TO"]
+
+        objUnderTest.updateStock("AKSO.ST", 2.6, None, 0, 2, 20, locks["AKSO.ST"], "Aker Solutions", 20, "4532")
+        objUnderTest.updateStock("BBD-B.TO", 1.78, None, 0, 5, 50, locks["BBD-B.TO"], "Bombardier", 50, "76426")
+        objUnderTest.flushStockUpdates()
+        objUnderTest.unlockStocks(locks)
+
+        assert len(server.updates) == 2
+        assert list(server.locks.keys()) == ["TXG.TO"]
+        assert server.calls == ["lockBatch", "updateStocks", "unlockBatch"]
+    finally:
+        server.stop()
+
+def testBatchFallbackToSingleCalls():
+    server = FakeTradingPalServer(supportsBatch=False).start()
+    try:
+        objUnderTest = createBrokerWithFakeTradingPal(server)
+
+        locks = objUnderTest.lockStocks(["AKSO.ST", "TXG.TO"])
+        objUnderTest.updateStock("AKSO.ST", 2.6, None, 0, 2, 20, locks["AKSO.ST"], "Aker Solutions", 20, "4532")
+        objUnderTest.flushStockUpdates()
+        objUnderTest.unlockStocks(locks)
+
+        assert objUnderTest.batchSupported is False
+        assert len(server.updates) == 1
+        assert len(server.locks) == 0
+        assert server.calls == ["lockBatch", "lock", "lock", "updateStock", "unlock", "unlock"]
+    finally:
+        server.stop()
+
+def testStockUpdatesRegisteredAtOnceAndPostedOneByOne():
+    server = FakeTradingPalServer(supportsBatch=False).start()
+    try:
+        objUnderTest = createBrokerWithFakeTradingPal(server)
+        objUnderTest.tradeRegister = MagicMock()
+
+        locks = objUnderTest.lockStocks(["AKSO.ST"])
+        objUnderTest.updateStock("TXG.TO", 16.3, None, 0, 1, 160, 1, "Torex Gold", 160, "282537")
+        objUnderTest.updateStock("AKSO.ST", 2.6, None, 0, 2, 20, locks["AKSO.ST"], "Aker Solutions", 20, "4532")
+        assert objUnderTest.tradeRegister.append.call_count == 2
+        assert len(server.updates) == 0
+
+        objUnderTest.flushStockUpdates()
+
+        assert [update['ticker'] for update in server.updates] == ["AKSO.ST"]
+        assert server.calls.count("updateStock") == 2
+        assert objUnderTest.events[MainBroker.EventType.Exception]['count'] == 1
+    finally:
+        server.stop()
+
+def testStockUpdatesPostedOneByOneWhenBatchFails():
+    server = FakeTradingPalServer().start()
+    try:
+        objUnderTest = createBrokerWithFakeTradingPal(server)
+        objUnderTest.postBatch = MagicMock(side_effect=RuntimeError("updateStocks failed, 500"))
+
+        server.lockTicker("AKSO.ST")
+        objUnderTest.updateStock("AKSO.ST", 2.6, None, 0, 2, 20, server.locks["AKSO.ST"], "Aker Solutions", 20, "4532")
+        objUnderTest.flushStockUpdates()
+
+        assert objUnderTest.batchSupported is True
+        assert len(server.updates) == 1
+        assert server.calls == ["updateStock"]
+    finally:
+        server.stop()
+
+def testSharedStateCommandsAndPublish():
+    objUnderTest = createBroker()
+    objUnderTest.sharedState = MagicMock()
+    objUnderTest.onTerminate = MagicMock()
+    objUnderTest.avanzaHandler.getCurrentFunds.return_value = [{'accountId': '9288043', 'totalBalance': 100}]
+
+    objUnderTest.handleSharedCommand("blockPurchases")
+    assert objUnderTest.blockPurchases
+    objUnderTest.handleSharedCommand("unblockPurchases")
+    assert not objUnderTest.blockPurchases
+    objUnderTest.handleSharedCommand("terminate")
+    assert objUnderTest.terminate
+    objUnderTest.onTerminate.assert_called_once()
+
+    objUnderTest.publishSharedState()
+    published = {call.args[0]: call.args[1] for call in objUnderTest.sharedState.put.call_args_list}
+    assert published['funds'] == [{'accountId': '9288043', 'totalBalance': 100}]
+    assert 'healthy' in published['health']
+    objUnderTest.avanzaHandler.transactionStore.sync.assert_called_once()
+
+def testBuyAndSellWithSimulator():
+    result = BrokerBenchmark.runBenchmark(numberOfStocks=4, numberToTransact=3, fillLatencySec=0.05)
+
+    assert result["trades"] == 8
+    assert result["avgOrderToFillSec"] is not None
+    assert result["avanzaCalls"]["place_order"] == 8
+    assert result["avanzaCalls"]["search_for_stock"] == 4
+
+def testPartialFillWithSimulator():
+    fakeAvanza = FakeAvanza(fillLatencySec=0.05, partialFillRatio=1.0)
+    BrokerBenchmark.addSimulatedStocks(fakeAvanza, 1)
+    server = FakeTradingPalServer().start()
+    try:
+        objUnderTest = BrokerBenchmark.createSimulatedBroker(fakeAvanza, server)
+        objUnderTest.doStocksTransaction(BrokerBenchmark.createInstructions(fakeAvanza, 4), TransactionType.Buy)
+
+        assert fakeAvanza.instruments["100000"]["volume"] == 2
+        assert fakeAvanza.getCallCount("delete_order") == 1
+        assert len(server.updates) == 1
+        assert server.updates[0]["count"] == 2
+    finally:
+        server.stop()
+
+def testBuyingPowerReservedWithSimulator():
+    fakeAvanza = FakeAvanza(fillLatencySec=0.05)
+    fakeAvanza.totalBalance = 250.0
+    BrokerBenchmark.addSimulatedStocks(fakeAvanza, 4)
+    server = FakeTradingPalServer().start()
+    try:
+        objUnderTest = BrokerBenchmark.createSimulatedBroker(fakeAvanza, server)
+        objUnderTest.doStocksTransaction(BrokerBenchmark.createInstructions(fakeAvanza, 1), TransactionType.Buy)
+
+        assert len(server.updates) == 2
+        assert fakeAvanza.rejectedOrders == 0
+        assert fakeAvanza.getCallCount("place_order") == 2
+        assert not objUnderTest.blockPurchases
+        assert objUnderTest.metrics.get("tradingpal_buying_power_rejections_total") == 2
+    finally:
+        server.stop()
+
+def runWithFirstOrderMissed(engine):
+    fakeAvanza = FakeAvanza(fillLatencySec=0.05, missRatio=1.0)
+    BrokerBenchmark.addSimulatedStocks(fakeAvanza, 1)
+    placeOrder = fakeAvanza.place_order
+
+    def placeOrderAndMissOnce(*args, **kwargs):
+        result = placeOrder(*args, **kwargs)
+        fakeAvanza.missRatio = 0.0
+        return result
+
+    fakeAvanza.place_order = placeOrderAndMissOnce
+    server = FakeTradingPalServer().start()
+    try:
+        objUnderTest = BrokerBenchmark.createSimulatedBroker(fakeAvanza, server, engine)
+        with patch.object(MainBroker, "WAIT_SEC_FOR_COMPLETION", 0.8):
+            objUnderTest.doStocksTransaction(BrokerBenchmark.createInstructions(fakeAvanza, 4), TransactionType.Buy)
+
+        assert fakeAvanza.instruments["100000"]["volume"] == 4
+        assert len(server.updates) == 1
+        return fakeAvanza
+    finally:
+        server.stop()
+
+def testDepthEngineEditsUnfilledOrder():
+    fakeAvanza = runWithFirstOrderMissed("depth")
+
+    assert fakeAvanza.getCallCount("place_order") == 1
+    assert fakeAvanza.getCallCount("edit_order") == 1
+    assert fakeAvanza.getCallCount("delete_order") == 0
+    assert fakeAvanza.deals[0]['price'] == 101.1
+
+def testLadderEngineReplacesUnfilledOrder():
+    fakeAvanza = runWithFirstOrderMissed("ladder")
+
+    assert fakeAvanza.getCallCount("place_order") == 2
+    assert fakeAvanza.getCallCount("edit_order") == 0
+    assert fakeAvanza.getCallCount("delete_order") == 1
+    assert fakeAvanza.deals[0]['price'] == 102.1
+
+def testFilledOrderNotRetriedWhenPositionLags():
+    objUnderTest = createBroker()
+    objUnderTest.executionEngine = MainBroker.createExecutionEngine("ladder")
+    quote = Quote("4532", 1.0, 1.01, 0.01, 0.01, 0.01, [1.02, 1.03, 1.04], [0.99, 0.98, 0.97], 1, Position('9288043', 0, 0))
+    objUnderTest.avanzaHandler.getTickerDetails.return_value = quote
+    objUnderTest.avanzaHandler.placeOrder.return_value = {'orderRequestStatus': 'SUCCESS', 'message': '', 'orderId': '420807539'}
+    filled = concurrent.futures.Future()
+    filled.set_result(OrderResult('420807539', OrderStatus.Filled, 3, 0.1))
+    objUnderTest.avanzaHandler.trackOrder.return_value = filled
+    objUnderTest.updateStock = MagicMock()
+    stock = createStock("AKSO.ST")
+    stock.numberToBuy = 3
+
+    objUnderTest.doOneTransactionWithRetries(quote, TransactionType.Buy, stock, "AKSO.ST", "4532", 1234)
+
+    assert objUnderTest.avanzaHandler.placeOrder.call_count == 1
+    assert objUnderTest.updateStock.call_args[0][4] == 3
+
+def testPartlyDealtOrderNotKeptOrEdited():
+    objUnderTest = createBroker()
+    objUnderTest.avanzaHandler.placeOrder.return_value = {'orderRequestStatus': 'SUCCESS', 'message': '', 'orderId': '420807539'}
+    objUnderTest.avanzaHandler.trackOrder.return_value = concurrent.futures.Future()
+    objUnderTest.avanzaHandler.getDealtVolume.return_value = 1
+
+    with patch.object(MainBroker, "WAIT_SEC_FOR_COMPLETION", 0.05):
+        retVal = objUnderTest.doOneTransactionAndCheckResult(TransactionType.Buy, 10, 14, "AKSO.ST", '9288043', "4532", 2.6, 4, None, True)
+
+    assert retVal == (11, None)
+    objUnderTest.avanzaHandler.deleteOrder.assert_called_once_with('9288043', '420807539')
+
+    objUnderTest.avanzaHandler.deleteOrder.reset_mock()
+    objUnderTest.avanzaHandler.getDealtVolume.reset_mock()
+    retVal = objUnderTest.doOneTransactionAndCheckResult(TransactionType.Sell, 10, 6, "AKSO.ST", '9288043', "4532", 2.6, 4, '420807539', False)
+
+    assert retVal == (9, None)
+    assert objUnderTest.avanzaHandler.getDealtVolume.call_count == 1
+    assert objUnderTest.avanzaHandler.editOrder.call_count == 0
+    assert objUnderTest.avanzaHandler.placeOrder.call_count == 1
+    objUnderTest.avanzaHandler.deleteOrder.assert_called_once_with('9288043', '420807539')
+
+def testFilterOpenMarkets():
+    objUnderTest = createBroker()
+    objUnderTest.avanzaHandler = AvanzaHandler(MainBroker.log)
+    objUnderTest.marketCalendar = MagicMock()
+    objUnderTest.marketCalendar.isOpen.side_effect = lambda flagCode: flagCode == 'SE'
+
+    retVal = objUnderTest.filterOpenMarkets([createStock("AKSO.ST"), createStock("TXG.TO"), createStock("ABB.ST")])
+
+    assert [stock.tickerName for stock in retVal] == ["AKSO.ST", "ABB.ST"]
+    assert objUnderTest.filterOpenMarkets(None) is None
+
+def testPreFilterStocks():
+    objUnderTest = createBroker()
+    tooBig = createStock("TOOBIG.ST")
+    tooBig.numberToBuy = 1000
+    noPrice = TradeInstruction.fromJson({'tickerName': "NOPRICE.ST", 'numberToBuy': 1, 'singleStockPriceSek': 10,
+                                         'currentStock': {'name': "NOPRICE.ST", 'count': 0, 'totalInvestedSek': 0}})
+    noSell = createStock("NOSELL.ST")
+    noSell.numberToSell = 0
+
+    retVal = objUnderTest.preFilterStocks([createStock("AKSO.ST"), tooBig, noPrice, noSell], TransactionType.Buy)
+    assert [stock.tickerName for stock in retVal] == ["AKSO.ST", "NOSELL.ST"]
+    assert objUnderTest.events[MainBroker.EventType.Exception]['count'] == 2
+
+    retVal = objUnderTest.preFilterStocks([createStock("AKSO.ST"), noSell], TransactionType.Sell)
+    assert [stock.tickerName for stock in retVal] == ["AKSO.ST"]
+    assert objUnderTest.events[MainBroker.EventType.Exception]['count'] == 3
+
+    for _ in range(5):
+        objUnderTest.preFilterStocks([createStock("AKSO.ST"), tooBig, noPrice], TransactionType.Buy)
+    assert objUnderTest.events[MainBroker.EventType.Exception]['count'] == 13
+
+def testSanityCheckStockRunsLocalChecks():
+    objUnderTest = MainBroker.MainBroker.__new__(MainBroker.MainBroker)
+    stock = createStock("TOOBIG.ST")
+    stock.numberToBuy = 1000
+    avanzaDetails = Quote("4532", 1.0, 1.01, 0.01, 0.01, 0.01, [], [], 1, Position('9288043', 0, 0))
+
+    try:
+        objUnderTest.sanityCheckStock(avanzaDetails, stock, TransactionType.Buy)
+        assert False
+    except RuntimeError as ex:
+        assert "to big" in str(ex)
+
+    assert objUnderTest.sanityCheckStock(avanzaDetails, createStock("AKSO.ST"), TransactionType.Buy) is None
+
+if __name__ == "__main__":
+    testDoStocksTransactionParallel()
+    testDoStocksTransactionBlockedPurchases()
+    testAddEventThreadSafe()
+    testKillswitchInterruptsSleep()
+    testGetCurrentFundsFromSnapshot()
+    testBatchLockUpdateUnlock()
+    testBatchFallbackToSingleCalls()
+    testStockUpdatesRegisteredAtOnceAndPostedOneByOne()
+    testStockUpdatesPostedOneByOneWhenBatchFails()
+    testSharedStateCommandsAndPublish()
+    testBuyAndSellWithSimulator()
+    testPartialFillWithSimulator()
+    testBuyingPowerReservedWithSimulator()
+    testDepthEngineEditsUnfilledOrder()
+    testLadderEngineReplacesUnfilledOrder()
+    testFilledOrderNotRetriedWhenPositionLags()
+    testPartlyDealtOrderNotKeptOrEdited()
+    testFilterOpenMarkets()
+    testPreFilterStocks()
+    testSanityCheckStockRunsLocalChecks()
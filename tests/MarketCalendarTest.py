@@ -0,0 +1,47 @@
+import datetime, pytz
+from MarketCalendar import MarketCalendar
+
+def epoch(zoneName, *args):
+    return pytz.timezone(zoneName).localize(datetime.datetime(*args)).timestamp()
+
+def createCalendar():
+    return MarketCalendar(('Europe/Stockholm', 9, 23), holidays={'SE': {"2026-04-03"}})
+
+def testIsOpen():
+    objUnderTest = createCalendar()
+
+    # Tuesday 2026-10-20
+    assert objUnderTest.isOpen('SE', epoch('Europe/Stockholm', 2026, 10, 20, 10, 0))
+    assert not objUnderTest.isOpen('SE', epoch('Europe/Stockholm', 2026, 10, 20, 17, 30))
+    assert not objUnderTest.isOpen('US', epoch('Europe/Stockholm', 2026, 10, 20, 10, 0))
+    assert objUnderTest.isOpen('US', epoch('America/New_York', 2026, 10, 20, 9, 30))
+    assert not objUnderTest.isOpen('SE', epoch('Europe/Stockholm', 2026, 10, 24, 10, 0))
+
+def testHolidays():
+    objUnderTest = createCalendar()
+
+    assert not objUnderTest.isOpen('SE', epoch('Europe/Stockholm', 2026, 12, 24, 10, 0))
+    assert not objUnderTest.isOpen('SE', epoch('Europe/Stockholm', 2026, 4, 3, 10, 0))
+    assert objUnderTest.isOpen('DE', epoch('Europe/Stockholm', 2026, 4, 3, 10, 0))
+
+def testClippedToBrokerWindow():
+    objUnderTest = MarketCalendar(('Europe/Stockholm', 9, 21), holidays={})
+
+    # US closes 22:00 Stockholm time, the broker stops at 21
+    assert objUnderTest.isOpen('US', epoch('Europe/Stockholm', 2026, 10, 20, 20, 59))
+    assert not objUnderTest.isOpen('US', epoch('Europe/Stockholm', 2026, 10, 20, 21, 0))
+
+def testSecondsUntilNextOpen():
+    objUnderTest = createCalendar()
+
+    assert objUnderTest.secondsUntilNextOpen(now=epoch('Europe/Stockholm', 2026, 10, 20, 10, 0)) == 0
+    assert objUnderTest.secondsUntilNextOpen(['SE'], now=epoch('Europe/Stockholm', 2026, 10, 20, 8, 0)) == 3600
+    # Friday night -> monday 09:00, and one hour more over the switch to winter time
+    assert objUnderTest.secondsUntilNextOpen(now=epoch('Europe/Stockholm', 2026, 11, 6, 23, 0)) == (2 * 24 + 10) * 3600
+    assert objUnderTest.secondsUntilNextOpen(now=epoch('Europe/Stockholm', 2026, 10, 23, 23, 0)) == (2 * 24 + 11) * 3600
+
+if __name__ == "__main__":
+    testIsOpen()
+    testHolidays()
+    testClippedToBrokerWindow()
+    testSecondsUntilNextOpen()
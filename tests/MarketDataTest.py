@@ -0,0 +1,75 @@
+import asyncio, time
+from MarketData import MarketDataStream, OrderBookStore
+from AvanzaHandler import AvanzaHandler
+from TickerIndex import TickerIndex
+from Logger import Log
+from FakeMarketDataStream import FakeMarketDataStream
+from unittest.mock import MagicMock
+
+getPositionsReply = {'instrumentPositions': [{'instrumentType': 'STOCK', 'positions': [
+    {'accountId': '9288043', 'orderbookId': '4532', 'volume': 20, 'value': 52.0, 'name': 'Aker Solutions'},
+    {'accountId': '1111111', 'orderbookId': '4532', 'volume': 5, 'value': 13.0, 'name': 'Aker Solutions'}]}]}
+
+def testSubscribeAndStore():
+    fakeStream = FakeMarketDataStream()
+    objUnderTest = MarketDataStream(Log(), lambda: fakeStream)
+
+    asyncio.run(objUnderTest.subscribe(["4532", None]))
+    assert sorted(fakeStream.subscriptions.keys()) == ["/orderdepths/4532", "/quotes/4532"]
+    assert objUnderTest.store.getStockInfo("4532") is None
+
+    fakeStream.pushQuote("4532", 2.6, 2.62, 0.02, time.time() * 1000)
+    fakeStream.push("quotes", "9999", {'buyPrice': 1.0})
+
+    retVal = objUnderTest.store.getStockInfo("4532")
+    assert retVal['buyPrice'] == 2.6 and retVal['sellPrice'] == 2.62
+    assert retVal['orderDepthLevels'][1] == {'buy': {'price': 2.58, 'volume': 100}, 'sell': {'price': 2.64, 'volume': 100}}
+    assert objUnderTest.store.getStockInfo("9999") is None
+
+    asyncio.run(objUnderTest.subscribe(["4532"]))
+    assert len(fakeStream.subscriptions["/quotes/4532"]) == 1
+
+def testResubscribeOnNewClient():
+    clients = {'current': FakeMarketDataStream()}
+    objUnderTest = MarketDataStream(Log(), lambda: clients['current'])
+    asyncio.run(objUnderTest.subscribe(["4532"]))
+
+    clients['current'] = FakeMarketDataStream()
+    asyncio.run(objUnderTest.subscribe(["4532"]))
+
+    assert "/quotes/4532" in clients['current'].subscriptions
+
+def testStaleQuote():
+    objUnderTest = OrderBookStore(maxAgeSec=0.01)
+    objUnderTest.applyQuote("4532", {'buyPrice': 2.6, 'sellPrice': 2.62, 'updated': time.time() * 1000})
+    assert objUnderTest.getStockInfo("4532") is not None
+
+    time.sleep(0.02)
+    assert objUnderTest.getStockInfo("4532") is None
+
+def testGetTickerDetailsFromStream():
+    objUnderTest = AvanzaHandler(Log(), TickerIndex(Log(), ":memory:"))
+    objUnderTest.avanza = MagicMock()
+    objUnderTest.avanza.get_positions.return_value = getPositionsReply
+    stream = MarketDataStream(Log(), lambda: FakeMarketDataStream(), objUnderTest.orderBookStore)
+    stream.wanted = {"4532"}
+
+    stream.onMessage({'channel': '/quotes/4532', 'data': {'buyPrice': 2.6, 'sellPrice': 2.62, 'lastPrice': 2.61, 'updated': time.time() * 1000}})
+    stream.onMessage({'channel': '/orderdepths/4532', 'data': {'levels': [{'buySide': {'price': 2.59, 'volume': 10}, 'sellSide': {'price': 2.63, 'volume': 10}}]}})
+
+    retVal = objUnderTest.getTickerDetails("4532")
+
+    assert objUnderTest.avanza.get_stock_info.call_count == 0
+    assert retVal.accountId == '9288043' and retVal.currentCount == 20
+    assert retVal.buyPrice == 2.6 and retVal.tickSize > 0
+    assert retVal.secondsSinceUpdated < 5
+
+    objUnderTest.avanza.get_stock_info.return_value = {'lastPriceUpdated': '2021-11-17T15:31:24.000+0100', 'buyPrice': 2.6, 'sellPrice': 2.62, 'lastPrice': 2.61,
+                                                       'positions': [{'accountId': '9288043', 'volume': 22, 'value': 57.2}]}
+    assert objUnderTest.getTickerDetails("4532", bypassCache=True).currentCount == 22
+
+if __name__ == "__main__":
+    testSubscribeAndStore()
+    testResubscribeOnNewClient()
+    testStaleQuote()
+    testGetTickerDetailsFromStream()
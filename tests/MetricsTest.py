@@ -0,0 +1,74 @@
+import asyncio
+from Metrics import Metrics
+from AvanzaHandler import AvanzaHandler, ObservedAvanza
+from TickerIndex import TickerIndex
+from Logger import Log
+from unittest.mock import MagicMock
+
+searchForStockReply = {'totalNumberOfHits': 1, 'hits': [{'instrumentType': 'STOCK', 'numberOfHits': 1, 'topHits': [{'currency': 'CAD', 'lastPrice': 16.32, 'changePercent': 1.68, 'flagCode': 'CA', 'tradable': True, 'tickerSymbol': 'TXG', 'name': 'Torex Gold Resources Inc', 'id': '282537'}]}]}
+
+def testRenderCounterAndHistogram():
+    objUnderTest = Metrics()
+
+    objUnderTest.inc("tradingpal_orders_total", {"result": "filled"})
+    objUnderTest.inc("tradingpal_orders_total", {"result": "filled"})
+    objUnderTest.observe("tradingpal_order_fill_seconds", 0.4)
+    objUnderTest.observe("tradingpal_order_fill_seconds", 2.5)
+
+    retVal = objUnderTest.render()
+
+    assert "# TYPE tradingpal_orders_total counter" in retVal
+    assert 'tradingpal_orders_total{result="filled"} 2' in retVal
+    assert 'tradingpal_order_fill_seconds_bucket{le="0.25"} 0' in retVal
+    assert 'tradingpal_order_fill_seconds_bucket{le="0.5"} 1' in retVal
+    assert 'tradingpal_order_fill_seconds_bucket{le="3.0"} 2' in retVal
+    assert 'tradingpal_order_fill_seconds_bucket{le="+Inf"} 2' in retVal
+    assert 'tradingpal_order_fill_seconds_count 2' in retVal
+
+def testCollector():
+    objUnderTest = Metrics()
+    objUnderTest.addCollector(lambda: objUnderTest.set("tradingpal_events", 3, {"event": "AvanzaErrors"}))
+
+    assert 'tradingpal_events{event="AvanzaErrors"} 3' in objUnderTest.render()
+
+def testAvanzaHandlerMetrics():
+    metrics = Metrics()
+    objUnderTest = AvanzaHandler(Log(), TickerIndex(Log(), ":memory:"), metrics=metrics)
+    avanza = MagicMock()
+    avanza.search_for_stock.return_value = searchForStockReply
+    objUnderTest.avanza = ObservedAvanza(avanza, objUnderTest.callObservers)
+
+    objUnderTest.tickerToId("TXG.TO")
+    objUnderTest.tickerToId("TXG.TO")
+
+    retVal = metrics.render()
+
+    assert 'tradingpal_ticker_id_cache_total{result="search"} 1' in retVal
+    assert 'tradingpal_ticker_id_cache_total{result="hit"} 1' in retVal
+    assert 'tradingpal_avanza_call_seconds_count{method="search_for_stock"} 1' in retVal
+
+def testObservedAvanzaAwaitsCoroutines():
+    class AsyncAvanza:
+        async def subscribe_to_id(self, channel, orderbookId, callback):
+            await asyncio.sleep(0.05)
+            raise ConnectionError("socket closed")
+
+    calls = []
+    objUnderTest = ObservedAvanza(AsyncAvanza(), [lambda method, seconds, ex: calls.append((method, seconds, ex))])
+
+    try:
+        asyncio.run(objUnderTest.subscribe_to_id("quotes", "5361", None))
+        assert False
+    except ConnectionError:
+        pass
+
+    assert len(calls) == 1
+    assert calls[0][0] == "subscribe_to_id"
+    assert calls[0][1] >= 0.05
+    assert isinstance(calls[0][2], ConnectionError)
+
+if __name__ == "__main__":
+    testRenderCounterAndHistogram()
+    testCollector()
+    testAvanzaHandlerMetrics()
+    testObservedAvanzaAwaitsCoroutines()
@@ -0,0 +1,75 @@
+import asyncio
+from OrderTracker import OrderTracker, OrderStatus
+from Logger import Log
+from unittest.mock import MagicMock
+
+def testTrackOrderFilled():
+    fetch = MagicMock(side_effect=[
+        {'orders': {'1': {}, '2': {}}, 'deals': {}},
+        {'orders': {'2': {}}, 'deals': {'1': 10, '2': 3}},
+        {'orders': {}, 'deals': {'1': 10, '2': 3}}])
+    objUnderTest = OrderTracker(Log(), fetch, pollIntervalSec=0.01)
+
+    filled = objUnderTest.track('1', 10)
+    partly = objUnderTest.track('2', 5)
+
+    filledResult = filled.result(timeout=2)
+    partlyResult = partly.result(timeout=2)
+
+    assert filledResult.status == OrderStatus.Filled
+    assert partlyResult.status == OrderStatus.Closed
+    assert partlyResult.filledVolume == 3
+    assert fetch.call_count == 3
+
+def testUntrackOrder():
+    fetch = MagicMock(return_value={'orders': {'1': {}}, 'deals': {}})
+    objUnderTest = OrderTracker(Log(), fetch, pollIntervalSec=0.01)
+
+    future = objUnderTest.track('1', 10)
+    objUnderTest.untrack('1')
+
+    assert future.cancelled()
+    assert len(objUnderTest.outstanding) == 0
+
+def testTrackOrderOnEventLoop():
+    fetch = MagicMock(return_value={'orders': {}, 'deals': {'1': 10, '2': 10}})
+
+    async def waitForOrders():
+        objUnderTest = OrderTracker(Log(), fetch, pollIntervalSec=0.01, loop=asyncio.get_running_loop())
+        futures = [asyncio.wrap_future(objUnderTest.track(orderId, 10)) for orderId in ['1', '2']]
+        return await asyncio.wait_for(asyncio.gather(*futures), timeout=2)
+
+    results = asyncio.run(waitForOrders())
+
+    assert [result.status for result in results] == [OrderStatus.Filled, OrderStatus.Filled]
+    assert fetch.call_count == 1
+
+def testTrackRightAfterPollerStopped():
+    fetch = MagicMock(return_value={'orders': {}, 'deals': {'2': 10}})
+
+    async def trackWhilePollerStops():
+        objUnderTest = OrderTracker(Log(), fetch, pollIntervalSec=0.01, loop=asyncio.get_running_loop())
+        isPollingNeeded = objUnderTest.isPollingNeeded
+        tracked = []
+
+        def isPollingNeededThenTrack():
+            retVal = isPollingNeeded()
+            if not retVal and len(tracked) == 0:
+                # Another thread places an order between the old poller's last check and its exit
+                tracked.append(objUnderTest.track('2', 10))
+            return retVal
+
+        objUnderTest.isPollingNeeded = isPollingNeededThenTrack
+        objUnderTest.polling = True
+        await objUnderTest.runAsync()
+        return await asyncio.wait_for(asyncio.wrap_future(tracked[0]), timeout=2)
+
+    result = asyncio.run(trackWhilePollerStops())
+
+    assert result.status == OrderStatus.Filled
+
+if __name__ == "__main__":
+    testTrackOrderFilled()
+    testUntrackOrder()
+    testTrackOrderOnEventLoop()
+    testTrackRightAfterPollerStopped()
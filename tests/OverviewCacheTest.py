@@ -0,0 +1,49 @@
+import time
+from OverviewCache import OverviewCache
+from Logger import Log
+from unittest.mock import MagicMock
+
+def testGetStaleWhileRevalidate():
+    fetch = MagicMock(side_effect=[{'accounts': [], 'n': 1}, {'accounts': [], 'n': 2}])
+    objUnderTest = OverviewCache(Log(), fetch, refreshIntervalSec=0.05, maxStaleSec=60)
+
+    assert objUnderTest.get()['n'] == 1
+    assert objUnderTest.get()['n'] == 1
+    assert objUnderTest.isFresh()
+    assert fetch.call_count == 1
+
+    time.sleep(0.06)
+    assert not objUnderTest.isFresh()
+    assert objUnderTest.get()['n'] == 1
+
+    time.sleep(0.05)
+    assert fetch.call_count == 2
+    assert objUnderTest.get()['n'] == 2
+
+def testGetTooStale():
+    fetch = MagicMock(side_effect=[{'n': 1}, {'n': 2}])
+    objUnderTest = OverviewCache(Log(), fetch, refreshIntervalSec=0.01, maxStaleSec=0.02)
+
+    objUnderTest.get()
+    time.sleep(0.03)
+
+    assert objUnderTest.get()['n'] == 2
+
+def testRefreshFailed():
+    fetch = MagicMock(side_effect=[{'n': 1}, RuntimeError("session expired")])
+    objUnderTest = OverviewCache(Log(), fetch)
+
+    objUnderTest.refresh()
+    try:
+        objUnderTest.refresh()
+        assert False
+    except RuntimeError:
+        pass
+
+    assert not objUnderTest.isFresh()
+    assert objUnderTest.get()['n'] == 1
+
+if __name__ == "__main__":
+    testGetStaleWhileRevalidate()
+    testGetTooStale()
+    testRefreshFailed()
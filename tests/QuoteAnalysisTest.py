@@ -0,0 +1,47 @@
+import numpy as np
+import QuoteAnalysis
+
+def createQuote(bid, ask, tick, flagCode=None):
+    quote = {'buyPrice': bid, 'sellPrice': ask, 'lastPrice': bid,
+             'orderDepthLevels': [{'buy': {'price': round(bid - level * tick, 4)}, 'sell': {'price': round(ask + level * tick, 4)}} for level in range(3)]}
+    if flagCode is not None:
+        quote['flagCode'] = flagCode
+    return quote
+
+def testGuessTickSizes():
+    retData = QuoteAnalysis.guessTickSizes([createQuote(100.0, 100.1, 0.05), createQuote(2.5, 2.52, 0.01), {'lastPrice': 5.0}])
+
+    assert retData.tolist() == [0.1, 0.02, -1.0]
+
+def testExtractDepth():
+    bids, asks = QuoteAnalysis.extractDepth({'orderDepthLevels': [{'buy': {'price': 2.59, 'volume': 100}, 'sell': {'price': 2.61, 'volume': 50}},
+                                                                  {'buy': {'price': 2.6, 'volume': 200}, 'sell': {'price': 2.62}},
+                                                                  {'sell': {'price': 2.63, 'volume': 10}}]})
+
+    assert bids == [(2.6, 200), (2.59, 100)]
+    assert asks == [(2.61, 50), (2.63, 10)]
+    assert QuoteAnalysis.extractDepth({}) == ([], [])
+
+def testTableTickSizes():
+    retData = QuoteAnalysis.tableTickSizes([0.5, 157.3, 0.3, 16.3, 100.0], ['US', 'us', 'CA', 'CA', 'SE'])
+
+    assert retData[:4].tolist() == [0.0001, 0.01, 0.005, 0.01]
+    assert np.isnan(retData[4])
+
+def testAnalyzeQuotes():
+    quotes = [createQuote(100.0, 100.1, 0.05), createQuote(157.2, 157.3, 0.01, 'US'), {'lastPrice': 5.0}]
+
+    retData = QuoteAnalysis.analyzeQuotes(quotes)
+
+    assert retData['tickSize'].tolist()[:2] == [0.1, 0.01]
+    assert retData['spread'].tolist() == [0.1, 0.1, -1.0]
+    assert retData['tick1Percent'].tolist() == [1.0, 1.57, -1.0]
+    assert retData['buyLadder'][0].tolist() == [101.1, 102.1, 103.1]
+    assert retData['sellLadder'][1].tolist() == [155.63, 154.06, 152.49]
+    assert np.isnan(retData['buyLadder'][2]).all()
+
+if __name__ == "__main__":
+    testGuessTickSizes()
+    testExtractDepth()
+    testTableTickSizes()
+    testAnalyzeQuotes()
@@ -0,0 +1,77 @@
+import threading, time
+from QuoteCache import QuoteCache
+from unittest.mock import MagicMock
+
+def testGetCached():
+    objUnderTest = QuoteCache(ttlSec=60)
+    fetch = MagicMock(return_value={'buyPrice': 1.78})
+
+    assert objUnderTest.get("76426", fetch) == {'buyPrice': 1.78}
+    assert objUnderTest.get("76426", fetch) == {'buyPrice': 1.78}
+    assert fetch.call_count == 1
+
+    objUnderTest.get("76426", fetch, bypass=True)
+    assert fetch.call_count == 2
+
+    objUnderTest.invalidate("76426")
+    objUnderTest.get("76426", fetch)
+    assert fetch.call_count == 3
+
+def testGetExpired():
+    objUnderTest = QuoteCache(ttlSec=0.01)
+    fetch = MagicMock(return_value={'buyPrice': 1.78})
+
+    objUnderTest.get("76426", fetch)
+    time.sleep(0.02)
+    objUnderTest.get("76426", fetch)
+
+    assert fetch.call_count == 2
+
+def testGetCoalesced():
+    objUnderTest = QuoteCache(ttlSec=60)
+    calls = []
+
+    def fetch(key):
+        calls.append(key)
+        time.sleep(0.1)
+        return {'buyPrice': 1.78}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(objUnderTest.get("76426", fetch))) for a in range(5)]
+    [t.start() for t in threads]
+    [t.join() for t in threads]
+
+    assert len(calls) == 1
+    assert len(results) == 5
+
+def testInvalidateDuringFetch():
+    objUnderTest = QuoteCache(ttlSec=60)
+    fetchStarted = threading.Event()
+    invalidated = threading.Event()
+    fetched = []
+
+    def slowFetch(key):
+        fetchStarted.set()
+        invalidated.wait()
+        return {'volume': 10}
+
+    thread = threading.Thread(target=lambda: fetched.append(objUnderTest.get("positions", slowFetch)))
+    thread.start()
+    fetchStarted.wait()
+    objUnderTest.invalidate("positions")
+
+    fetch = MagicMock(return_value={'volume': 12})
+    assert objUnderTest.get("positions", fetch) == {'volume': 12}
+
+    invalidated.set()
+    thread.join()
+
+    assert fetched == [{'volume': 10}]
+    assert objUnderTest.get("positions", fetch) == {'volume': 12}
+    assert fetch.call_count == 1
+
+if __name__ == "__main__":
+    testGetCached()
+    testGetExpired()
+    testGetCoalesced()
+    testInvalidateDuringFetch()
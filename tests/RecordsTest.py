@@ -0,0 +1,27 @@
+from Records import TradeInstruction, Quote, Position, OrderResult
+
+stocksToBuyReply = {'list': [
+    {'tickerName': 'AKSO.ST', 'numberToBuy': 2, 'numberToSell': 0, 'singleStockPriceSek': 26.1, 'priceOrigCurrancy': 26.1,
+     'currentStock': {'name': 'Aker Solutions', 'count': 20, 'totalInvestedSek': 520, 'description': 'not used'}, 'history': [1, 2, 3]},
+    {'tickerName': 'TXG.TO', 'numberToBuy': 5}]}
+
+def testParseList():
+    retVal = TradeInstruction.parseList(stocksToBuyReply)
+
+    assert retVal[0] == TradeInstruction('AKSO.ST', 2, 0, 26.1, 26.1, 'Aker Solutions', 20, 520)
+    assert retVal[1].numberToBuy == 5 and retVal[1].priceOrigCurrancy is None and retVal[1].count is None
+    assert TradeInstruction.parseList({'error': 'x'}) is None
+
+def testSlots():
+    for record in [TradeInstruction.parseList(stocksToBuyReply)[0], Position('9288043', 1, 2.0), OrderResult('1', None, 1, 0.1),
+                   Quote('4532', 1.0, 1.01, 0.01, 0.01, 0.01, [], [], 1)]:
+        assert not hasattr(record, '__dict__')
+
+def testQuotePosition():
+    assert Quote('4532', 1.0, 1.01, 0.01, 0.01, 0.01, [], [], 1).currentCount == 0
+    assert Quote('4532', 1.0, 1.01, 0.01, 0.01, 0.01, [], [], 1, Position.fromJson({'accountId': 9288043, 'volume': 3})).accountId == '9288043'
+
+if __name__ == "__main__":
+    testParseList()
+    testSlots()
+    testQuotePosition()
@@ -0,0 +1,100 @@
+import threading, time
+from SessionManager import SessionManager
+from AvanzaHandler import AvanzaHandler, ObservedAvanza
+from Logger import Log
+from unittest.mock import MagicMock
+
+def createHandlerFactory(handlers):
+    def createHandler():
+        handler = AvanzaHandler(Log())
+        handler.avanza = ObservedAvanza(MagicMock(), handler.callObservers)
+        handlers.append(handler)
+        return handler
+    return createHandler
+
+def testEnsureSessionNoExtraCalls():
+    handlers = []
+    objUnderTest = SessionManager(Log(), createHandlerFactory(handlers))
+
+    handler = objUnderTest.ensureSession()
+    handler.avanza.get_stock_info("76426")
+
+    assert objUnderTest.ensureSession() is handler
+    assert objUnderTest.isHealthy()
+    assert len(handlers) == 1
+    assert handler.avanza.avanza.get_overview.call_count == 1
+
+def testEnsureSessionProbesWhenIdle():
+    handlers = []
+    objUnderTest = SessionManager(Log(), createHandlerFactory(handlers), idleProbeSec=0.01)
+
+    handler = objUnderTest.ensureSession()
+    time.sleep(0.02)
+    assert not objUnderTest.isHealthy()
+
+    assert objUnderTest.ensureSession() is handler
+    assert handler.avanza.avanza.get_overview.call_count == 2
+    assert objUnderTest.getHealth()['probes'] == 1
+
+def testEnsureSessionReloginBeforeExpiry():
+    handlers = []
+    objUnderTest = SessionManager(Log(), createHandlerFactory(handlers), maxAgeSec=0.01)
+
+    objUnderTest.ensureSession()
+    time.sleep(0.02)
+    objUnderTest.ensureSession()
+
+    assert len(handlers) == 2
+    assert objUnderTest.getHealth()['logins'] == 2
+
+def testEnsureSessionReloginAfterFailedCall():
+    handlers = []
+    objUnderTest = SessionManager(Log(), createHandlerFactory(handlers))
+
+    handler = objUnderTest.ensureSession()
+    handler.avanza.avanza.get_stock_info.side_effect = RuntimeError("401")
+    try:
+        handler.avanza.get_stock_info("76426")
+    except RuntimeError:
+        pass
+
+    assert not objUnderTest.isHealthy()
+    handler.avanza.avanza.get_overview.side_effect = RuntimeError("401")
+    objUnderTest.ensureSession()
+
+    assert len(handlers) == 2
+    assert "401" in objUnderTest.getHealth()['lastError']
+
+def testEnsureSessionOneLoginOutsideLock():
+    handlers = []
+    factory = createHandlerFactory(handlers)
+    loginStarted = threading.Event()
+
+    def slowCreateHandler():
+        loginStarted.set()
+        time.sleep(0.1)
+        return factory()
+
+    objUnderTest = SessionManager(Log(), slowCreateHandler)
+    retData = []
+    threads = [threading.Thread(target=lambda: retData.append(objUnderTest.ensureSession())) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+
+    loginStarted.wait()
+    start = time.monotonic()
+    objUnderTest.onAvanzaCall("get_stock_info", 0.1, None)
+    assert time.monotonic() - start < 0.05
+
+    for thread in threads:
+        thread.join()
+
+    assert len(handlers) == 1
+    assert len(retData) == 4 and all(handler is handlers[0] for handler in retData)
+
+if __name__ == "__main__":
+    testEnsureSessionNoExtraCalls()
+    testEnsureSessionProbesWhenIdle()
+    testEnsureSessionReloginBeforeExpiry()
+    testEnsureSessionReloginAfterFailedCall()
+    testEnsureSessionOneLoginOutsideLock()
@@ -0,0 +1,66 @@
+import os, tempfile
+import SharedState
+from FollowerBroker import FollowerBroker
+from TradeRegister import TradeRegister
+from TransactionStore import TransactionStore
+from Logger import Log
+from unittest.mock import MagicMock
+
+def testPutGet():
+    path = os.path.join(tempfile.mkdtemp(), "state.db")
+    objUnderTest = SharedState.SharedState(path)
+
+    assert objUnderTest.get("funds") == (None, None)
+
+    objUnderTest.put("funds", [{'accountId': '9288043', 'totalBalance': 100}])
+    value, ageSec = SharedState.SharedState(path).get("funds")
+    assert value == [{'accountId': '9288043', 'totalBalance': 100}]
+    assert 0 <= ageSec < 5
+
+def testCommands():
+    path = os.path.join(tempfile.mkdtemp(), "state.db")
+    follower = SharedState.SharedState(path)
+    leader = SharedState.SharedState(path)
+
+    follower.pushCommand("blockPurchases")
+    follower.pushCommand("terminate")
+
+    assert leader.popCommands() == ["blockPurchases", "terminate"]
+    assert leader.popCommands() == []
+
+def testLeadership():
+    path = os.path.join(tempfile.mkdtemp(), "leader")
+
+    leadership = SharedState.acquireLeadership(path)
+    assert leadership is not None
+    assert SharedState.acquireLeadership(path) is None
+
+    leadership.close()
+    assert SharedState.acquireLeadership(path) is not None
+
+def testFollowerBroker():
+    dir = tempfile.mkdtemp()
+    sharedState = SharedState.SharedState(os.path.join(dir, "state.db"))
+    leaderRegister = TradeRegister(Log(), os.path.join(dir, "register.jsonl"))
+    objUnderTest = FollowerBroker(Log(), sharedState, TransactionStore(Log(), ":memory:"), TradeRegister(Log(), os.path.join(dir, "register.jsonl")))
+
+    assert objUnderTest.getCurrentFunds() is None
+    assert objUnderTest.getHealth()['healthy'] is False
+
+    sharedState.put("funds", [{'accountId': '9288043', 'totalBalance': 100}])
+    sharedState.put("health", {'healthy': True})
+    leaderRegister.append({'ticker': 'AKSO.ST', 'accountId': '9288043', 'countAtStart': 0, 'count': 2, 'spent': 20.0, 'totalInvestedSek': 20.0})
+
+    assert objUnderTest.getCurrentFunds()[0]['totalBalance'] == 100
+    assert objUnderTest.getHealth()['healthy'] is True
+    assert len(objUnderTest.getTradeRegister("AKSO.ST")['trades']) == 1
+
+    objUnderTest.doBlockPurchases()
+    objUnderTest.doTerminate()
+    assert sharedState.popCommands() == ["blockPurchases", "terminate"]
+
+if __name__ == "__main__":
+    testPutGet()
+    testCommands()
+    testLeadership()
+    testFollowerBroker()
@@ -0,0 +1,44 @@
+# TimeUtils.parseTimestamp against the strptime parsing that AvanzaHandler.secondsSinceDate used before.
+# Run from the repo root: PYTHONPATH=. python tests/TimeUtilsBenchmark.py
+import argparse, datetime, time, timeit, pytz
+import TimeUtils
+
+# ##############################################################################################################
+# The old secondsSinceDate, for comparison
+# ##############################################################################################################
+def strptimeSecondsSince(date: str):
+    now = datetime.datetime.now(pytz.timezone('Europe/Stockholm'))
+    date = date[:-2] + ":00"
+    dateAsDateTime = datetime.datetime.strptime(''.join(date.rsplit(':', 1)), '%Y-%m-%dT%H:%M:%S.%f%z')
+    return (now - dateAsDateTime).total_seconds()
+
+# ##############################################################################################################
+# Microseconds per call for both, on timestamps from the last numberOfDays days
+# ##############################################################################################################
+def runBenchmark(numberOfCalls: int = 100000, numberOfDays: int = 5):
+    timestamps = [TimeUtils.formatTimestamp(time.time() - (index * 7919) % (numberOfDays * 86400)) for index in range(1000)]
+
+    for timestamp in timestamps:
+        assert abs(strptimeSecondsSince(timestamp) - TimeUtils.secondsSince(timestamp)) < 1
+
+    def run(function):
+        return lambda: [function(timestamps[index % len(timestamps)]) for index in range(numberOfCalls)]
+
+    strptimeSec = min(timeit.repeat(run(strptimeSecondsSince), number=1, repeat=3))
+    timeUtilsSec = min(timeit.repeat(run(TimeUtils.secondsSince), number=1, repeat=3))
+
+    return {
+        "calls": numberOfCalls,
+        "strptimeUsPerCall": round(1e6 * strptimeSec / numberOfCalls, 2),
+        "timeUtilsUsPerCall": round(1e6 * timeUtilsSec / numberOfCalls, 2),
+        "speedup": round(strptimeSec / timeUtilsSec, 1)
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=100000)
+    parser.add_argument("--days", type=int, default=5)
+    args = parser.parse_args()
+
+    for key, value in runBenchmark(args.calls, args.days).items():
+        print(f"{key:>22}: {value}")
@@ -0,0 +1,41 @@
+import datetime
+import TimeUtils
+
+def testParseTimestamp():
+    assert TimeUtils.parseTimestamp('2021-11-17T15:31:24.000+0100') == datetime.datetime(2021, 11, 17, 14, 31, 24, tzinfo=datetime.timezone.utc).timestamp()
+    assert TimeUtils.parseTimestamp('2021-07-01T09:00:00.500+02:00') == datetime.datetime(2021, 7, 1, 7, 0, 0, tzinfo=datetime.timezone.utc).timestamp() + 0.5
+    assert TimeUtils.parseTimestamp('2021-07-01T09:00:00Z') == datetime.datetime(2021, 7, 1, 9, 0, 0, tzinfo=datetime.timezone.utc).timestamp()
+    assert TimeUtils.parseTimestamp('2021-07-01T09:00:00-0430') == datetime.datetime(2021, 7, 1, 13, 30, 0, tzinfo=datetime.timezone.utc).timestamp()
+
+def testParseTimestampMalformed():
+    for timestamp in ['2021-11-17', '2021-11-17T15:31:24.000', '2021-11-17 15:31:24.000+0100', '2021-11-17T15:31:24.000+1']:
+        try:
+            TimeUtils.parseTimestamp(timestamp)
+            assert False
+        except ValueError:
+            pass
+
+def testFormatTimestamp():
+    epochSec = TimeUtils.parseTimestamp('2021-11-17T15:31:24.000+0100')
+
+    assert TimeUtils.formatTimestamp(epochSec) == '2021-11-17T15:31:24.000+0100'
+    assert TimeUtils.parseTimestamp(TimeUtils.formatTimestamp(epochSec + 86400 * 200)) == epochSec + 86400 * 200
+
+def testSecondsSinceOlderThanOneDay():
+    epochSec = TimeUtils.parseTimestamp('2021-11-17T15:31:24.000+0100')
+
+    assert TimeUtils.secondsSince('2021-11-17T15:31:24.000+0100', epochSec + 5) == 5
+    assert TimeUtils.secondsSince('2021-11-17T15:31:24.000+0100', epochSec + 3 * 86400 + 5) == 3 * 86400 + 5
+    assert TimeUtils.secondsSince('2021-11-17T15:31:24.000+0100', epochSec - 5) == -5
+
+def testParseDates():
+    retData = TimeUtils.parseDates(['2021-11-11', '2021-11-11', '2021-11-10T00:00:00', None, '2021-13-01', 'yesterday'])
+
+    assert retData == ['2021-11-11', '2021-11-11', '2021-11-10', None, None, None]
+
+if __name__ == "__main__":
+    testParseTimestamp()
+    testParseTimestampMalformed()
+    testFormatTimestamp()
+    testSecondsSinceOlderThanOneDay()
+    testParseDates()
@@ -0,0 +1,42 @@
+import os, tempfile
+from TradeRegister import TradeRegister
+from Logger import Log
+
+def createTrade(ticker, accountId, countAtStart, count, spent):
+    return {'ticker': ticker, 'boughtAt': 1.78, 'soldAt': None, 'count': count, 'lockKey': 1, 'name': ticker,
+            'totalInvestedSek': 100, 'tradedByBot': True, 'countAtStart': countAtStart, 'spent': spent,
+            'avanzaTickerId': '76426', 'accountId': accountId}
+
+def testAppendAndQuery():
+    path = os.path.join(tempfile.mkdtemp(), "register.jsonl")
+    objUnderTest = TradeRegister(Log(), path)
+
+    objUnderTest.append(createTrade("BBD-B.TO", "9288043", 0, 10, 150.0))
+    objUnderTest.append(createTrade("BBD-B.TO", "9288043", 10, 4, -95.0))
+    objUnderTest.append(createTrade("AKSO.ST", "4397855", 0, 5, 60.0))
+
+    assert len(objUnderTest.query()) == 3
+    assert len(objUnderTest.query(ticker="BBD-B.TO")) == 2
+    assert len(objUnderTest.query(accountId="4397855")) == 1
+    assert len(objUnderTest.query(fromDate="2000-01-01", toDate="2000-12-31")) == 0
+
+    profitAndLoss = objUnderTest.getProfitAndLoss(ticker="BBD-B.TO")
+    assert profitAndLoss["BBD-B.TO"]["boughtCount"] == 10
+    assert profitAndLoss["BBD-B.TO"]["soldCount"] == 6
+    assert profitAndLoss["BBD-B.TO"]["netSpentSek"] == 55.0
+    assert profitAndLoss["BBD-B.TO"]["count"] == 4
+
+def testReadByOtherInstance():
+    path = os.path.join(tempfile.mkdtemp(), "register.jsonl")
+    writer = TradeRegister(Log(), path)
+    reader = TradeRegister(Log(), path)
+
+    writer.append(createTrade("BBD-B.TO", "9288043", 0, 10, 150.0))
+    assert len(reader.query(ticker="BBD-B.TO")) == 1
+
+    writer.append(createTrade("BBD-B.TO", "9288043", 10, 4, -95.0))
+    assert len(reader.query(ticker="BBD-B.TO")) == 2
+
+if __name__ == "__main__":
+    testAppendAndQuery()
+    testReadByOtherInstance()
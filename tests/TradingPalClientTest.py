@@ -0,0 +1,81 @@
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+from TradingPalClient import TradingPalClient
+from Logger import Log
+from unittest.mock import MagicMock, patch
+
+def createReply(statusCode):
+    reply = MagicMock()
+    reply.status_code = statusCode
+    return reply
+
+def testGet():
+    session = MagicMock()
+    session.request.return_value = createReply(200)
+    objUnderTest = TradingPalClient("http://localhost/tradingpal/", Log(), session)
+
+    retVal = objUnderTest.get("getStocksToBuy")
+
+    assert retVal.status_code == 200
+    session.request.assert_called_once_with("GET", "http://localhost/tradingpal/getStocksToBuy", json=None, timeout=(3, 30))
+    assert objUnderTest.getLatencyStats()["getStocksToBuy"]["count"] == 1
+
+@patch("TradingPalClient.time.sleep")
+def testGetRetriesOnServerError(sleep):
+    session = MagicMock()
+    session.request.side_effect = [createReply(503), requests.exceptions.ReadTimeout(), createReply(200)]
+    objUnderTest = TradingPalClient("http://localhost/tradingpal/", Log(), session)
+
+    retVal = objUnderTest.get("getStocksToSell")
+
+    assert retVal.status_code == 200
+    assert session.request.call_count == 3
+    assert objUnderTest.getLatencyStats()["getStocksToSell"]["errors"] == 2
+
+@patch("TradingPalClient.time.sleep")
+def testPostNotRetriedOnReadTimeout(sleep):
+    session = MagicMock()
+    session.request.side_effect = requests.exceptions.ReadTimeout()
+    objUnderTest = TradingPalClient("http://localhost/tradingpal/", Log(), session)
+
+    try:
+        objUnderTest.post("lock", {"ticker": "AKSO.ST"})
+        assert False
+    except requests.exceptions.ReadTimeout:
+        pass
+
+    assert session.request.call_count == 1
+
+@patch("TradingPalClient.time.sleep")
+def testPostRetriedWhenNeverConnected(sleep):
+    refused = MaxRetryError(None, "/tradingpal/unlock", NewConnectionError(None, "Connection refused"))
+    session = MagicMock()
+    session.request.side_effect = [requests.exceptions.ConnectionError(refused), requests.exceptions.ConnectTimeout(),
+                                   createReply(200)]
+    objUnderTest = TradingPalClient("http://localhost/tradingpal/", Log(), session)
+
+    retVal = objUnderTest.post("unlock", {"ticker": "AKSO.ST", "lockKey": 1})
+
+    assert retVal.status_code == 200
+    assert session.request.call_count == 3
+
+@patch("TradingPalClient.time.sleep")
+def testPostNotRetriedOnConnectionReset(sleep):
+    session = MagicMock()
+    session.request.side_effect = requests.exceptions.ConnectionError(ConnectionResetError("Connection reset by peer"))
+    objUnderTest = TradingPalClient("http://localhost/tradingpal/", Log(), session)
+
+    try:
+        objUnderTest.post("lock", {"ticker": "AKSO.ST"})
+        assert False
+    except requests.exceptions.ConnectionError:
+        pass
+
+    assert session.request.call_count == 1
+
+if __name__ == "__main__":
+    testGet()
+    testGetRetriesOnServerError()
+    testPostNotRetriedOnReadTimeout()
+    testPostRetriedWhenNeverConnected()
+    testPostNotRetriedOnConnectionReset()